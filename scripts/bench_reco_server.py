@@ -0,0 +1,146 @@
+# scripts/bench_reco_server.py
+"""
+Benchmark de carga del servicio de recomendaciones (src/reco_server.py).
+
+Arranca el servidor en un subproceso (o usa uno ya levantado con --port y
+--no_spawn), abre --connections conexiones keep-alive y lanza --requests
+peticiones mezclando /recommend (cestas de items del índice) y /cluster
+(clientes de rfm_clusters.csv). Informa latencia p50/p90/p99, peticiones por
+segundo y errores. Con --reload_during se tocan los ficheros a mitad de la
+carga para comprobar que la recarga en caliente no pierde peticiones.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from reco_server import load_rules
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'reco_server.py')
+
+async def _get(reader, writer, target):
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode('latin-1'))
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+async def _worker(port, targets, latencies, errors):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        while targets:
+            target = targets.pop()
+            start = time.perf_counter()
+            status = await _get(reader, writer, target)
+            latencies.append(time.perf_counter() - start)
+            if status >= 500:
+                errors.append(status)
+    finally:
+        writer.close()
+
+async def _touch_later(paths, delay):
+    await asyncio.sleep(delay)
+    for path in paths:
+        os.utime(path)
+    print(f"Ficheros tocados a los {delay:.2f}s para forzar recarga")
+
+async def run_load(port, targets, connections, touch=None):
+    latencies, errors = [], []
+    tasks = [_worker(port, targets, latencies, errors) for _ in range(connections)]
+    if touch:
+        tasks.append(_touch_later(*touch))
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    return latencies, errors, time.perf_counter() - start
+
+def build_targets(rules_path, clusters_path, n, cluster_ratio=0.3, basket_size=3, seed=42):
+    rng = random.Random(seed)
+    items = list(load_rules(rules_path).items)
+    customers = pd.read_csv(clusters_path, usecols=['CustomerID'])['CustomerID'].tolist()
+    targets = []
+    for _ in range(n):
+        if customers and rng.random() < cluster_ratio:
+            targets.append('/cluster?' + urlencode({'customer': rng.choice(customers)}))
+        else:
+            basket = rng.sample(items, min(basket_size, len(items)))
+            targets.append('/recommend?' + urlencode([('item', i) for i in basket] + [('k', 5)]))
+    return targets
+
+def wait_ready(port, timeout=30.0):
+    async def ping():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            return await _get(reader, writer, '/health')
+        finally:
+            writer.close()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if asyncio.run(ping()) == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"El servidor no respondió en {timeout}s")
+
+def main(args):
+    proc = None
+    if not args.no_spawn:
+        proc = subprocess.Popen([sys.executable, SERVER, '--rules', args.rules, '--clusters', args.clusters,
+                                 '--port', str(args.port), '--reload_interval', str(args.reload_interval)])
+    try:
+        wait_ready(args.port)
+        targets = build_targets(args.rules, args.clusters, args.requests, cluster_ratio=args.cluster_ratio)
+        touch = ([args.rules, args.clusters], args.reload_during) if args.reload_during else None
+        latencies, errors, elapsed = asyncio.run(run_load(args.port, targets, args.connections, touch))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    lat_ms = np.asarray(latencies) * 1000
+    result = {
+        'requests': len(lat_ms), 'connections': args.connections, 'errors': len(errors),
+        'seconds': round(elapsed, 3), 'rps': round(len(lat_ms) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(lat_ms, 50)), 3),
+        'p90_ms': round(float(np.percentile(lat_ms, 90)), 3),
+        'p99_ms': round(float(np.percentile(lat_ms, 99)), 3),
+    }
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print('Resultado guardado en', args.out)
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark de carga del servicio de recomendaciones (p50/p99 y RPS)')
+    parser.add_argument('--rules', default='outputs/rules_index.npz', help='Índice .npz o CSV de reglas')
+    parser.add_argument('--clusters', default='outputs/rfm_clusters.csv', help='rfm_clusters.csv')
+    parser.add_argument('--port', type=int, default=8765, help='Puerto del servidor')
+    parser.add_argument('--no_spawn', action='store_true', help='No arrancar el servidor; usar uno ya levantado en --port')
+    parser.add_argument('--requests', type=int, default=20000, help='Peticiones totales')
+    parser.add_argument('--connections', type=int, default=32, help='Conexiones keep-alive concurrentes')
+    parser.add_argument('--cluster_ratio', type=float, default=0.3, help='Fracción de peticiones /cluster (resto /recommend)')
+    parser.add_argument('--reload_interval', type=float, default=0.5, help='Intervalo de recarga del servidor arrancado')
+    parser.add_argument('--reload_during', type=float, default=None, help='Tocar los ficheros a los N segundos para forzar una recarga durante la carga')
+    parser.add_argument('--out', default=None, help='Guardar el resultado en JSON')
+    args = parser.parse_args()
+
+    main(args)
@@ -1,17 +1,22 @@
 # scripts/clean_descriptions.py
-import pandas as pd
-import unidecode, re, os
+# Equivale a `mineria_ejercicios.py --clean_descriptions`: añade Description_clean
+# al preprocesado existente (o lo genera si no existe) sin reescribir el CSV.
+import os, sys
 
-df = pd.read_csv('data/ventas_ejemplo.csv', encoding='ISO-8859-1', parse_dates=['InvoiceDate'])
-def clean_desc(s):
-    if pd.isna(s): return s
-    s = str(s).lower().strip()
-    s = unidecode.unidecode(s)
-    s = re.sub(r'[^a-z0-9 ]', ' ', s)
-    s = re.sub(r'\s+', ' ', s)
-    return s
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from store import has_preprocessed, read_preprocessed, write_preprocessed
+from mineria_ejercicios import load_and_preprocess, normalize_descriptions
 
-df['Description_clean'] = df['Description'].apply(clean_desc)
-os.makedirs('outputs', exist_ok=True)
-df.to_csv('outputs/ventas_preprocessed.csv', index=False)  # sobrescribe preprocesado con columna nueva
-print("Descriptions limpiadas y guardadas en outputs/ventas_preprocessed.csv")
\ No newline at end of file
+def add_clean_descriptions(df):
+    """Añade la columna Description_clean (minúsculas, sin acentos ni símbolos)."""
+    df['Description_clean'] = normalize_descriptions(df['Description'])
+    return df
+
+if __name__ == "__main__":
+    if has_preprocessed('outputs'):
+        df = add_clean_descriptions(read_preprocessed('outputs'))
+    else:
+        os.makedirs('outputs', exist_ok=True)
+        df = load_and_preprocess('data/ventas_ejemplo.csv', clean_descriptions=True)
+    out = write_preprocessed(df, 'outputs')  # sobrescribe preprocesado con columna nueva
+    print(f"Descriptions limpiadas y guardadas en {out}")
@@ -1,14 +1,17 @@
 # scripts/generate_report.py
 from docx import Document
 from docx.shared import Inches
-import pandas as pd, os
+import pandas as pd, os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from store import preprocessed_rows
 
 doc = Document()
 doc.add_heading('Informe - Minería de Transacciones', level=1)
 
 # Preprocesado
 orig = pd.read_csv('data/ventas_ejemplo.csv', encoding='ISO-8859-1').shape[0]
-clean = pd.read_csv('outputs/ventas_preprocessed.csv').shape[0]
+clean = preprocessed_rows('outputs')
 doc.add_heading('Preprocesamiento', level=2)
 doc.add_paragraph(f'Registros originales: {orig}\nRegistros después limpieza: {clean}')
 
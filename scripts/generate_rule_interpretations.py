@@ -1,74 +1,112 @@
 # scripts/generate_rule_interpretations.py
-import pandas as pd
+"""
+Interpretación en texto de las reglas de asociación (Apriori o fallback por
+pares, leídas como RuleTable). El filtrado (umbrales mínimos), la
+ordenación (top-k por argpartition) y el texto se calculan por columnas:
+los nombres "a, b" se forman una vez por conjunto distinto y los números con
+np.char.mod, así que se pueden interpretar millones de reglas y no solo las
+5 primeras. El fichero se escribe por bloques de CHUNK_RULES reglas.
+"""
 import os
+import sys
+import argparse
+import numpy as np
 
-os.makedirs('outputs', exist_ok=True)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from rule_table import as_rule_table, load_rule_table
 
-apriori_path = 'outputs_apriori/rules_apriori.csv'
-fallback_path = 'outputs/rules_pairs_top.csv'
+CHUNK_RULES = 100_000
+APRIORI_PATH = 'outputs_apriori/rules_apriori.csv'
+FALLBACK_PATH = 'outputs/rules_pairs_top.csv'
 
-if os.path.exists(apriori_path):
-    rules = pd.read_csv(apriori_path)
-    use_apriori = True
-else:
-    rules = pd.read_csv(fallback_path)
-    use_apriori = False
+def select_rules(rules, top_n=5, rank_by=None, min_support=None, min_confidence=None, min_lift=None):
+    """
+    Reglas a interpretar: las que superan los umbrales y, de ellas, las top_n
+    (None = todas) en el orden de la tabla o por la métrica rank_by.
+    """
+    table = as_rule_table(rules).filter(support=min_support, confidence=min_confidence, lift=min_lift)
+    if rank_by:
+        return table.top(top_n, rank_by)
+    return table if top_n is None else table.head(top_n)
 
-# Normalizar nombres de columnas para facilitar
-if use_apriori:
-    # columnas esperadas: antecedents, consequents, support, confidence, lift
-    cols_map = {
-        'antecedents': 'antecedents',
-        'consequents': 'consequents',
-        'support': 'support',
-        'confidence': 'confidence',
-        'lift': 'lift'
-    }
-else:
-    # fallback: antecedent, consequent, support, confidence_a_b, lift
-    cols_map = {
-        'antecedents': 'antecedent',
-        'consequents': 'consequent',
-        'support': 'support',
-        'confidence': 'confidence_a_b',
-        'lift': 'lift'
-    }
+def _formatted(table, metric, fmt, scale=1.0):
+    if metric not in table.metrics:
+        return np.full(len(table), 'N/A', dtype=object)
+    return np.char.mod(fmt, table[metric] * scale).astype(object)
 
-# Tomar top 5 (si hay menos, toma lo que haya)
-topn = rules.head(5)
+def rule_paragraphs(table, start=1):
+    """Un párrafo de interpretación por regla (array de textos), numerados desde start."""
+    n = len(table)
+    number = np.char.mod('%d', np.arange(start, start + n)).astype(object)
+    antecedents = table.itemset_text('antecedent')
+    consequents = table.itemset_text('consequent')
+    support_pct = _formatted(table, 'support', '%.2f%%', 100)
+    confidence_pct = _formatted(table, 'confidence', '%.2f%%', 100)
+    lift_str = _formatted(table, 'lift', '%.2f')
+    if 'lift' in table.metrics:
+        lift = table['lift']
+        strength = np.select([lift > 1.5, lift > 1.1, lift > 1], ['fuerte', 'moderada', 'débil'],
+                             'no informativa').astype(object)
+    else:
+        strength = np.full(n, 'no informativa', dtype=object)
+    return ("Regla " + number + ": " + antecedents + " -> " + consequents + "\n"
+            + "- Support: " + support_pct + "\n"
+            + "- Confidence (A->B): " + confidence_pct + "\n"
+            + "- Lift: " + lift_str + "\n\n"
+            + "Interpretación práctica:\n"
+            + "Cuando un cliente compra [" + antecedents + "], la probabilidad de que también compre ["
+            + consequents + "] es " + confidence_pct + ".\n"
+            + "El lift de " + lift_str + " indica que la relación es " + strength + " en comparación al azar.\n"
+            + "Acción sugerida: mostrar [" + consequents + "] como producto sugerido en la página de ["
+            + antecedents + "] o crear un combo/promoción durante un periodo de prueba y medir el uplift.\n"
+            + "-----\n")
 
-out_lines = []
-out_lines.append("Interpretaciones automatizadas de las 5 reglas top\n")
-out_lines.append("Fuente: " + ("Apriori (outputs_apriori/rules_apriori.csv)" if use_apriori else "Fallback pares (outputs/rules_pairs_top.csv)"))
-out_lines.append("\n")
+def _source(table, source):
+    if source is not None:
+        return source
+    return ("Apriori (outputs_apriori/rules_apriori.csv)" if table.kind == 'itemsets'
+            else "Fallback pares (outputs/rules_pairs_top.csv)")
 
-for idx, row in topn.iterrows():
-    antecedents = str(row[cols_map['antecedents']])
-    consequents = str(row[cols_map['consequents']])
-    support = float(row[cols_map['support']]) if cols_map['support'] in row else None
-    confidence = float(row[cols_map['confidence']]) if cols_map['confidence'] in row else None
-    lift = float(row[cols_map['lift']]) if cols_map['lift'] in row else None
+def iter_interpretations(rules, top_n=5, source=None, chunk_rules=CHUNK_RULES, **selection):
+    """Texto de interpret_rules por trozos (cabecera y bloques de chunk_rules reglas)."""
+    table = select_rules(rules, top_n=top_n, **selection)
+    yield "\n".join([f"Interpretaciones automatizadas de las {len(table)} reglas top\n",
+                     "Fuente: " + _source(table, source), "\n"])
+    for start in range(0, len(table), chunk_rules):
+        yield "\n" + "\n".join(rule_paragraphs(table.take(np.arange(start, min(start + chunk_rules, len(table)))),
+                                               start=start + 1))
 
-    # Formatear números de forma legible
-    support_pct = f"{support*100:.2f}%" if support is not None else "N/A"
-    confidence_pct = f"{confidence*100:.2f}%" if confidence is not None else "N/A"
-    lift_str = f"{lift:.2f}" if lift is not None else "N/A"
+def interpret_rules(rules, top_n=5, source=None, **selection):
+    """
+    Texto con la interpretación de las top_n reglas (RuleTable o DataFrame
+    en formato Apriori o fallback por pares). selection: rank_by,
+    min_support, min_confidence, min_lift (ver select_rules).
+    """
+    return "".join(iter_interpretations(rules, top_n=top_n, source=source, **selection))
 
-    paragraph = (
-        f"Regla {idx+1}: {antecedents} -> {consequents}\n"
-        f"- Support: {support_pct}\n"
-        f"- Confidence (A->B): {confidence_pct}\n"
-        f"- Lift: {lift_str}\n\n"
-        f"Interpretación práctica:\n"
-        f"Cuando un cliente compra [{antecedents}], la probabilidad de que también compre [{consequents}] es {confidence_pct}.\n"
-        f"El lift de {lift_str} indica que la relación es {('fuerte' if lift and lift>1.5 else 'moderada' if lift and lift>1.1 else 'débil' if lift and lift>1 else 'no informativa')} en comparación al azar.\n"
-        f"Acción sugerida: mostrar [{consequents}] como producto sugerido en la página de [{antecedents}] o crear un combo/promoción durante un periodo de prueba y medir el uplift.\n"
-        "-----\n"
-    )
-    out_lines.append(paragraph)
+def write_interpretations(text, out_path='outputs/rules_interpretations.txt'):
+    """Escribe el texto (str o iterable de trozos, p. ej. iter_interpretations)."""
+    with open(out_path, 'w', encoding='utf-8') as f:
+        f.writelines([text] if isinstance(text, str) else text)
+    return out_path
 
-out_path = 'outputs/rules_interpretations.txt'
-with open(out_path, 'w', encoding='utf-8') as f:
-    f.writelines("\n".join(out_lines))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Interpretación en texto de las reglas (Apriori o fallback por pares)')
+    parser.add_argument('--rules', default=None, help='Reglas (.csv o .npz); por defecto Apriori si existe, sino pares')
+    parser.add_argument('--out', default='outputs/rules_interpretations.txt', help='Fichero de texto de salida')
+    parser.add_argument('--top_n', type=int, default=5, help='Reglas a interpretar (0 = todas)')
+    parser.add_argument('--rank_by', default=None, help='Métrica para elegir las top_n (por defecto el orden de la tabla, por lift)')
+    parser.add_argument('--min_support', type=float, default=None, help='Support mínimo de las reglas interpretadas')
+    parser.add_argument('--min_confidence', type=float, default=None, help='Confidence (A->B) mínima')
+    parser.add_argument('--min_lift', type=float, default=None, help='Lift mínimo')
+    args = parser.parse_args()
 
-print("Interpretaciones generadas en:", out_path)
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    rules = load_rule_table(args.rules) if args.rules else (load_rule_table(APRIORI_PATH) or load_rule_table(FALLBACK_PATH))
+    if rules is None:
+        sys.exit("No se encontraron reglas en outputs_apriori ni en outputs/rules_pairs_top.csv")
+    out_path = write_interpretations(iter_interpretations(rules, top_n=args.top_n or None, source=args.rules,
+                                                          rank_by=args.rank_by,
+                                                          min_support=args.min_support, min_confidence=args.min_confidence,
+                                                          min_lift=args.min_lift), args.out)
+    print("Interpretaciones generadas en:", out_path)
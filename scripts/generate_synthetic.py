@@ -0,0 +1,175 @@
+# scripts/generate_synthetic.py
+"""
+Generador de transacciones sintéticas con el esquema de ventas_ejemplo.csv
+(InvoiceNo, StockCode, Description, Quantity, InvoiceDate, UnitPrice,
+CustomerID, Country) a la escala que se pida.
+
+- Popularidad de items Zipf (exponente --zipf) sobre un orden aleatorio de IDs.
+- Reglas plantadas: en una fracción --rule_support de las facturas se insertan
+  los items del antecedente y, con probabilidad --rule_confidence, el
+  consecuente. Los items de las reglas salen de la cola de la distribución
+  para que la co-ocurrencia natural apenas diluya la confianza.
+- Facturas con número de líneas 1 + Poisson, fechas crecientes con el número
+  de factura, clientes con país fijo.
+
+Todo se genera por bloques de --chunk_rows líneas con numpy y se escribe en
+modo append: la memoria no depende de --rows. Junto al CSV se guarda
+<csv>.rules.json con los parámetros y las reglas plantadas.
+"""
+import os
+import json
+import logging
+import argparse
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+COUNTRIES = ['Costa Rica', 'Guatemala', 'El Salvador', 'Nicaragua', 'Honduras']
+FIRST_INVOICE = 10000
+FIRST_CUSTOMER = 1000
+
+def zipf_cdf(n, exponent):
+    """CDF acumulada de una Zipf truncada a n rangos (p_k ∝ 1/k^exponent)."""
+    weights = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** exponent
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+def plant_rules(n_rules, by_rank, rng):
+    """
+    Reglas plantadas sobre items de la mitad menos popular: antecedentes de
+    1 y 2 items alternados y un consecuente, sin items repetidos entre reglas.
+    """
+    tail = by_rank[len(by_rank) // 2:]
+    needed = sum(2 + (r % 2) for r in range(n_rules))
+    if needed > len(tail):
+        raise ValueError(f"{n_rules} reglas necesitan {needed} items en la cola; aumentar --items")
+    picked = rng.choice(tail, size=needed, replace=False)
+    rules, pos = [], 0
+    for r in range(n_rules):
+        size = 1 + (r % 2)
+        rules.append((picked[pos:pos + size].tolist(), int(picked[pos + size])))
+        pos += size + 1
+    return rules
+
+class SyntheticSales:
+    def __init__(self, customers=1000, items=500, zipf=1.1, n_rules=10, rule_support=0.02,
+                 rule_confidence=0.7, lines_per_invoice=4.0, start_date='2021-01-01', days=365, seed=42):
+        if lines_per_invoice < 1:
+            raise ValueError("lines_per_invoice debe ser >= 1")
+        self.rng = np.random.default_rng(seed)
+        self.params = dict(customers=customers, items=items, zipf=zipf, n_rules=n_rules, rule_support=rule_support,
+                           rule_confidence=rule_confidence, lines_per_invoice=lines_per_invoice,
+                           start_date=start_date, days=days, seed=seed)
+        self.customers, self.items = customers, items
+        self.lines_per_invoice = lines_per_invoice
+        self.rule_support, self.rule_confidence = rule_support, rule_confidence
+        # rango de popularidad → item (los IDs no delatan la popularidad)
+        self.by_rank = self.rng.permutation(items)
+        self.item_cdf = zipf_cdf(items, zipf)
+        self.customer_cdf = zipf_cdf(customers, 0.5)
+        self.customer_country = self.rng.integers(len(COUNTRIES), size=customers)
+        self.base_price = np.round(self.rng.uniform(1, 100, size=items), 2)
+        self.rules = plant_rules(n_rules, self.by_rank, self.rng)
+        self.dates = pd.date_range(start_date, periods=days, freq='D').strftime('%Y-%m-%d').to_numpy(dtype=object)
+        self.stock_codes = np.asarray([f"P{i:05d}" for i in range(items)], dtype=object)
+        self.descriptions = np.asarray([f"Producto {i}" for i in range(items)], dtype=object)
+        self.countries = np.asarray(COUNTRIES, dtype=object)
+
+    def expected_lines_per_invoice(self):
+        planted = sum((len(a) + self.rule_confidence) * self.rule_support for a, _ in self.rules)
+        return self.lines_per_invoice + planted
+
+    def _sample_items(self, n):
+        return self.by_rank[np.searchsorted(self.item_cdf, self.rng.random(n), side='right')]
+
+    def chunk(self, first_invoice, n_invoices, total_invoices):
+        """Líneas de las facturas [first_invoice, first_invoice + n_invoices) como DataFrame."""
+        rng = self.rng
+        sizes = 1 + rng.poisson(self.lines_per_invoice - 1, size=n_invoices)
+        invoice = np.repeat(np.arange(n_invoices), sizes)
+        item = self._sample_items(len(invoice))
+
+        # reglas plantadas: antecedente en una fracción de facturas, consecuente con prob. = confianza
+        extra_inv, extra_item = [invoice], [item]
+        for antecedent, consequent in self.rules:
+            hit = np.flatnonzero(rng.random(n_invoices) < self.rule_support)
+            for a in antecedent:
+                extra_inv.append(hit)
+                extra_item.append(np.full(len(hit), a))
+            follow = hit[rng.random(len(hit)) < self.rule_confidence]
+            extra_inv.append(follow)
+            extra_item.append(np.full(len(follow), consequent))
+        invoice = np.concatenate(extra_inv)
+        item = np.concatenate(extra_item)
+        order = np.argsort(invoice, kind='stable')
+        invoice, item = invoice[order], item[order]
+
+        customer = np.searchsorted(self.customer_cdf, rng.random(n_invoices), side='right')
+        # fechas crecientes con el número de factura, como en un histórico real
+        day = ((first_invoice + np.arange(n_invoices)) * len(self.dates) // max(total_invoices, 1)).clip(max=len(self.dates) - 1)
+        n = len(invoice)
+        return pd.DataFrame({
+            'InvoiceNo': FIRST_INVOICE + first_invoice + invoice,
+            'StockCode': self.stock_codes[item],
+            'Description': self.descriptions[item],
+            'Quantity': rng.integers(1, 10, size=n),
+            'InvoiceDate': self.dates[day[invoice]],
+            'UnitPrice': np.round(self.base_price[item] * rng.uniform(0.9, 1.1, size=n), 2),
+            'CustomerID': FIRST_CUSTOMER + customer[invoice],
+            'Country': self.countries[self.customer_country[customer[invoice]]],
+        })
+
+    def planted_rules(self):
+        return [{'antecedents': [self.descriptions[a] for a in antecedent],
+                 'consequents': [self.descriptions[consequent]],
+                 'support': self.rule_support, 'confidence': self.rule_confidence}
+                for antecedent, consequent in self.rules]
+
+def generate_csv(out_path, rows, chunk_rows=1_000_000, **params):
+    """Escribe exactamente `rows` líneas en out_path por bloques; devuelve la ruta del JSON de reglas."""
+    gen = SyntheticSales(**params)
+    per_invoice = gen.expected_lines_per_invoice()
+    total_invoices = int(np.ceil(rows / per_invoice))
+    invoices_per_chunk = max(1, int(chunk_rows / per_invoice))
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp_path = out_path + '.tmp'
+    written, first_invoice = 0, 0
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        while written < rows:
+            chunk = gen.chunk(first_invoice, invoices_per_chunk, total_invoices)
+            chunk = chunk.iloc[:rows - written]
+            chunk.to_csv(f, index=False, header=written == 0)
+            written += len(chunk)
+            first_invoice += invoices_per_chunk
+            logging.info(f"{written:,}/{rows:,} filas escritas")
+    os.replace(tmp_path, out_path)
+
+    meta_path = out_path + '.rules.json'
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'rows': rows, **gen.params, 'planted_rules': gen.planted_rules()}, f, indent=2, ensure_ascii=False)
+    logging.info(f"CSV sintético guardado en: {out_path} (reglas plantadas en {meta_path})")
+    return meta_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Genera transacciones sintéticas con el esquema de ventas_ejemplo.csv')
+    parser.add_argument('--out', default='data/ventas_sinteticas.csv', help='CSV de salida')
+    parser.add_argument('--rows', type=int, default=100_000, help='Líneas de factura a generar')
+    parser.add_argument('--customers', type=int, default=1000, help='Número de clientes')
+    parser.add_argument('--items', type=int, default=500, help='Número de productos')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Exponente Zipf de la popularidad de productos')
+    parser.add_argument('--rules', type=int, default=10, help='Número de reglas plantadas')
+    parser.add_argument('--rule_support', type=float, default=0.02, help='Fracción de facturas con el antecedente de cada regla')
+    parser.add_argument('--rule_confidence', type=float, default=0.7, help='Probabilidad del consecuente dado el antecedente plantado')
+    parser.add_argument('--lines_per_invoice', type=float, default=4.0, help='Media de líneas por factura (sin contar las plantadas)')
+    parser.add_argument('--start_date', default='2021-01-01', help='Fecha de la primera factura')
+    parser.add_argument('--days', type=int, default=365, help='Días cubiertos por el histórico')
+    parser.add_argument('--chunk_rows', type=int, default=1_000_000, help='Líneas por bloque generado y escrito')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla')
+    args = parser.parse_args()
+
+    generate_csv(args.out, args.rows, chunk_rows=args.chunk_rows, customers=args.customers, items=args.items,
+                 zipf=args.zipf, n_rules=args.rules, rule_support=args.rule_support,
+                 rule_confidence=args.rule_confidence, lines_per_invoice=args.lines_per_invoice,
+                 start_date=args.start_date, days=args.days, seed=args.seed)
@@ -1,57 +1,178 @@
 # scripts/plot_rules_network.py
+"""
+Red dirigida antecedente → consecuente de las reglas con más lift, para las
+reglas Apriori (rules_apriori.csv) o las del fallback por pares
+(rules_pairs_top.csv). Sustituye a plot_rules_network_fallback.py.
+
+- Las aristas salen de las top_n reglas por lift de la RuleTable (top-k por
+  argpartition + from_pandas_edgelist); los nombres de los nodos se forman y
+  recortan una vez por valor único.
+- La disposición de los nodos se guarda en <salida>_layout.npz. Si el
+  conjunto de nodos no cambia se reutiliza tal cual; si cambia, se parte de
+  las posiciones guardadas y solo se refina con unas pocas iteraciones.
+- Con muchas aristas (mode='scalable', automático a partir de
+  SCALABLE_EDGES) la disposición parte de un layout espectral disperso y las
+  aristas se dibujan como una sola LineCollection sin flechas; solo se
+  rotulan los nodos de mayor grado.
+"""
 import os
+import sys
+import argparse
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 import networkx as nx
+from matplotlib.collections import LineCollection
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from plots import new_figure, save_figure
+from rule_table import as_rule_table, load_rule_table
+
+SCALABLE_EDGES = 500
+LABEL_MAXLEN = 60
+SPRING_ITERATIONS = 50
+WARM_ITERATIONS = 15
+SCALABLE_ITERATIONS = 30
+SCALABLE_LABELS = 40
+
+def load_rules(apriori_path="outputs_apriori/rules_apriori.csv", pairs_path="outputs/rules_pairs_top.csv"):
+    """Reglas Apriori (RuleTable) si existen y no están vacías; si no, el fallback por pares."""
+    rules = load_rule_table(apriori_path) if apriori_path else None
+    if rules is None and pairs_path:
+        rules = load_rule_table(pairs_path)
+    return rules
 
-# Paths
-apriori_path = "outputs_apriori/rules_apriori.csv"
-pairs_path = "outputs/rules_pairs_top.csv"
-out_path = "outputs_apriori/rules_network.png"
-
-# Cargar reglas Apriori si existen
-rules = None
-if os.path.exists(apriori_path):
-    rules = pd.read_csv(apriori_path)
-    if rules.empty:
-        rules = None
-
-# Si Apriori está vacío → usar fallback por pares
-if rules is None and os.path.exists(pairs_path):
-    rules = pd.read_csv(pairs_path).rename(columns={
-        "antecedent": "antecedents",
-        "consequent": "consequents",
-        "confidence_a_b": "confidence"
+def _labels(texts):
+    # textos "a, b" de la tabla (uno por conjunto distinto); recortados una vez por valor único
+    codes, uniques = pd.factorize(texts)
+    labels = [u if len(u) <= LABEL_MAXLEN else u[:LABEL_MAXLEN - 3] + '...' for u in (str(u).strip() for u in uniques)]
+    return np.asarray(labels, dtype=object)[codes]
+
+def rule_edges(rules, top_n=50):
+    """DataFrame source/target/lift/confidence con las top_n reglas por lift (RuleTable o DataFrame de reglas)."""
+    table = as_rule_table(rules).top(top_n, "lift")
+    edges = pd.DataFrame({
+        "source": _labels(table.itemset_text("antecedent")),
+        "target": _labels(table.itemset_text("consequent")),
+        "lift": np.nan_to_num(table["lift"], nan=1.0),
+        "confidence": table["confidence"],
     })
+    return edges[(edges["source"] != "") & (edges["target"] != "")]
+
+def load_layout(path):
+    """{nodo: (x, y)} guardado, o {} si no hay fichero."""
+    if not path or not os.path.exists(path):
+        return {}
+    with np.load(path) as data:
+        return dict(zip(data["nodes"].tolist(), data["pos"]))
+
+def save_layout(path, pos):
+    nodes = sorted(pos)
+    np.savez(path, nodes=np.asarray(nodes, dtype=str), pos=np.asarray([pos[n] for n in nodes], dtype=np.float64))
+
+def compute_layout(G, cached=None, scalable=False):
+    """
+    Posiciones de los nodos. Si cached cubre exactamente los nodos de G se
+    reutiliza sin recalcular; si cubre parte, es el punto de partida de unas
+    pocas iteraciones de spring (los nodos nuevos empiezan en posiciones
+    aleatorias con semilla fija). Sin caché: spring completo, o en modo
+    escalable semilla espectral (matriz dispersa) + pocas iteraciones.
+    """
+    cached = cached or {}
+    nodes = set(G.nodes())
+    if nodes and nodes == set(cached):
+        return {n: np.asarray(cached[n]) for n in G.nodes()}, 'reutilizada'
+    k = 1.0 / np.sqrt(max(len(nodes), 1))
+    known = {n: cached[n] for n in G.nodes() if n in cached}
+    if known:
+        return nx.spring_layout(G, pos=known, k=k, iterations=WARM_ITERATIONS, seed=42), 'refinada'
+    if scalable and len(nodes) > 2:
+        seed_pos = nx.spectral_layout(G.to_undirected())
+        return nx.spring_layout(G, pos=seed_pos, k=k, iterations=SCALABLE_ITERATIONS, seed=42), 'calculada (espectral)'
+    return nx.spring_layout(G, k=max(k, 0.5), iterations=SPRING_ITERATIONS, seed=42), 'calculada'
+
+def _scaled(values, low, high):
+    values = np.asarray(values, dtype=np.float64)
+    span = values.max() - values.min() if len(values) else 0.0
+    if span <= 0 or not np.isfinite(span):
+        return np.full(len(values), (low + high) / 2)
+    return low + (high - low) * (values - values.min()) / span
+
+def plot_rules_network(rules, out_path="outputs_apriori/rules_network.png", top_n=50, mode='auto',
+                       layout_cache='auto', dpi=150):
+    """
+    Red dirigida antecedente → consecuente de las top_n reglas por lift
+    (top_n=None: todas). mode: 'spring', 'scalable' o 'auto'. layout_cache:
+    ruta .npz, 'auto' (junto a out_path) o None (sin caché). Devuelve
+    out_path, o None si no hay reglas.
+    """
+    rules = as_rule_table(rules)
+    if rules is None or rules.empty:
+        print("⚠️ No hay reglas para graficar (ni Apriori ni fallback).")
+        return None
+    edges = rule_edges(rules, top_n)
+    if edges.empty:
+        print("⚠️ No hay reglas válidas tras filtrar.")
+        return None
+    G = nx.from_pandas_edgelist(edges, "source", "target", edge_attr=["lift", "confidence"], create_using=nx.DiGraph)
+    scalable = mode == 'scalable' or (mode == 'auto' and G.number_of_edges() > SCALABLE_EDGES)
+
+    if layout_cache == 'auto':
+        layout_cache = os.path.splitext(out_path)[0] + '_layout.npz'
+    pos, how = compute_layout(G, load_layout(layout_cache), scalable=scalable)
+    if layout_cache and how != 'reutilizada':
+        save_layout(layout_cache, pos)
+
+    nodes = list(G.nodes())
+    degree = np.asarray([G.degree(n) for n in nodes], dtype=np.float64)
+    xy = np.asarray([pos[n] for n in nodes])
+    lifts = np.asarray([d["lift"] for _, _, d in G.edges(data=True)])
+
+    fig = new_figure((14, 11))
+    ax = fig.add_subplot()
+    if scalable:
+        index = {n: i for i, n in enumerate(nodes)}
+        src = np.fromiter((index[u] for u, _ in G.edges()), dtype=np.int64, count=G.number_of_edges())
+        dst = np.fromiter((index[v] for _, v in G.edges()), dtype=np.int64, count=G.number_of_edges())
+        segments = np.stack([xy[src], xy[dst]], axis=1)
+        ax.add_collection(LineCollection(segments, linewidths=_scaled(lifts, 0.2, 1.5), colors='gray', alpha=0.3))
+        ax.scatter(xy[:, 0], xy[:, 1], s=_scaled(degree, 5, 200), c='skyblue', edgecolors='none', zorder=2)
+        # rótulos solo para los nodos de mayor grado: con miles el texto tapa la red
+        for i in np.argsort(-degree, kind='stable')[:SCALABLE_LABELS]:
+            ax.annotate(nodes[i], xy[i], fontsize=6, ha='center', va='center', zorder=3)
+        ax.autoscale()
+    else:
+        nx.draw_networkx_nodes(G, pos, ax=ax, node_color="skyblue", node_size=_scaled(degree, 200, 2000))
+        nx.draw_networkx_edges(G, pos, ax=ax, width=_scaled(lifts, 0.5, 4.0), alpha=0.6,
+                               arrowsize=15, arrowstyle='-|>')
+        nx.draw_networkx_labels(G, pos, ax=ax, font_size=8)
+
+    ax.set_title(f"Red de Reglas (Top {len(edges)} por Lift)")
+    ax.axis("off")
+    fig.tight_layout()
+    save_figure(fig, out_path, dpi=dpi)
+
+    print(f"✅ Red de reglas guardada en {out_path} ({G.number_of_nodes()} nodos, {G.number_of_edges()} aristas, disposición {how})")
+    return out_path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Red de reglas (Apriori o fallback por pares)')
+    parser.add_argument('--rules', default=None, help='Reglas .csv o .npz (por defecto Apriori si no está vacío, sino pares)')
+    parser.add_argument('--out', default=None, help='PNG de salida (por defecto rules_network.png o rules_network_fallback.png)')
+    parser.add_argument('--top_n', type=int, default=50, help='Reglas con más lift a dibujar (0 = todas)')
+    parser.add_argument('--mode', choices=['auto', 'spring', 'scalable'], default='auto', help=f'scalable: layout espectral + aristas agrupadas sin flechas (auto a partir de {SCALABLE_EDGES} aristas)')
+    parser.add_argument('--layout_cache', default='auto', help='Fichero .npz con la disposición de los nodos (auto = junto al PNG)')
+    parser.add_argument('--no_layout_cache', action='store_true', help='Recalcular la disposición sin leer ni guardar caché')
+    parser.add_argument('--dpi', type=int, default=150, help='Resolución del PNG')
+    args = parser.parse_args()
 
-if rules is None or rules.empty:
-    print("⚠️ No hay reglas para graficar (ni Apriori ni fallback).")
-    exit()
-
-# Quedarse con top 50 reglas por lift
-rules = rules.sort_values(by="lift", ascending=False).head(50)
-
-# Crear grafo
-G = nx.DiGraph()
-for _, row in rules.iterrows():
-    antecedent = row["antecedents"]
-    consequent = row["consequents"]
-    lift = row["lift"]
-    conf = row["confidence"] if "confidence" in row else row["confidence_a_b"]
-
-    G.add_edge(antecedent, consequent, weight=lift, confidence=conf)
-
-# Dibujar
-plt.figure(figsize=(12, 8))
-pos = nx.spring_layout(G, k=0.5, seed=42)
-edges = nx.draw_networkx_edges(G, pos, alpha=0.5)
-nodes = nx.draw_networkx_nodes(G, pos, node_color="skyblue", node_size=800)
-labels = nx.draw_networkx_labels(G, pos, font_size=8)
-
-plt.title("Red de Reglas (Top 50 por Lift)")
-plt.axis("off")
-plt.tight_layout()
-plt.savefig(out_path)
-plt.close()
-
-print(f"✅ Red de reglas guardada en {out_path}")
\ No newline at end of file
+    if args.rules:
+        rules, out = load_rule_table(args.rules), args.out or os.path.join(os.path.dirname(args.rules) or '.', 'rules_network.png')
+    else:
+        rules = load_rules(pairs_path="")
+        out = "outputs_apriori/rules_network.png"
+        if rules is None:
+            rules = load_rules(apriori_path="")
+            out = "outputs/rules_network_fallback.png"
+        out = args.out or out
+    plot_rules_network(rules, out, top_n=args.top_n or None, mode=args.mode,
+                       layout_cache=None if args.no_layout_cache else args.layout_cache, dpi=args.dpi)
@@ -1,29 +1,24 @@
 # scripts/radar_clusters.py
+import os
+import sys
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
 from sklearn.preprocessing import MinMaxScaler
-import os
 
-rfm = pd.read_csv('outputs/rfm_clusters.csv')
-profile = rfm.groupby('Cluster')[['Recency','Frequency','Monetary']].mean()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from plots import FigureRenderer, render_radar
 
-scaler = MinMaxScaler()
-profile_scaled = pd.DataFrame(scaler.fit_transform(profile), columns=profile.columns, index=profile.index)
+def plot_radar(rfm, out_path='outputs/rfm_radar.png', figures=None):
+    """
+    Radar del perfil medio RFM por cluster (normalizado min-max). Sin ventana:
+    se dibuja con Agg; con figures (FigureRenderer) el dibujo se encola.
+    Devuelve un Future con la ruta del PNG.
+    """
+    profile = rfm.groupby('Cluster')[['Recency','Frequency','Monetary']].mean()
 
-categories = list(profile_scaled.columns)
-N = len(categories)
-angles = np.linspace(0, 2*np.pi, N, endpoint=False).tolist()
-angles += angles[:1]
+    scaler = MinMaxScaler()
+    profile_scaled = pd.DataFrame(scaler.fit_transform(profile), columns=profile.columns, index=profile.index)
+    figures = figures or FigureRenderer()
+    return figures.submit(render_radar, profile_scaled, out_path)
 
-plt.figure(figsize=(8,6))
-for idx in profile_scaled.index:
-    values = profile_scaled.loc[idx].tolist()
-    values += values[:1]
-    plt.polar(angles, values, label=f'Cluster {idx}')
-plt.thetagrids(np.degrees(angles[:-1]), categories)
-plt.title('Perfil RFM por cluster (normalizado)')
-plt.legend(loc='upper right', bbox_to_anchor=(1.2,1.1))
-os.makedirs('outputs', exist_ok=True)
-plt.savefig('outputs/rfm_radar.png', bbox_inches='tight', dpi=200)
-plt.show()
+if __name__ == "__main__":
+    print("Radar guardado en", plot_radar(pd.read_csv('outputs/rfm_clusters.csv'), 'outputs/rfm_radar.png').result())
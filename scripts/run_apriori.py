@@ -1,22 +1,24 @@
 # scripts/run_apriori.py
-import os, pandas as pd
+import os, sys, pandas as pd
 from mlxtend.frequent_patterns import apriori, association_rules
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from store import has_preprocessed, preprocessed_columns, read_preprocessed
+from rule_table import RuleTable, write_rule_table
+
 os.makedirs('outputs_apriori', exist_ok=True)
 
-# Cargar preprocesado si existe, sino el CSV original
-if os.path.exists('outputs/ventas_preprocessed.csv'):
-    df = pd.read_csv('outputs/ventas_preprocessed.csv', parse_dates=['InvoiceDate'])
+# Cargar preprocesado si existe (solo las columnas necesarias), sino el CSV original
+if has_preprocessed('outputs'):
+    # Opcional: usar 'Description_clean' si limpiaste (ver paso 4)
+    desc_col = 'Description_clean' if 'Description_clean' in preprocessed_columns('outputs') else 'Description'
+    df = read_preprocessed('outputs', columns=['InvoiceNo', desc_col, 'Quantity'])
 else:
     df = pd.read_csv('data/ventas_ejemplo.csv', encoding='ISO-8859-1', parse_dates=['InvoiceDate'])
-
-# Opcional: usar 'Description_clean' si limpiaste (ver paso 4)
-desc_col = 'Description' 
-if 'Description_clean' in df.columns:
-    desc_col = 'Description_clean'
+    desc_col = 'Description'
 
 # Crear matriz transaccional binaria
-basket = (df.groupby(['InvoiceNo', desc_col])['Quantity'].sum().unstack().fillna(0))
+basket = (df.groupby(['InvoiceNo', desc_col], observed=True)['Quantity'].sum().unstack().fillna(0))
 basket_binary = (basket > 0).astype(int)
 
 # Apriori
@@ -26,13 +28,9 @@ print(f"Itemsets frecuentes: {len(frequent_items)}")
 
 # Reglas
 min_confidence = 0.3
-rules = association_rules(frequent_items, metric='confidence', min_threshold=min_confidence)
-rules = rules.sort_values(by='lift', ascending=False).reset_index(drop=True)
-
-# Convertir conjuntos a strings
-rules['antecedents'] = rules['antecedents'].apply(lambda s: ', '.join(sorted(list(s))))
-rules['consequents'] = rules['consequents'].apply(lambda s: ', '.join(sorted(list(s))))
+rules = RuleTable.from_frame(association_rules(frequent_items, metric='confidence', min_threshold=min_confidence))
+rules = rules.sort('lift')
 
-out = 'outputs_apriori/rules_apriori.csv'
-rules.to_csv(out, index=False)
+# CSV con los conjuntos como "a, b" + tabla canónica rules_apriori.npz
+out = write_rule_table(rules, 'outputs_apriori/rules_apriori.csv')
 print(f"Reglas guardadas en {out}")
\ No newline at end of file
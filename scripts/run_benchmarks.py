@@ -0,0 +1,249 @@
+# scripts/run_benchmarks.py
+"""
+Benchmark de las etapas del pipeline sobre datos sintéticos
+(scripts/generate_synthetic.py) a varias escalas, de 10k a 100M filas.
+
+Por cada tamaño de --sizes se genera (o reutiliza) un CSV en --data_dir y se
+miden, en un proceso nuevo por tamaño para que la memoria de un tamaño no
+contamine la del siguiente:
+
+    preprocess   load_and_preprocess
+    basket       create_transaction_matrix
+    pairs        run_pairs_fallback
+    rules        run_apriori_rules (--miner)
+    rfm_cluster  compute_rfm_and_cluster
+
+Con --chunksize, preprocess + basket se sustituyen por la ingesta por chunks
+(etapa ingest: BasketAccumulator + RFMState) para tamaños que no caben en
+memoria. De cada etapa se guarda tiempo de pared y de CPU, RSS al empezar,
+al terminar y pico (src/instrumentation.py) y filas de entrada/salida.
+
+Con varios --workers (p. ej. 1 2 4) cada tamaño se mide una vez por valor
+y se muestra la aceleración de cada etapa respecto al menor número de
+workers.
+
+El resultado va a un JSON con metadatos de la máquina y versiones; con
+--compare se compara contra un JSON anterior y el código de salida es 1 si
+alguna etapa es más lenta o usa más memoria que --threshold veces la base.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'src'))
+import numpy as np
+import pandas as pd
+from instrumentation import measure_stage
+from generate_synthetic import generate_csv
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+STAGES = ['preprocess', 'basket', 'pairs', 'rules', 'rfm_cluster']
+MIN_WALL_S = 0.05
+MIN_MEM_DELTA_MB = 16
+
+def _n_trans(basket):
+    return getattr(basket, 'n_trans', None) or basket.shape[0]
+
+def dataset_path(data_dir, size, args):
+    name = f"synth_{size}_c{args.customers or 'auto'}_i{args.items}_z{args.zipf}_s{args.seed}.csv"
+    return os.path.join(data_dir, name)
+
+def customers_for(size, args):
+    # ~20 líneas por cliente salvo --customers explícito
+    return args.customers or int(np.clip(size // 20, 100, 5_000_000))
+
+def ensure_dataset(size, args):
+    path = dataset_path(args.data_dir, size, args)
+    if not os.path.exists(path):
+        logging.info(f"Generando {size:,} filas sintéticas en {path}")
+        generate_csv(path, size, customers=customers_for(size, args), items=args.items, zipf=args.zipf, seed=args.seed)
+    return path
+
+def bench_size(size, csv_path, args):
+    """Mide las etapas pedidas para un tamaño; se ejecuta en un proceso propio."""
+    from joblib.externals.loky import get_reusable_executor
+    try:
+        return _measure_stages(size, csv_path, args)
+    finally:
+        # los workers de joblib (evaluación de K con --workers > 1) siguen vivos hasta su timeout
+        # de inactividad (300 s) y el proceso del tamaño no termina hasta que se cierran
+        get_reusable_executor().shutdown(wait=True)
+
+def _measure_stages(size, csv_path, args):
+    import matplotlib
+    matplotlib.use('Agg')
+    from mineria_ejercicios import (load_and_preprocess, create_transaction_matrix, run_pairs_fallback,
+                                    run_apriori_rules, compute_rfm_and_cluster, cluster_rfm,
+                                    iter_preprocessed_chunks, BasketAccumulator, RFMState, ensure_dir)
+    outdir = ensure_dir(os.path.join(args.work_dir, str(size)))
+    records = []
+    df = basket = rfm = None
+    info = {'size': size, 'workers': args.workers}
+
+    if args.chunksize:
+        with measure_stage('ingest', records, rows_in=size, **info) as rec:
+            basket_acc, state = BasketAccumulator(), RFMState()
+            for chunk in iter_preprocessed_chunks(csv_path, chunksize=args.chunksize):
+                basket_acc.update(chunk)
+                state.update(chunk)
+            basket = basket_acc.result(representation=args.basket)
+            rfm = state.result()
+            rec['rows_out'] = _n_trans(basket)
+    else:
+        # todas las etapas parten del preprocesado
+        with measure_stage('preprocess', records, rows_in=size, **info) as rec:
+            df = load_and_preprocess(csv_path)
+            rec['rows_out'] = len(df)
+        if {'basket', 'pairs', 'rules'} & set(args.stages):
+            with measure_stage('basket', records, rows_in=len(df), **info) as rec:
+                basket = create_transaction_matrix(df, representation=args.basket)
+                rec['rows_out'] = _n_trans(basket)
+
+    if 'pairs' in args.stages:
+        with measure_stage('pairs', records, rows_in=_n_trans(basket), **info) as rec:
+            pairs = run_pairs_fallback(basket, top_n_items=args.top_n_items, outdir=outdir, workers=args.workers)
+            rec['rows_out'] = 0 if pairs is None else len(pairs)
+    if 'rules' in args.stages:
+        with measure_stage('rules', records, rows_in=_n_trans(basket), miner=args.miner, **info) as rec:
+            rules = run_apriori_rules(basket, min_support=args.min_support, min_confidence=args.min_confidence,
+                                      outdir=outdir, miner=args.miner, workers=args.workers)
+            rec['rows_out'] = 0 if rules is None else len(rules)
+    if 'rfm_cluster' in args.stages:
+        with measure_stage('rfm_cluster', records, rows_in=size if df is None else len(df), **info) as rec:
+            if rfm is None:
+                result = compute_rfm_and_cluster(df, outdir, k_min=args.k_min, k_max=args.k_max, workers=args.workers)
+            else:
+                result = cluster_rfm(rfm, outdir, k_min=args.k_min, k_max=args.k_max, workers=args.workers)
+            rec['rows_out'] = len(result[0])
+    return records
+
+def run_meta(args):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit,
+        'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+        'platform': platform.platform(), 'cpus': os.cpu_count(),
+        'args': {k: v for k, v in vars(args).items() if k not in ('compare', 'out')},
+    }
+
+def speedups(results):
+    """Tabla tamaño × etapa con el tiempo por número de workers y la aceleración respecto al menor."""
+    ok = pd.DataFrame([r for r in results if 'error' not in r])
+    if ok.empty or ok['workers'].nunique() < 2:
+        return pd.DataFrame()
+    wall = ok.pivot_table(index=['size', 'stage'], columns='workers', values='wall_s', sort=False)
+    table = wall.rename(columns=lambda w: f'wall_s_w{w}')
+    for w in wall.columns[1:]:
+        table[f'speedup_w{w}'] = (wall[wall.columns[0]] / wall[w]).round(2)
+    return table.reset_index()
+
+def compare(results, baseline, threshold):
+    """Tabla nuevo/base por (tamaño, etapa, workers); devuelve las filas que empeoran más de threshold."""
+    base = {(r['size'], r['stage'], r.get('workers', 1)): r for r in baseline['results'] if 'error' not in r}
+    rows = []
+    for r in results:
+        b = base.get((r['size'], r['stage'], r.get('workers', 1)))
+        if b is None or 'error' in r:
+            continue
+        wall = r['wall_s'] / b['wall_s'] if b['wall_s'] else np.nan
+        base_delta = (b.get('rss_peak_mb') or 0) - (b.get('rss_start_mb') or 0)
+        # la memoria solo se compara si el pico de la etapa es apreciable (ruido de RSS en etapas pequeñas)
+        peak = (r['rss_peak_mb'] - r['rss_start_mb']) / base_delta if base_delta > MIN_MEM_DELTA_MB else np.nan
+        rows.append({'size': r['size'], 'stage': r['stage'], 'workers': r.get('workers', 1),
+                     'wall_base_s': b['wall_s'], 'wall_s': r['wall_s'],
+                     'wall_ratio': round(wall, 3), 'mem_ratio': round(peak, 3)})
+    table = pd.DataFrame(rows)
+    if table.empty:
+        logging.warning("Sin etapas comunes con la base")
+        return table
+    print(table.to_string(index=False))
+    # las etapas de menos de MIN_WALL_S no se marcan: su tiempo es sobre todo ruido
+    worse = table[((table['wall_ratio'] > threshold) & (table['wall_base_s'] > MIN_WALL_S)) | (table['mem_ratio'] > threshold)]
+    for _, row in worse.iterrows():
+        logging.warning(f"Regresión en {row['stage']} ({row['size']:,} filas): "
+                        f"tiempo x{row['wall_ratio']}, memoria x{row['mem_ratio']}")
+    return worse
+
+def main(args):
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Etapas desconocidas: {', '.join(sorted(unknown))} (usar {', '.join(STAGES)})")
+    results = []
+    ctx = multiprocessing.get_context('spawn')
+    for size in args.sizes:
+        csv_path = ensure_dataset(size, args)
+        for workers in args.workers:
+            logging.info(f"Benchmark con {size:,} filas, {workers} workers")
+            run_args = argparse.Namespace(**{**vars(args), 'workers': workers})
+            start = time.perf_counter()
+            try:
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    records = pool.submit(bench_size, size, csv_path, run_args).result()
+            except Exception as e:
+                # p. ej. MemoryError o proceso muerto por el OOM killer: se anota y se sigue
+                logging.error(f"Benchmark de {size:,} filas ({workers} workers) fallido: {e!r}")
+                records = [{'size': size, 'workers': workers, 'stage': 'all', 'error': repr(e)}]
+            for rec in records:
+                if 'error' not in rec:
+                    logging.info(f"  {rec['stage']:<12} {rec['wall_s']:>9.3f}s pared {rec['cpu_s']:>9.3f}s CPU "
+                                 f"pico {rec['rss_peak_mb']:.0f} MB ({rec.get('rows_in')} → {rec.get('rows_out')})")
+            # incluye arranque y cierre del proceso: un pool que no se cierra no queda oculto en la tabla
+            total = time.perf_counter() - start
+            staged = sum(rec.get('wall_s', 0) for rec in records)
+            logging.info(f"  total {total:.1f}s ({total - staged:.1f}s fuera de las etapas)")
+            results.extend(records)
+
+    scaling = speedups(results)
+    if not scaling.empty:
+        print(scaling.to_string(index=False))
+
+    out = args.out or os.path.join(args.work_dir, f"bench_{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump({'meta': run_meta(args), 'results': results}, f, indent=2)
+    logging.info(f"Resultados del benchmark guardados en: {out}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            worse = compare(results, json.load(f), args.threshold)
+        return 1 if len(worse) else 0
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark de etapas del pipeline sobre datos sintéticos a varias escalas')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000], help='Filas por ejecución (p. ej. 10000 1000000 100000000)')
+    parser.add_argument('--stages', nargs='+', default=STAGES, help=f"Etapas a medir: {', '.join(STAGES)}")
+    parser.add_argument('--data_dir', default='data/bench', help='Carpeta de los CSV sintéticos (se reutilizan entre ejecuciones)')
+    parser.add_argument('--work_dir', default='outputs/bench', help='Carpeta de salidas de las etapas y del JSON de resultados')
+    parser.add_argument('--out', default=None, help='JSON de resultados (por defecto work_dir/bench_<fecha>.json)')
+    parser.add_argument('--compare', default=None, help='JSON de una ejecución anterior con el que comparar')
+    parser.add_argument('--threshold', type=float, default=1.2, help='Ratio nuevo/base a partir del cual se marca una regresión')
+    parser.add_argument('--customers', type=int, default=None, help='Clientes del generador (por defecto filas/20)')
+    parser.add_argument('--items', type=int, default=500, help='Productos del generador')
+    parser.add_argument('--zipf', type=float, default=1.1, help='Exponente Zipf del generador')
+    parser.add_argument('--seed', type=int, default=42, help='Semilla del generador')
+    parser.add_argument('--chunksize', type=int, default=None, help='Ingesta por chunks de N filas (para tamaños que no caben en memoria)')
+    parser.add_argument('--basket', choices=['sparse','bitset','dense'], default='sparse', help='Representación de la matriz transaccional')
+    parser.add_argument('--miner', choices=['apriori','fpgrowth','eclat'], default='fpgrowth', help='Motor de la etapa rules')
+    parser.add_argument('--min_support', type=float, default=0.01, help='Min support de la etapa rules')
+    parser.add_argument('--min_confidence', type=float, default=0.3, help='Min confidence de la etapa rules')
+    parser.add_argument('--top_n_items', type=int, default=50, help='Items de la etapa pairs')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1], help='Procesos para minería y evaluación de K; con varios valores (1 2 4) se mide la aceleración')
+    parser.add_argument('--k_min', type=int, default=2, help='K mínimo para clustering')
+    parser.add_argument('--k_max', type=int, default=8, help='K máximo para clustering')
+    args = parser.parse_args()
+
+    sys.exit(main(args))
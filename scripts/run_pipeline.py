@@ -0,0 +1,143 @@
+# scripts/run_pipeline.py
+"""
+Punto de entrada único del flujo completo (mineria_ejercicios + scripts/).
+
+Declara las etapas como un grafo de dependencias (src/dag.py): los artefactos
+pasan en memoria de una etapa a otra (sin volver a leer CSV) y las ramas
+independientes se ejecutan en paralelo. Solo se calculan las etapas que
+necesitan los objetivos pedidos con --targets:
+
+    preprocessed → basket → rules → network / interpretations / top5
+                 ↘ rfm → clusters → radar
+    top_items (basket); report (todo lo anterior)
+
+Las figuras se dibujan con Agg sin pyplot (src/plots.py). Con
+--plot_workers > 1 se dibujan en un pool de procesos a la vez que el resto
+de etapas; con 1 se dibujan en el hilo de la etapa, de una en una.
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from dag import DAG
+from plots import FigureRenderer
+from rule_table import RANK_METRICS
+from mineria_ejercicios import (ensure_dir, load_and_preprocess, save_preprocessed, create_transaction_matrix,
+                                plot_top_items_support, run_apriori_rules, run_pairs_fallback, compute_rfm, cluster_rfm)
+from plot_rules_network import plot_rules_network
+from radar_clusters import plot_radar
+from generate_rule_interpretations import interpret_rules, write_interpretations
+from top5_rules_to_txt import top_rules_text
+from generate_report_extended import build_report
+
+def build_pipeline(args, figures):
+    outdir = ensure_dir(args.outdir)
+    dag = DAG()
+    # matplotlib no es thread-safe: sin pool de figuras, las etapas que dibujan no se solapan
+    draws_in_thread = figures.workers <= 1
+    # minería y clustering con --workers > 1 arrancan procesos: se ejecutan sin otras etapas en marcha
+    starts_processes = args.workers > 1
+
+    @dag.stage()
+    def preprocessed():
+        df = load_and_preprocess(args.input, clean_descriptions=True)
+        save_preprocessed(df, outdir, fmt=args.preprocessed_format)
+        return df
+
+    @dag.stage(deps=['preprocessed'])
+    def basket(preprocessed):
+        return create_transaction_matrix(preprocessed, representation=args.basket, item_col=args.item_col)
+
+    @dag.stage(deps=['basket'], exclusive=draws_in_thread)
+    def top_items(basket):
+        return plot_top_items_support(basket, os.path.join(outdir, 'top10_support.png'), top_n=10,
+                                      figures=figures).result()
+
+    @dag.stage(deps=['basket'], processes=starts_processes)
+    def rules(basket):
+        if args.miner == 'pairs':
+            return run_pairs_fallback(basket, top_n_items=args.top_n_items, outdir=outdir, workers=args.workers,
+                                      top_k=args.rules_top_k, rank_by=args.rank_by)
+        return run_apriori_rules(basket, min_support=args.min_support, min_confidence=args.min_confidence,
+                                 outdir=outdir, miner=args.miner, workers=args.workers,
+                                 top_k=args.rules_top_k, rank_by=args.rank_by)
+
+    @dag.stage(deps=['rules'], exclusive=draws_in_thread)
+    def network(rules):
+        return figures.submit(plot_rules_network, rules, os.path.join(outdir, 'rules_network.png')).result()
+
+    @dag.stage(deps=['rules'])
+    def interpretations(rules):
+        if rules is None or rules.empty:
+            return None
+        text = interpret_rules(rules, source=f"{args.miner} (en memoria)")
+        write_interpretations(text, os.path.join(outdir, 'rules_interpretations.txt'))
+        return text
+
+    @dag.stage(deps=['rules'])
+    def top5(rules):
+        if rules is None or rules.empty:
+            return None
+        text = top_rules_text(rules)
+        with open(os.path.join(outdir, 'top5_rules.txt'), 'w', encoding='utf-8') as f:
+            f.write(text)
+        return text
+
+    @dag.stage(deps=['preprocessed'])
+    def rfm(preprocessed):
+        return compute_rfm(preprocessed)
+
+    @dag.stage(deps=['rfm'], exclusive=draws_in_thread, processes=starts_processes)
+    def clusters(rfm):
+        return cluster_rfm(rfm, outdir, k_min=args.k_min, k_max=args.k_max, workers=args.workers, figures=figures)
+
+    @dag.stage(deps=['clusters'], exclusive=draws_in_thread)
+    def radar(clusters):
+        return plot_radar(clusters[0], os.path.join(outdir, 'rfm_radar.png'), figures=figures).result()
+
+    @dag.stage(deps=['preprocessed', 'rules', 'interpretations', 'clusters', 'top_items', 'network', 'radar'])
+    def report(preprocessed, rules, interpretations, clusters, top_items, network, radar):
+        figures.wait()  # el scatter RFM de clusters se encola sin esperar
+        # todo en memoria: reglas, perfiles y rutas de figuras vienen de las etapas anteriores
+        images = [(top_items, 'Top 10 items por support'), (network, 'Red de reglas'),
+                  (radar, 'Radar perfil por cluster'),
+                  (os.path.join(outdir, 'rfm_scatter.png'), 'Scatter Recency vs Monetary')]
+        return build_report(doc_path=[os.path.join(outdir, f'informe_minero_extended.{fmt}') for fmt in args.report_formats],
+                            outdir=outdir, apriori_dir=outdir, preprocessed=preprocessed, rules=rules,
+                            interpretations=interpretations, profile=clusters[1],
+                            images=[(path, caption) for path, caption in images if path],
+                            customers=clusters[0] if args.full_tables else None,
+                            max_rules=None if args.full_tables else 10)
+
+    return dag
+
+def main(args):
+    with FigureRenderer(workers=args.plot_workers) as figures:
+        dag = build_pipeline(args, figures)
+        dag.run(args.targets, workers=args.parallel_stages)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Flujo completo como grafo de etapas (solo se calculan los objetivos pedidos)')
+    parser.add_argument('--input', required=True, help='Path al CSV de transacciones (ventas_ejemplo.csv)')
+    parser.add_argument('--outdir', default='outputs', help='Carpeta donde guardar resultados')
+    parser.add_argument('--targets', nargs='+', default=['report'], help='Etapas objetivo: preprocessed, basket, top_items, rules, network, interpretations, top5, rfm, clusters, radar, report')
+    parser.add_argument('--parallel_stages', type=int, default=4, help='Etapas independientes ejecutadas a la vez (1 = serie)')
+    parser.add_argument('--plot_workers', type=int, default=1, help='Procesos que dibujan las figuras (1 = en el hilo de cada etapa)')
+    parser.add_argument('--preprocessed_format', choices=['parquet','csv'], default='parquet', help='Formato de ventas_preprocessed')
+    parser.add_argument('--item_col', default='Description_clean', help='Columna de items para la cesta (Description o Description_clean)')
+    parser.add_argument('--basket', choices=['sparse','bitset','dense'], default='sparse', help='Representación de la matriz transaccional')
+    parser.add_argument('--miner', choices=['apriori','fpgrowth','eclat','pairs'], default='apriori', help='Motor de reglas')
+    parser.add_argument('--min_support', type=float, default=0.02, help='Min support para itemsets')
+    parser.add_argument('--min_confidence', type=float, default=0.3, help='Min confidence para reglas')
+    parser.add_argument('--top_n_items', type=int, default=50, help='Número máximo de items en reglas por pares')
+    parser.add_argument('--rules_top_k', type=int, default=0, help='Conservar solo las K mejores reglas por --rank_by (0 = todas)')
+    parser.add_argument('--rank_by', choices=RANK_METRICS, default='lift', help='Métrica para ordenar las reglas y elegir las top K')
+    parser.add_argument('--workers', type=int, default=1, help='Procesos para minería y evaluación de K')
+    parser.add_argument('--report_formats', nargs='+', choices=['docx','html','md'], default=['docx'], help='Formatos del informe final')
+    parser.add_argument('--full_tables', action='store_true', help='Informe con todas las reglas y la tabla completa de clientes por cluster')
+    parser.add_argument('--k_min', type=int, default=2, help='K mínimo para evaluación de clusters')
+    parser.add_argument('--k_max', type=int, default=8, help='K máximo para evaluación de clusters')
+    args = parser.parse_args()
+
+    main(args)
@@ -1,20 +1,22 @@
-import pandas as pd
 import os
+import sys
 
-# Cambia la ruta según sea apriori o fallback
-apriori_path = 'outputs_apriori/rules_apriori.csv'
-fallback_path = 'outputs/rules_pairs_top.csv'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from rule_table import as_rule_table, load_rule_table
 
-if os.path.exists(apriori_path):
-    rules = pd.read_csv(apriori_path)
-    cols = ['antecedents','consequents','support','confidence','lift']
-    rules = rules[cols].head(5)
-else:
-    rules = pd.read_csv(fallback_path)
-    cols = ['antecedent','consequent','support','confidence_a_b','lift']
-    rules = rules[cols].head(5)
+def top_rules_text(rules, n=5):
+    """Tabla de texto con las n primeras reglas (RuleTable o DataFrame, formato Apriori o fallback pares)."""
+    table = as_rule_table(rules).head(n)
+    return table.to_frame()[table.columns()].to_string(index=False)
 
-out_txt = 'outputs/top5_rules.txt'
-with open(out_txt, 'w', encoding='utf-8') as f:
-    f.write(rules.to_string(index=False))
-print('Top 5 reglas guardadas en', out_txt)
+if __name__ == "__main__":
+    # Apriori si existe, sino el fallback por pares
+    apriori_path = 'outputs_apriori/rules_apriori.csv'
+    fallback_path = 'outputs/rules_pairs_top.csv'
+
+    rules = load_rule_table(apriori_path) or load_rule_table(fallback_path)
+
+    out_txt = 'outputs/top5_rules.txt'
+    with open(out_txt, 'w', encoding='utf-8') as f:
+        f.write(top_rules_text(rules))
+    print('Top 5 reglas guardadas en', out_txt)
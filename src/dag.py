@@ -0,0 +1,106 @@
+"""
+Ejecutor perezoso de un grafo de etapas (DAG).
+
+Cada etapa declara de qué etapas depende y recibe sus resultados en memoria
+como argumentos con el mismo nombre; no hay CSV intermedios entre etapas.
+run(targets) calcula solo las etapas necesarias para los objetivos pedidos y
+lanza en paralelo (hilos) las que ya tienen sus dependencias listas, p. ej.
+reglas → red de reglas a la vez que RFM → radar. Las etapas marcadas
+exclusive se serializan entre sí pero sí se solapan con las demás: son las
+que dibujan en su propio hilo (matplotlib no es thread-safe) cuando no hay
+pool de figuras. Las marcadas processes (las que arrancan un pool de
+procesos: minería y clustering con --workers > 1) se ejecutan solas: no se
+lanzan mientras otra etapa está en marcha ni se lanza ninguna mientras
+duran, para que ningún hilo tenga un lock tomado al crear procesos.
+"""
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+@dataclass
+class Stage:
+    name: str
+    fn: object
+    deps: tuple = ()
+    exclusive: bool = False
+    processes: bool = False
+
+class DAG:
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name=None, deps=(), exclusive=False, processes=False):
+        """Decorador: registra fn como etapa; sus parámetros son los nombres de deps."""
+        def register(fn):
+            stage_name = name or fn.__name__
+            if stage_name in self.stages:
+                raise ValueError(f"Etapa duplicada: {stage_name}")
+            self.stages[stage_name] = Stage(stage_name, fn, tuple(deps), exclusive, processes)
+            return fn
+        return register
+
+    def plan(self, targets):
+        """Etapas necesarias para targets, en orden topológico."""
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name not in self.stages:
+                raise KeyError(f"Etapa desconocida: {name} (disponibles: {', '.join(self.stages)})")
+            if name in visiting:
+                raise ValueError(f"Ciclo en el grafo de etapas en: {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def _call(self, stage, results):
+        kwargs = {dep: results[dep] for dep in stage.deps}
+        start = time.perf_counter()
+        if stage.exclusive:
+            with self._lock:
+                value = stage.fn(**kwargs)
+        else:
+            value = stage.fn(**kwargs)
+        logging.info(f"Etapa {stage.name} completada en {time.perf_counter() - start:.2f}s")
+        return value
+
+    def run(self, targets, workers=4):
+        """
+        Ejecuta las etapas que necesitan los targets y devuelve {etapa: resultado}.
+        Con workers=1 se ejecuta en serie en el orden del plan.
+        """
+        order = self.plan(targets)
+        logging.info(f"Plan de ejecución: {' → '.join(order)}")
+        results = {}
+        if workers <= 1:
+            for name in order:
+                results[name] = self._call(self.stages[name], results)
+            return results
+
+        pending = list(order)
+        running = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while pending or running:
+                ready = [n for n in pending if all(d in results for d in self.stages[n].deps)]
+                for name in ready:
+                    if running and (self.stages[name].processes
+                                    or any(self.stages[r].processes for r in running.values())):
+                        continue  # espera a que la etapa con procesos pueda correr sola
+                    pending.remove(name)
+                    running[pool.submit(self._call, self.stages[name], results)] = name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    # result() relanza la excepción de la etapa y aborta la ejecución
+                    results[running.pop(future)] = future.result()
+        return results
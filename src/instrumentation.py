@@ -0,0 +1,135 @@
+"""
+Medición por etapa: tiempo de pared, tiempo de CPU y memoria (RSS actual y
+pico muestreado durante la etapa). La usan el benchmark
+(scripts/run_benchmarks.py) y el informe de ejecución del pipeline
+(RunReport → run_report.json, con volcados de cProfile por etapa si se pide).
+CPU y RSS son los del proceso principal: los workers de joblib o de los
+pools de minería no se suman.
+"""
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import logging
+import platform
+import threading
+from contextlib import contextmanager
+
+def rss_mb():
+    """RSS del proceso en MB (/proc en Linux; pico de resource en otros Unix; None si no hay)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024**2
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024**2 if peak > 1 << 32 else peak / 1024  # bytes en macOS, KB en Linux
+    except ImportError:
+        return None
+
+class _PeakSampler(threading.Thread):
+    # hilo que muestrea el RSS cada `interval` segundos y guarda el máximo
+    def __init__(self, interval=0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_mb()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            current = rss_mb()
+            if current is not None and (self.peak is None or current > self.peak):
+                self.peak = current
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        current = rss_mb()
+        if current is not None and (self.peak is None or current > self.peak):
+            self.peak = current
+        return self.peak
+
+@contextmanager
+def measure_stage(stage, records=None, **info):
+    """
+    with measure_stage('basket', records, rows_in=n) as rec: ...
+    Rellena rec (dict) con wall_s, cpu_s, rss_start_mb, rss_end_mb y
+    rss_peak_mb, más los campos de info y los que la etapa añada a rec
+    (p. ej. rows_out). Si se pasa records (lista) se añade rec al final.
+    """
+    rec = {'stage': stage, **info}
+    sampler = _PeakSampler()
+    rec['rss_start_mb'] = sampler.peak
+    sampler.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield rec
+    except BaseException as e:
+        rec['error'] = repr(e)
+        raise
+    finally:
+        rec['wall_s'] = round(time.perf_counter() - wall, 4)
+        rec['cpu_s'] = round(time.process_time() - cpu, 4)
+        rec['rss_peak_mb'] = sampler.stop()
+        rec['rss_end_mb'] = rss_mb()
+        if records is not None:
+            records.append(rec)
+
+class RunReport:
+    """
+    Informe estructurado de una ejecución: una entrada de measure_stage por
+    etapa (tiempos, RSS, filas de entrada/salida). Con profile_dir cada etapa
+    se ejecuta además bajo cProfile y se vuelca en <profile_dir>/<etapa>.prof
+    (para snakeviz / pstats) y en un resumen <etapa>.txt ordenado por tiempo
+    acumulado. Las etapas no se anidan (cProfile admite un perfilador activo).
+    """
+    def __init__(self, profile_dir=None, top_functions=30):
+        self.stages = []
+        self.profile_dir = profile_dir
+        self.top_functions = top_functions
+        self.started = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self._t0 = time.perf_counter()
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    @contextmanager
+    def stage(self, name, **info):
+        profiler = cProfile.Profile() if self.profile_dir else None
+        with measure_stage(name, self.stages, **info) as rec:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                yield rec
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    rec['profile'] = self._dump(name, profiler)
+        peak = rec['rss_peak_mb']
+        logging.info(f"Etapa {name}: {rec['wall_s']:.3f}s pared, {rec['cpu_s']:.3f}s CPU"
+                     + (f", RSS pico {peak:.1f} MB" if peak is not None else ""))
+
+    def _dump(self, name, profiler):
+        path = os.path.join(self.profile_dir, f"{name}.prof")
+        profiler.dump_stats(path)
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(self.top_functions)
+        with open(os.path.join(self.profile_dir, f"{name}.txt"), 'w', encoding='utf-8') as f:
+            f.write(text.getvalue())
+        return path
+
+    def to_dict(self, **meta):
+        return {
+            'started': self.started, 'total_wall_s': round(time.perf_counter() - self._t0, 4),
+            'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            **meta, 'stages': self.stages,
+        }
+
+    def save(self, path, **meta):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(**meta), f, indent=2, default=str)
+        logging.info(f"Informe de ejecución guardado en: {path}")
+        return path
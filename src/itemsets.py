@@ -0,0 +1,481 @@
+"""
+Minería nativa de itemsets frecuentes (FP-Growth y Eclat) y generación de
+reglas de asociación con las mismas métricas que mlxtend.association_rules
+(como RuleTable, ver rule_table.py).
+
+Los mineros trabajan directamente sobre la matriz transaccional (CSR o
+ndarray facturas x items) y devuelven un dict {tupla de índices de item: conteo}.
+También hay una representación en bitsets (uint64 por item, una fila de bits
+por item sobre las facturas) donde el soporte es AND + popcount.
+
+Con workers > 1 el espacio de búsqueda se reparte en un pool de procesos:
+por item prefijo (FP-Growth / Eclat), por bloques de filas de la matriz de
+co-ocurrencia (pares) o por bloques de itemsets (reglas). Los datos
+transaccionales se comparten en memoria compartida y los resultados se
+combinan en el mismo orden que la ejecución serie, por lo que la salida es
+idéntica.
+"""
+import math
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy import sparse
+
+from rule_table import RuleTable
+
+# métricas de las reglas en el orden de columnas de mlxtend.association_rules (+ cosine)
+RULE_METRICS = ['antecedent support', 'consequent support', 'support', 'confidence', 'lift',
+                'representativity', 'leverage', 'conviction', 'zhangs_metric', 'jaccard',
+                'certainty', 'kulczynski', 'cosine']
+
+# ---------------- utilidades ----------------
+def min_count_for_support(min_support, n_trans):
+    """Conteo mínimo c tal que c / n_trans >= min_support (igual que mlxtend)."""
+    c = max(int(math.ceil(min_support * n_trans)), 1)
+    if c > 1 and (c - 1) / n_trans >= min_support:
+        c -= 1
+    return c
+
+def _as_csr(X):
+    X = sparse.csr_matrix(X, dtype=bool)
+    X.sort_indices()
+    return X
+
+# ---------------- paralelo ----------------
+# estado de cada proceso worker: arrays adjuntados desde memoria compartida + parámetros
+_SHARED = {}
+_SHARED_HANDLES = []
+
+def _init_worker(specs, params):
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _SHARED_HANDLES.append(shm)
+        _SHARED[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _SHARED.update(params)
+
+def run_parallel(fn, tasks, workers, arrays=None, **params):
+    """
+    Ejecuta fn(task) para cada task en un pool de `workers` procesos.
+    `arrays` (dict nombre -> ndarray) se copia una vez a memoria compartida y
+    queda disponible en _SHARED dentro de cada worker junto con `params`.
+    Devuelve los resultados en el orden de `tasks` (merge determinista).
+    Los workers arrancan con spawn: un fork desde un proceso con hilos (DAG
+    de etapas, muestreador de RSS, joblib) puede heredar un lock tomado y
+    quedarse bloqueado.
+    """
+    handles, specs = [], {}
+    try:
+        for name, a in (arrays or {}).items():
+            a = np.ascontiguousarray(a)
+            shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+            handles.append(shm)
+            np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[...] = a
+            specs[name] = (shm.name, a.shape, a.dtype.str)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_worker, initargs=(specs, params)) as pool:
+            return list(pool.map(fn, tasks))
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+
+def _balanced_blocks(work, n_blocks):
+    """Parte range(len(work)) en hasta n_blocks rangos contiguos con trabajo similar."""
+    if len(work) == 0:
+        return []
+    cum = np.cumsum(work, dtype=np.float64)
+    cuts = np.searchsorted(cum, np.linspace(0, cum[-1], n_blocks + 1)[1:-1], side='right')
+    bounds = np.unique(np.concatenate([[0], cuts, [len(work)]]))
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+def _merge_dicts(parts):
+    out = {}
+    for part in parts:
+        out.update(part)
+    return out
+
+# ---------------- bitsets ----------------
+def pack_columns(X, block_bytes=64 * 1024**2):
+    """
+    Empaqueta la pertenencia de cada item (columna) en bits con np.packbits.
+    Devuelve un array (n_items, n_words) uint64; el bit r corresponde a la
+    factura r. Se procesa por bloques de items para acotar la memoria.
+    """
+    Xc = sparse.csc_matrix(X, dtype=bool)
+    n_trans, n_items = Xc.shape
+    n_words = (n_trans + 63) // 64
+    bits = np.zeros((n_items, n_words), dtype=np.uint64)
+    block = max(1, block_bytes // max(n_trans, 1))
+    for start in range(0, n_items, block):
+        dense = Xc[:, start:start+block].T.toarray()
+        packed = np.packbits(dense, axis=1, bitorder='little')
+        buf = np.zeros((dense.shape[0], n_words * 8), dtype=np.uint8)
+        buf[:, :packed.shape[1]] = packed
+        bits[start:start+block] = buf.view('<u8')
+    return bits
+
+def unpack_columns(bits, n_trans, block_bytes=64 * 1024**2):
+    """Inversa de pack_columns: devuelve la matriz CSR bool (n_trans, n_items)."""
+    blocks = []
+    block = max(1, block_bytes // max(n_trans, 1))
+    for start in range(0, bits.shape[0], block):
+        chunk = np.ascontiguousarray(bits[start:start+block]).astype('<u8', copy=False)
+        dense = np.unpackbits(chunk.view(np.uint8), axis=1, count=n_trans, bitorder='little')
+        blocks.append(sparse.csc_matrix(dense.astype(bool).T))
+    if not blocks:
+        return sparse.csr_matrix((n_trans, 0), dtype=bool)
+    return sparse.hstack(blocks, format='csr')
+
+def popcount(bits):
+    """Número de bits a 1 por fila (último eje) de un array uint64."""
+    return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+
+def _concat_pairs(parts):
+    parts = [p for p in parts if len(p[0])]
+    if not parts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    return tuple(np.concatenate([p[k] for p in parts]) for k in range(3))
+
+def _pair_block_bitset(sub, start, stop):
+    rows, cols, counts = [], [], []
+    for p in range(start, min(stop, len(sub) - 1)):
+        c = popcount(sub[p+1:] & sub[p])
+        nz = np.flatnonzero(c)
+        rows.append(np.full(len(nz), p, dtype=np.int64))
+        cols.append(nz + p + 1)
+        counts.append(c[nz])
+    return _concat_pairs(list(zip(rows, cols, counts)))
+
+def _pair_block_bitset_task(block):
+    return _pair_block_bitset(_SHARED['sub'], *block)
+
+def pair_counts_bitset(bits, idx, workers=1):
+    """
+    Co-ocurrencias de los pares (p, q), p < q, entre los items idx (en ese
+    orden) usando AND + popcount. Devuelve (filas, columnas, conteos) solo
+    para los pares con conteo > 0, en orden fila-columna.
+    """
+    sub = bits[idx]
+    if workers <= 1:
+        return _pair_block_bitset(sub, 0, len(sub))
+    blocks = _balanced_blocks(np.arange(len(sub), 0, -1) - 1, workers * 4)
+    return _concat_pairs(run_parallel(_pair_block_bitset_task, blocks, workers, arrays={'sub': sub}))
+
+def _pair_block_sparse(X, start, stop):
+    block = sparse.coo_matrix(X[:, start:stop].T @ X)
+    rows = block.row.astype(np.int64) + start
+    keep = block.col > rows  # solo triángulo superior
+    rows, cols, counts = rows[keep], block.col[keep].astype(np.int64), block.data[keep].astype(np.int64)
+    order = np.lexsort((cols, rows))
+    return rows[order], cols[order], counts[order]
+
+def _pair_block_sparse_task(block):
+    X = sparse.csc_matrix((_SHARED['data'], _SHARED['indices'], _SHARED['indptr']), shape=_SHARED['shape'])
+    return _pair_block_sparse(X, *block)
+
+def pair_counts_sparse(X, workers=1):
+    """
+    Co-ocurrencias (p, q), p < q, entre las columnas de X (facturas x items
+    ya podados) con producto disperso. Mismo formato que pair_counts_bitset;
+    con workers > 1 cada proceso calcula un bloque de filas de X.T @ X.
+    """
+    X = sparse.csc_matrix(X, dtype=np.int32)
+    X.sort_indices()
+    n_items = X.shape[1]
+    if workers <= 1:
+        return _pair_block_sparse(X, 0, n_items)
+    blocks = _balanced_blocks(np.arange(n_items, 0, -1) - 1, workers * 4)
+    arrays = {'data': X.data, 'indices': X.indices, 'indptr': X.indptr}
+    return _concat_pairs(run_parallel(_pair_block_sparse_task, blocks, workers, arrays=arrays, shape=X.shape))
+
+# ---------------- FP-Growth ----------------
+class _FPNode:
+    __slots__ = ('item', 'count', 'parent', 'children')
+
+    def __init__(self, item, parent):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children = {}
+
+def _build_fptree(transactions, min_count):
+    """
+    Construye el FP-tree a partir de transacciones ponderadas [(items, conteo)].
+    Devuelve (header, frecuencias, rank) con los nodos de cada item en header.
+    """
+    counts = defaultdict(int)
+    for items, c in transactions:
+        for i in items:
+            counts[i] += c
+    frequent = {i: c for i, c in counts.items() if c >= min_count}
+    rank = {i: r for r, i in enumerate(sorted(frequent, key=lambda i: (-frequent[i], i)))}
+
+    root = _FPNode(None, None)
+    header = defaultdict(list)
+    for items, c in transactions:
+        path = sorted((i for i in items if i in rank), key=rank.__getitem__)
+        node = root
+        for i in path:
+            child = node.children.get(i)
+            if child is None:
+                child = _FPNode(i, node)
+                node.children[i] = child
+                header[i].append(child)
+            child.count += c
+            node = child
+    return header, frequent, rank
+
+def _fpgrowth(transactions, min_count, suffix, out, max_len):
+    header, frequent, rank = _build_fptree(transactions, min_count)
+    # de menos a más frecuente: los patrones condicionales son más pequeños
+    for item in sorted(frequent, key=rank.__getitem__, reverse=True):
+        itemset = suffix + (item,)
+        out[tuple(sorted(itemset))] = frequent[item]
+        if max_len and len(itemset) >= max_len:
+            continue
+        conditional = []
+        for node in header[item]:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                conditional.append((path, node.count))
+        if conditional:
+            _fpgrowth(conditional, min_count, itemset, out, max_len)
+
+def _fpgrowth_prefix_task(item):
+    """
+    Rama de FP-Growth para un item prefijo: su base condicional son las
+    transacciones que lo contienen, restringidas a los items de rank menor
+    (los que quedarían por encima en el FP-tree global).
+    """
+    indptr, indices, rank = _SHARED['indptr'], _SHARED['indices'], _SHARED['rank']
+    rows = _SHARED['c_indices'][_SHARED['c_indptr'][item]:_SHARED['c_indptr'][item+1]]
+    grouped = defaultdict(int)
+    for r in rows:
+        row = indices[indptr[r]:indptr[r+1]]
+        row = tuple(row[rank[row] < rank[item]].tolist())
+        if row:
+            grouped[row] += 1
+    out = {(int(item),): len(rows)}
+    max_len = _SHARED['max_len']
+    if grouped and not (max_len and max_len <= 1):
+        _fpgrowth(list(grouped.items()), _SHARED['min_count'], (int(item),), out, max_len)
+    return out
+
+def _fpgrowth_parallel(X, item_counts, min_count, max_len, workers):
+    frequent = np.flatnonzero(item_counts >= min_count)
+    # mismo rank que _build_fptree: frecuencia descendente, desempate por item
+    ordered = frequent[np.lexsort((frequent, -item_counts[frequent]))]
+    rank = np.full(X.shape[1], np.iinfo(np.int64).max, dtype=np.int64)
+    rank[ordered] = np.arange(len(ordered))
+    Xc = X.tocsc()
+    Xc.sort_indices()
+    arrays = {'indptr': X.indptr, 'indices': X.indices, 'rank': rank,
+              'c_indptr': Xc.indptr, 'c_indices': Xc.indices}
+    # de menos a más frecuente, como el bucle serie
+    parts = run_parallel(_fpgrowth_prefix_task, ordered[::-1].tolist(), workers,
+                         arrays=arrays, min_count=min_count, max_len=max_len)
+    return _merge_dicts(parts)
+
+def fpgrowth_counts(X, min_count, max_len=None, workers=1):
+    """FP-Growth sobre la matriz transaccional. Sin tablas de candidatos."""
+    X = _as_csr(X)
+    item_counts = np.asarray(X.sum(axis=0)).ravel()
+    if workers > 1:
+        return _fpgrowth_parallel(X, item_counts, min_count, max_len, workers)
+    keep = item_counts >= min_count
+    # agrupar transacciones idénticas (tras filtrar items infrecuentes)
+    grouped = defaultdict(int)
+    indptr, indices = X.indptr, X.indices
+    for r in range(X.shape[0]):
+        row = indices[indptr[r]:indptr[r+1]]
+        row = tuple(row[keep[row]].tolist())
+        if row:
+            grouped[row] += 1
+    out = {}
+    _fpgrowth(list(grouped.items()), min_count, (), out, max_len)
+    return out
+
+# ---------------- Eclat (vertical) ----------------
+def _eclat_branch(prefix, members, k, min_count, out, max_len):
+    item, tids = members[k]
+    itemset = prefix + (item,)
+    out[tuple(sorted(itemset))] = len(tids)
+    if max_len and len(itemset) >= max_len:
+        return
+    extensions = []
+    for other, other_tids in members[k+1:]:
+        common = np.intersect1d(tids, other_tids, assume_unique=True)
+        if len(common) >= min_count:
+            extensions.append((other, common))
+    if extensions:
+        _eclat(itemset, extensions, min_count, out, max_len)
+
+def _eclat(prefix, members, min_count, out, max_len):
+    for k in range(len(members)):
+        _eclat_branch(prefix, members, k, min_count, out, max_len)
+
+def _eclat_members(items, indptr, indices):
+    return [(int(i), indices[indptr[j]:indptr[j+1]]) for j, i in enumerate(items)]
+
+def _eclat_prefix_task(k):
+    members = _eclat_members(_SHARED['items'], _SHARED['indptr'], _SHARED['indices'])
+    out = {}
+    _eclat_branch((), members, k, _SHARED['min_count'], out, _SHARED['max_len'])
+    return out
+
+def eclat_counts(X, min_count, max_len=None, workers=1):
+    """Eclat con listas de transacciones (tidlists) por item."""
+    Xc = sparse.csc_matrix(X, dtype=bool)
+    Xc.sort_indices()
+    item_counts = np.diff(Xc.indptr)
+    frequent = np.flatnonzero(item_counts >= min_count)
+    # orden ascendente por soporte: clases de equivalencia más pequeñas primero
+    frequent = frequent[np.argsort(item_counts[frequent], kind='stable')]
+    Xf = Xc[:, frequent]
+    if workers > 1:
+        arrays = {'items': frequent, 'indptr': Xf.indptr, 'indices': Xf.indices}
+        parts = run_parallel(_eclat_prefix_task, range(len(frequent)), workers,
+                             arrays=arrays, min_count=min_count, max_len=max_len)
+        return _merge_dicts(parts)
+    out = {}
+    _eclat((), _eclat_members(frequent, Xf.indptr, Xf.indices), min_count, out, max_len)
+    return out
+
+def _eclat_bitset_branch(prefix, items, bits, counts, k, min_count, out, max_len):
+    itemset = prefix + (items[k],)
+    out[tuple(sorted(itemset))] = int(counts[k])
+    if (max_len and len(itemset) >= max_len) or k + 1 == len(items):
+        return
+    # AND del item con todos los miembros restantes de la clase a la vez
+    common = bits[k+1:] & bits[k]
+    common_counts = popcount(common)
+    keep = np.flatnonzero(common_counts >= min_count)
+    if len(keep):
+        _eclat_bitset(itemset, [items[k+1+j] for j in keep], common[keep],
+                      common_counts[keep], min_count, out, max_len)
+
+def _eclat_bitset(prefix, items, bits, counts, min_count, out, max_len):
+    for k in range(len(items)):
+        _eclat_bitset_branch(prefix, items, bits, counts, k, min_count, out, max_len)
+
+def _eclat_bitset_prefix_task(k):
+    out = {}
+    _eclat_bitset_branch((), _SHARED['items'].tolist(), _SHARED['bits'], _SHARED['counts'], k,
+                         _SHARED['min_count'], out, _SHARED['max_len'])
+    return out
+
+def eclat_bitset_counts(bits, min_count, max_len=None, workers=1):
+    """Eclat sobre bitsets (n_items, n_words): soporte = popcount del AND."""
+    item_counts = popcount(bits)
+    frequent = np.flatnonzero(item_counts >= min_count)
+    frequent = frequent[np.argsort(item_counts[frequent], kind='stable')]
+    if workers > 1:
+        arrays = {'items': frequent, 'bits': bits[frequent], 'counts': item_counts[frequent]}
+        parts = run_parallel(_eclat_bitset_prefix_task, range(len(frequent)), workers,
+                             arrays=arrays, min_count=min_count, max_len=max_len)
+        return _merge_dicts(parts)
+    out = {}
+    _eclat_bitset((), frequent.tolist(), bits[frequent], item_counts[frequent], min_count, out, max_len)
+    return out
+
+MINERS = {
+    'fpgrowth': fpgrowth_counts,
+    'eclat': eclat_counts,
+}
+
+def mine_frequent_itemsets(X, min_support, algorithm='fpgrowth', max_len=None, workers=1):
+    """
+    Itemsets frecuentes con el minero nativo indicado.
+    Devuelve dict {tupla ordenada de índices de item: conteo}.
+    """
+    if algorithm not in MINERS:
+        raise ValueError(f"Minero no soportado: {algorithm}")
+    min_count = min_count_for_support(min_support, X.shape[0])
+    return MINERS[algorithm](X, min_count, max_len=max_len, workers=workers)
+
+def mine_frequent_itemsets_bitset(bits, n_trans, min_support, max_len=None, workers=1):
+    """Igual que mine_frequent_itemsets pero sobre bitsets empaquetados (Eclat)."""
+    return eclat_bitset_counts(bits, min_count_for_support(min_support, n_trans),
+                               max_len=max_len, workers=workers)
+
+# ---------------- reglas ----------------
+def _rule_candidates(itemsets, counts):
+    ants, cons, c_ac, c_a, c_c = [], [], [], [], []
+    for itemset, count in itemsets:
+        full = frozenset(itemset)
+        for r in range(1, len(itemset)):
+            for ant in combinations(itemset, r):
+                con = tuple(sorted(full.difference(ant)))
+                ants.append(ant)
+                cons.append(con)
+                c_ac.append(count)
+                c_a.append(counts[ant])
+                c_c.append(counts[con])
+    return ants, cons, c_ac, c_a, c_c
+
+def _rule_candidates_task(chunk):
+    return _rule_candidates(chunk, _SHARED['counts'])
+
+def association_rules_from_counts(counts, n_trans, min_confidence, item_names, workers=1):
+    """
+    Genera reglas A -> C para todos los itemsets frecuentes de tamaño >= 2.
+    Las métricas se calculan de forma vectorizada con las mismas fórmulas que
+    mlxtend, más cosine = support / sqrt(sop. antecedente · sop. consecuente).
+    Devuelve una RuleTable: antecedentes y consecuentes quedan como códigos
+    de item (sin construir frozensets ni textos por regla).
+    """
+    item_names = np.asarray(item_names, dtype=object)
+    itemsets = [(itemset, count) for itemset, count in counts.items() if len(itemset) >= 2]
+    if workers > 1 and len(itemsets) > workers:
+        size = math.ceil(len(itemsets) / (workers * 4))
+        chunks = [itemsets[i:i+size] for i in range(0, len(itemsets), size)]
+        parts = run_parallel(_rule_candidates_task, chunks, workers, counts=counts)
+        ants, cons, c_ac, c_a, c_c = ([x for part in parts for x in part[k]] for k in range(5))
+    else:
+        ants, cons, c_ac, c_a, c_c = _rule_candidates(itemsets, counts)
+    if not ants:
+        return RuleTable.from_codes(item_names, [], [], dict.fromkeys(RULE_METRICS, []))
+
+    c_ac = np.asarray(c_ac, dtype=np.float64)
+    c_a = np.asarray(c_a, dtype=np.float64)
+    c_c = np.asarray(c_c, dtype=np.float64)
+    confidence = c_ac / c_a
+    keep = np.flatnonzero(confidence >= min_confidence)
+    if len(keep) == 0:
+        return RuleTable.from_codes(item_names, [], [], dict.fromkeys(RULE_METRICS, []))
+    c_ac, c_a, c_c, confidence = c_ac[keep], c_a[keep], c_c[keep], confidence[keep]
+
+    s_ac, s_a, s_c = c_ac / n_trans, c_a / n_trans, c_c / n_trans
+    leverage = s_ac - s_a * s_c
+    conviction = np.full(len(keep), np.inf)
+    lt1 = confidence < 1.0
+    conviction[lt1] = (1.0 - s_c[lt1]) / (1.0 - confidence[lt1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zhang_den = np.maximum(s_ac * (1 - s_a), s_a * (s_c - s_ac))
+        zhangs = np.where(zhang_den == 0, 0, leverage / zhang_den)
+        certainty = np.where(1 - s_c == 0, 0, (confidence - s_c) / (1 - s_c))
+
+    return RuleTable.from_codes(item_names, [ants[k] for k in keep], [cons[k] for k in keep], {
+        'antecedent support': s_a,
+        'consequent support': s_c,
+        'support': s_ac,
+        'confidence': confidence,
+        'lift': confidence / s_c,
+        'representativity': np.ones(len(keep)),
+        'leverage': leverage,
+        'conviction': conviction,
+        'zhangs_metric': zhangs,
+        'jaccard': s_ac / (s_a + s_c - s_ac),
+        'certainty': certainty,
+        'kulczynski': (confidence + c_ac / c_c) / 2,
+        'cosine': s_ac / np.sqrt(s_a * s_c),
+    })
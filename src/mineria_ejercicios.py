@@ -1,14 +1,28 @@
 import os
 import argparse
 import logging
+import time
+from dataclasses import dataclass
 from datetime import timedelta
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from scipy import sparse
+from scipy.optimize import linear_sum_assignment
+from pandas._libs.sparse import IntIndex
 
 from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.metrics import silhouette_score
+from joblib import Parallel, delayed
+
+from store import PreprocessedWriter, write_preprocessed, has_preprocessed, compact_dtypes
+from stage_cache import StageCache, stage_key, file_fingerprint, cached
+from rule_index import RuleIndex
+from rule_table import RuleTable, RANK_METRICS, top_rows, write_rule_table
+from instrumentation import rss_mb, RunReport
+from plots import FigureRenderer, render_top_items, render_rfm_scatter
+from itemsets import (mine_frequent_itemsets, mine_frequent_itemsets_bitset, association_rules_from_counts,
+                      pack_columns, unpack_columns, popcount, pair_counts_bitset, pair_counts_sparse)
 
 # Intento importar mlxtend (Apriori). Si falla, usamos fallback.
 USE_MLXTEND = True
@@ -17,6 +31,14 @@ try:
 except Exception:
     USE_MLXTEND = False
 
+# unidecode para Description_clean; sin él se quitan acentos con unicodedata
+USE_UNIDECODE = True
+try:
+    from unidecode import unidecode
+except Exception:
+    import unicodedata
+    USE_UNIDECODE = False
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # ---------------- utilidades ----------------
@@ -25,181 +47,815 @@ def ensure_dir(path):
         os.makedirs(path)
     return path
 
+def log_memory(stage, frame=None):
+    """Informe de memoria por etapa: RSS del proceso y, si se pasa, tamaño real del DataFrame."""
+    parts = []
+    if frame is not None:
+        parts.append(f"DataFrame {frame.memory_usage(deep=True).sum()/1024**2:.1f} MB")
+    rss = rss_mb()
+    if rss is not None:
+        parts.append(f"RSS {rss:.1f} MB")
+    logging.info(f"Memoria [{stage}]: {', '.join(parts) or 'no disponible'}")
+
 # ---------------- preprocesamiento ----------------
-def load_and_preprocess(path):
+REQUIRED_COLUMNS = ['InvoiceNo','Description','Quantity','UnitPrice','CustomerID','InvoiceDate']
+# formatos probados al detectar el de InvoiceDate (ISO primero; m/d antes que d/m)
+DATE_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d',
+                '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%m/%d/%Y',
+                '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d/%m/%Y',
+                '%d-%m-%Y %H:%M', '%d-%m-%Y', '%Y/%m/%d %H:%M', '%Y/%m/%d']
+
+def detect_date_format(values, sample_size=1000):
+    """
+    Formato de DATE_FORMATS que parsea más valores de una muestra de fechas
+    únicas, o None si ninguno sirve (se deja la inferencia de pandas).
+    """
+    sample = pd.Series(pd.unique(values.dropna().astype(str))[:sample_size])
+    best, best_ok = None, 0
+    for fmt in DATE_FORMATS:
+        ok = pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()
+        if ok > best_ok:
+            best, best_ok = fmt, ok
+        if best_ok == len(sample):
+            break
+    if best is not None:
+        logging.info(f"Formato de fecha detectado: {best} ({best_ok}/{len(sample)} de la muestra)")
+    return best
+
+def parse_invoice_dates(values, date_format=None):
     """
-    Carga CSV y realiza limpieza mínima requerida por el proyecto:
+    InvoiceDate a datetime con formato explícito (date_format o el detectado
+    en una muestra): se parsea una vez cada fecha única y se expande por
+    códigos. Solo las fechas que fallan se reintentan con dayfirst; las que
+    fallan también ahí quedan NaT.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    codes, uniques = pd.factorize(values.astype(str).where(values.notna()))
+    uniques = pd.Series(uniques)
+    if date_format is None:
+        date_format = detect_date_format(uniques)
+    parsed = pd.to_datetime(uniques, format=date_format, errors='coerce')
+    failed = parsed.isna()
+    if failed.any():
+        # reintento solo de las fechas que no encajan (p. ej. d/m/Y mezclado)
+        parsed[failed] = pd.to_datetime(uniques[failed], format='mixed', dayfirst=True, errors='coerce')
+        logging.info(f"Fechas reintentadas con dayfirst: {failed.sum()} únicas; sin parsear: {parsed.isna().sum()}")
+    dates = parsed.to_numpy()[codes]
+    dates[codes < 0] = np.datetime64('NaT')
+    return pd.Series(dates, index=values.index, name=values.name)
+
+def clean_transactions(df, date_format=None):
+    """
+    Limpieza mínima requerida por el proyecto, sobre el CSV completo o un chunk:
     - Verifica columnas requeridas
     - Elimina filas con nulos en columnas claves
     - Convierte tipos (Quantity, UnitPrice)
     - Filtra Quantity>0 y UnitPrice>0
-    - Crea TotalPrice y convierte InvoiceDate a datetime (con fallback dayfirst)
+    - Crea TotalPrice y convierte InvoiceDate a datetime (parse_invoice_dates)
+    - Compacta tipos (store.compact_dtypes): IDs int32, texto categórico, UnitPrice float32
     """
-    logging.info(f"Cargando datos desde: {path}")
-    df = pd.read_csv(path, encoding='ISO-8859-1')
-    logging.info(f"Shape original: {df.shape}")
-
-    required = ['InvoiceNo','Description','Quantity','UnitPrice','CustomerID','InvoiceDate']
-    missing = [c for c in required if c not in df.columns]
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
     if missing:
         raise ValueError(f"Faltan columnas necesarias en el CSV: {missing}")
 
-    df = df.dropna(subset=required)
+    df = df.dropna(subset=REQUIRED_COLUMNS)
     df['Quantity'] = pd.to_numeric(df['Quantity'], errors='coerce')
     df['UnitPrice'] = pd.to_numeric(df['UnitPrice'], errors='coerce')
     df = df.dropna(subset=['Quantity','UnitPrice'])
     df = df[(df['Quantity']>0) & (df['UnitPrice']>0)]
 
     df['TotalPrice'] = df['Quantity'] * df['UnitPrice']
-    df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], errors='coerce')
-    if df['InvoiceDate'].isnull().any():
-        # intentar con dayfirst (d/m/Y)
-        df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'], dayfirst=True, errors='coerce')
+    df['InvoiceDate'] = parse_invoice_dates(df['InvoiceDate'], date_format=date_format)
+
+    return compact_dtypes(df.dropna(subset=['InvoiceDate']))
+
+def _ascii(s):
+    if USE_UNIDECODE:
+        return unidecode(s)
+    return unicodedata.normalize('NFKD', s).encode('ascii', 'ignore').decode('ascii')
 
-    df = df.dropna(subset=['InvoiceDate'])
+def normalize_descriptions(values, memo=None):
+    """
+    Description_clean: minúsculas, sin acentos (unidecode) y solo [a-z0-9 ]
+    con espacios colapsados. Se normaliza una sola vez cada descripción única
+    (pd.factorize + operaciones .str sobre los únicos) y el resultado se
+    expande por códigos como categórica con categorías ordenadas. memo (dict)
+    conserva lo ya normalizado entre llamadas, p. ej. entre chunks.
+    """
+    memo = {} if memo is None else memo
+    codes, uniques = pd.factorize(values)
+    new = [u for u in uniques if u not in memo]
+    if new:
+        cleaned = pd.Series(new, dtype=object).astype(str).str.lower().str.strip()
+        cleaned = cleaned.map(_ascii)
+        cleaned = cleaned.str.replace(r'[^a-z0-9 ]', ' ', regex=True).str.replace(r'\s+', ' ', regex=True)
+        memo.update(zip(new, cleaned))
+    categories, inverse = np.unique(np.asarray([memo[u] for u in uniques], dtype=str), return_inverse=True)
+    clean_codes = np.full(len(codes), -1, dtype=np.int64)
+    valid = codes >= 0  # NaN conserva código -1
+    clean_codes[valid] = inverse.ravel()[codes[valid]]
+    return pd.Series(pd.Categorical.from_codes(clean_codes, categories=categories), index=values.index, name='Description_clean')
+
+def load_and_preprocess(path, clean_descriptions=False, date_format=None):
+    """
+    Carga el CSV completo en memoria y aplica clean_transactions (date_format:
+    formato strftime de InvoiceDate; None = detectado en una muestra).
+    Con clean_descriptions añade Description_clean (normalize_descriptions).
+    Para ficheros más grandes que la RAM usar iter_preprocessed_chunks.
+    """
+    logging.info(f"Cargando datos desde: {path}")
+    df = pd.read_csv(path, encoding='ISO-8859-1')
+    logging.info(f"Shape original: {df.shape}")
+    log_memory('lectura CSV', df)
+
+    df = clean_transactions(df, date_format=date_format)
+    if clean_descriptions:
+        df['Description_clean'] = normalize_descriptions(df['Description'])
     logging.info(f"Shape después de preprocesamiento: {df.shape}")
+    log_memory('preprocesado', df)
     return df
 
+def iter_preprocessed_chunks(path, chunksize=100_000, clean_descriptions=False, date_format=None):
+    """
+    Generador: lee el CSV por chunks de `chunksize` filas y entrega cada chunk
+    ya limpio (clean_transactions). La memoria pico depende del tamaño del
+    chunk, no del fichero; los agregadores (BasketAccumulator, RFMAccumulator)
+    consumen los chunks directamente. Con clean_descriptions cada chunk lleva
+    Description_clean (las descripciones ya vistas no se vuelven a normalizar).
+    Sin date_format, el formato de fecha se detecta en el primer chunk.
+    """
+    logging.info(f"Cargando datos por chunks de {chunksize} filas desde: {path}")
+    n_in = n_out = 0
+    memo = {}
+    for chunk in pd.read_csv(path, encoding='ISO-8859-1', chunksize=chunksize):
+        n_in += len(chunk)
+        if date_format is None:
+            date_format = detect_date_format(chunk['InvoiceDate'])
+        chunk = clean_transactions(chunk, date_format=date_format)
+        if clean_descriptions:
+            chunk['Description_clean'] = normalize_descriptions(chunk['Description'], memo=memo)
+        n_out += len(chunk)
+        if len(chunk):
+            yield chunk
+    logging.info(f"Filas leídas: {n_in}; después de preprocesamiento: {n_out}")
+
 # ---------------- matriz transaccional ----------------
-def create_transaction_matrix(df):
+@dataclass
+class SparseBasket:
+    """
+    Cesta dispersa: matriz CSR booleana (facturas x items) más los índices
+    de facturas e items. La memoria crece con el número de líneas de venta,
+    no con facturas x items.
+    """
+    matrix: sparse.csr_matrix
+    invoices: np.ndarray
+    items: np.ndarray
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def item_counts(self):
+        """Número de transacciones en las que aparece cada item."""
+        return np.asarray(self.matrix.sum(axis=0)).ravel()
+
+    def to_dataframe(self):
+        """
+        DataFrame disperso con el mismo layout que la matriz densa. Las
+        columnas son Sparse[bool, False] construidas desde la CSC (igual que
+        from_spmatrix, pero sin su fill_value 0 entero, obsoleto en pandas).
+        """
+        X = self.matrix.tocsc()
+        X.sort_indices()
+        n_trans = X.shape[0]
+        dtype = pd.SparseDtype(bool, False)
+        columns = {}
+        for j in range(X.shape[1]):
+            rows = X.indices[X.indptr[j]:X.indptr[j + 1]].astype(np.int32)
+            columns[j] = pd.arrays.SparseArray(np.ones(len(rows), dtype=bool), sparse_index=IntIndex(n_trans, rows), dtype=dtype)
+        frame = pd.DataFrame(columns, index=self.invoices)
+        frame.columns = self.items
+        return frame
+
+@dataclass
+class BitsetBasket:
+    """
+    Cesta en bitsets: para cada item, su pertenencia a las facturas empaquetada
+    en palabras uint64 (n_items x ceil(n_trans/64)). Ocupa ~64x menos que la
+    matriz 0/1 int64 y el soporte de un itemset es AND + popcount.
+    """
+    bits: np.ndarray
+    n_trans: int
+    invoices: np.ndarray
+    items: np.ndarray
+
+    @property
+    def shape(self):
+        return (self.n_trans, self.bits.shape[0])
+
+    def item_counts(self):
+        return popcount(self.bits)
+
+    def to_csr(self):
+        return unpack_columns(self.bits, self.n_trans)
+
+    def to_dataframe(self):
+        return pd.DataFrame.sparse.from_spmatrix(self.to_csr(), index=self.invoices, columns=self.items)
+
+def n_transactions(basket):
+    """Número de facturas de la cesta en cualquiera de sus representaciones (sin convertirla)."""
+    if isinstance(basket, BitsetBasket):
+        return basket.n_trans
+    return basket.shape[0]
+
+def _basket_parts(basket):
+    """
+    Devuelve (X, item_names, n_trans) para una cesta densa (DataFrame), dispersa
+    (SparseBasket) o en bitsets (BitsetBasket, que se desempaqueta a CSR).
+    X es CSR en los casos disperso/bitset y ndarray en el denso.
+    """
+    if isinstance(basket, SparseBasket):
+        return basket.matrix, basket.items, basket.shape[0]
+    if isinstance(basket, BitsetBasket):
+        return basket.to_csr(), basket.items, basket.n_trans
+    return basket.values, basket.columns.to_numpy(), basket.shape[0]
+
+def _sorted_codes(s):
+    """
+    (códigos, valores) con valores ordenados, como pd.factorize(sort=True).
+    Si la columna ya es categórica con categorías ordenadas se usan sus
+    códigos enteros directamente (sin volver a factorizar el texto).
+    """
+    if isinstance(s.dtype, pd.CategoricalDtype) and s.cat.categories.is_monotonic_increasing:
+        codes = s.cat.codes.to_numpy()
+        if len(codes) and codes.min() >= 0:
+            categories = s.cat.categories.to_numpy()
+            used = np.bincount(codes, minlength=len(categories)) > 0
+            if used.all():
+                return codes, categories
+            return (np.cumsum(used) - 1)[codes], categories[used]
+    return pd.factorize(s, sort=True)
+
+def create_transaction_matrix(df, representation='sparse', item_col='Description'):
     """
     Crea matriz InvoiceNo x Description con valores binarios (1 si aparece en la transacción)
+    - representation='sparse': SparseBasket (CSR bool) construida con códigos categóricos, sin unstack
+    - representation='bitset': BitsetBasket (pertenencia por item en uint64, para AND + popcount)
+    - representation='dense': DataFrame int como en versiones anteriores
+    item_col permite usar otra columna de items (p. ej. Description_clean).
+    """
+    if representation == 'dense':
+        logging.info(f"Creando matriz transaccional (InvoiceNo x {item_col}) binarizada")
+        basket = (df.groupby(['InvoiceNo',item_col], observed=True)['Quantity']
+                    .sum().unstack().fillna(0))
+        basket_binary = (basket > 0).astype(int)
+        logging.info(f"Matriz transaccional con shape: {basket_binary.shape}")
+        return basket_binary
+    if representation not in ('sparse', 'bitset'):
+        raise ValueError(f"Representación de cesta no soportada: {representation}")
+
+    logging.info(f"Creando matriz transaccional dispersa (InvoiceNo x {item_col}, CSR)")
+    inv_codes, invoices = _sorted_codes(df['InvoiceNo'])
+    item_codes, items = _sorted_codes(df[item_col])
+    # coo suma duplicados (misma factura/item en varias líneas) al convertir a CSR
+    qty = df['Quantity'].to_numpy(dtype=np.float64)
+    counts = sparse.coo_matrix((qty, (inv_codes, item_codes)),
+                               shape=(len(invoices), len(items))).tocsr()
+    matrix = (counts > 0).tocsr()
+    matrix.eliminate_zeros()
+    basket = SparseBasket(matrix=matrix, invoices=np.asarray(invoices), items=np.asarray(items))
+    logging.info(f"Matriz transaccional con shape: {basket.shape} (nnz={matrix.nnz})")
+    if representation == 'bitset':
+        basket = BitsetBasket(bits=pack_columns(matrix), n_trans=matrix.shape[0],
+                              invoices=basket.invoices, items=basket.items)
+        logging.info(f"Cesta empaquetada en bitsets: {basket.bits.shape} ({basket.bits.nbytes/1024**2:.1f} MB)")
+    return basket
+
+class BasketAccumulator:
     """
-    logging.info("Creando matriz transaccional (InvoiceNo x Description) binarizada")
-    basket = (df.groupby(['InvoiceNo','Description'])['Quantity']
-                .sum().unstack().fillna(0))
-    basket_binary = (basket > 0).astype(int)
-    logging.info(f"Matriz transaccional con shape: {basket_binary.shape}")
-    return basket_binary
-
-# ---------------- Apriori (si está disponible) ----------------
-def run_apriori_rules(basket_binary, min_support=0.02, min_confidence=0.3, outdir='outputs'):
-    if not USE_MLXTEND:
-        logging.warning("mlxtend no disponible. Saltando Apriori.")
+    Acumula los pares (factura, item) de cada chunk para construir la cesta al
+    final, sin mantener el resto de columnas ni las filas completas.
+    item_col: columna de items (Description o Description_clean).
+    """
+    def __init__(self, item_col='Description'):
+        self.item_col = item_col
+        self._parts = []
+
+    def update(self, chunk):
+        self._parts.append(chunk.loc[chunk['Quantity'] > 0, ['InvoiceNo', self.item_col]].drop_duplicates())
+
+    def result(self, representation='sparse'):
+        if self._parts:
+            pairs = pd.concat(self._parts, ignore_index=True)
+        else:
+            pairs = pd.DataFrame(columns=['InvoiceNo', self.item_col])
+        self._parts = []
+        pairs['Quantity'] = 1
+        return create_transaction_matrix(pairs, representation=representation, item_col=self.item_col)
+
+# ---------------- Apriori / FP-Growth / Eclat ----------------
+def run_apriori_rules(basket_binary, min_support=0.02, min_confidence=0.3, outdir='outputs', miner='apriori', workers=1,
+                      cache=None, cache_key=None, top_k=None, rank_by='lift'):
+    """
+    Itemsets frecuentes + reglas de asociación. miner='apriori' usa mlxtend;
+    'fpgrowth' y 'eclat' usan los mineros nativos de itemsets.py (sin tablas
+    de candidatos). La salida rules_apriori.csv tiene las mismas columnas.
+    Con workers > 1 los mineros nativos reparten la búsqueda por item prefijo
+    y la generación de reglas por bloques en un pool de procesos.
+    Con cache (StageCache) y cache_key (clave de la cesta) los itemsets y las
+    reglas se reutilizan entre ejecuciones con los mismos parámetros.
+    Devuelve una RuleTable ordenada por rank_by (None si no hay reglas); con
+    top_k solo las top_k reglas, elegidas por argpartition sin ordenar el
+    resto. Junto al CSV se guarda la tabla canónica rules_apriori.npz.
+    """
+    if miner == 'apriori' and not USE_MLXTEND:
+        logging.warning("mlxtend no disponible. Usando FP-Growth nativo.")
+        miner = 'fpgrowth'
+
+    rules_key = stage_key('rules', cache_key, miner, min_support, min_confidence, top_k, rank_by)
+    rules = cached(cache, rules_key,
+                   lambda: _mine_rules(basket_binary, min_support, min_confidence, miner, workers, cache, cache_key,
+                                       top_k, rank_by))
+    if rules is None:
         return None
+    out_path = write_rule_table(rules, os.path.join(outdir, 'rules_apriori.csv'))
+    logging.info(f"Reglas {miner} guardadas en: {out_path}")
+    return rules
 
-    logging.info("Ejecutando Apriori (mlxtend)")
-    frequent_items = apriori(basket_binary, min_support=min_support, use_colnames=True)
-    logging.info(f"Itemsets frecuentes encontrados: {len(frequent_items)}")
+def _mine_itemsets(basket_binary, min_support, miner, workers):
+    if miner == 'apriori':
+        logging.info("Ejecutando Apriori (mlxtend)")
+        if workers > 1:
+            logging.warning("Apriori (mlxtend) no soporta workers; se ejecuta en un solo proceso.")
+        if isinstance(basket_binary, (SparseBasket, BitsetBasket)):
+            # mlxtend acepta DataFrames dispersos; evitamos densificar la cesta
+            basket_binary = basket_binary.to_dataframe()
+        return apriori(basket_binary, min_support=min_support, use_colnames=True)
+    logging.info(f"Ejecutando {miner} (nativo)")
+    if miner == 'eclat' and isinstance(basket_binary, BitsetBasket):
+        return mine_frequent_itemsets_bitset(basket_binary.bits, basket_binary.n_trans, min_support, workers=workers)
+    X, _, _ = _basket_parts(basket_binary)
+    return mine_frequent_itemsets(X, min_support, algorithm=miner, workers=workers)
 
-    if frequent_items.empty:
+def _mine_rules(basket_binary, min_support, min_confidence, miner, workers, cache=None, cache_key=None,
+                top_k=None, rank_by='lift'):
+    itemsets_key = stage_key('itemsets', cache_key, miner, min_support)
+    frequent = cached(cache, itemsets_key, lambda: _mine_itemsets(basket_binary, min_support, miner, workers))
+    logging.info(f"Itemsets frecuentes encontrados: {len(frequent)}")
+    if len(frequent) == 0:
         logging.warning("No se encontraron itemsets frecuentes con el min_support dado")
         return None
 
-    rules = association_rules(frequent_items, metric='confidence', min_threshold=min_confidence)
+    if miner == 'apriori':
+        rules = RuleTable.from_frame(association_rules(frequent, metric='confidence', min_threshold=min_confidence))
+        if not rules.empty:
+            # mlxtend no calcula cosine; misma fórmula que association_rules_from_counts
+            rules.metrics['cosine'] = rules['support'] / np.sqrt(rules['antecedent support'] * rules['consequent support'])
+    else:
+        if isinstance(basket_binary, BitsetBasket):
+            item_names, n_trans = basket_binary.items, basket_binary.n_trans
+        else:
+            _, item_names, n_trans = _basket_parts(basket_binary)
+        rules = association_rules_from_counts(frequent, n_trans, min_confidence, item_names, workers=workers)
+
     if rules.empty:
         logging.warning("No se generaron reglas con los umbrales dados")
         return None
 
-    rules = rules.sort_values(by='lift', ascending=False).reset_index(drop=True)
-    # convertir conjuntos a strings legibles
-    for col in ['antecedents','consequents']:
-        rules[col] = rules[col].apply(lambda s: ', '.join(sorted(list(s))))
-    out_path = os.path.join(outdir, 'rules_apriori.csv')
-    rules.to_csv(out_path, index=False)
-    logging.info(f"Reglas Apriori guardadas en: {out_path}")
-    return rules
+    # los textos "a, b" del CSV se forman al escribirlo, solo para las reglas que quedan
+    return _ranked(rules, top_k, rank_by)
+
+def _ranked(rules, top_k, rank_by):
+    if top_k and top_k < len(rules):
+        logging.info(f"Top {top_k} reglas por {rank_by} de {len(rules)} candidatas")
+    return rules.top(top_k or None, rank_by)
 
 # ---------------- Fallback por pares (vectorizado) ----------------
-def run_pairs_fallback(basket_binary, top_n_items=50, outdir='outputs'):
+def select_frequent_items(item_counts, n_trans, top_n_items=50, min_support=None):
+    """
+    Poda de items antes de calcular co-ocurrencias: descarta los items con
+    soporte < min_support (si se indica) y se queda con los top_n_items más
+    frecuentes. Devuelve los índices ordenados por frecuencia descendente.
+    """
+    candidates = np.arange(len(item_counts))
+    if min_support is not None:
+        candidates = candidates[item_counts >= min_support * n_trans]
+    order = np.argsort(item_counts[candidates])
+    if top_n_items:
+        order = order[-top_n_items:]
+    return candidates[order[::-1]]
+
+def _conviction(s_c, confidence):
+    # (1 - sop. consecuente) / (1 - confianza); inf con confianza 1, como mlxtend
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(confidence < 1.0, (1.0 - s_c) / (1.0 - confidence), np.inf)
+
+# métricas de los pares (A, B) desde los conteos, en el orden de columnas de rules_pairs_top.csv
+PAIR_METRICS = {
+    'count_ab': lambda c_ab, c_a, c_b, n: c_ab,
+    'support': lambda c_ab, c_a, c_b, n: c_ab / n,
+    'confidence': lambda c_ab, c_a, c_b, n: c_ab / c_a,
+    'confidence_b_a': lambda c_ab, c_a, c_b, n: c_ab / c_b,
+    'lift': lambda c_ab, c_a, c_b, n: (c_ab / n) / ((c_a/n)*(c_b/n)),
+    'leverage': lambda c_ab, c_a, c_b, n: c_ab / n - (c_a/n)*(c_b/n),
+    'conviction': lambda c_ab, c_a, c_b, n: _conviction(c_b / n, c_ab / c_a),
+    'conviction_b_a': lambda c_ab, c_a, c_b, n: _conviction(c_a / n, c_ab / c_b),
+    'jaccard': lambda c_ab, c_a, c_b, n: c_ab / (c_a + c_b - c_ab),
+    'cosine': lambda c_ab, c_a, c_b, n: c_ab / np.sqrt(c_a * c_b),
+    'kulczynski': lambda c_ab, c_a, c_b, n: (c_ab / c_a + c_ab / c_b) / 2,
+}
+
+def pair_rules_from_counts(ant, con, count_ab, count_a, count_b, n_trans, item_names, top_k=None, rank_by='lift'):
+    """
+    Calcula en una sola pasada vectorizada las métricas de PAIR_METRICS
+    (support, confidence y conviction en ambos sentidos, lift, leverage,
+    jaccard, cosine, kulczynski) para los pares (ant, con) con sus conteos.
+    Con top_k primero se calcula solo rank_by, se eligen los top_k pares por
+    argpartition (O(n), sin ordenar todos los candidatos) y el resto de
+    métricas se calcula solo para ellos. Devuelve una RuleTable de pares
+    (códigos de item de item_names) ordenada por rank_by.
+    """
+    if rank_by not in PAIR_METRICS:
+        raise ValueError(f"Métrica no disponible: {rank_by} (usar {', '.join(PAIR_METRICS)})")
+    ant, con = np.asarray(ant), np.asarray(con)
+    count_ab = np.asarray(count_ab, dtype=np.int64)
+    count_a = np.asarray(count_a, dtype=np.float64)
+    count_b = np.asarray(count_b, dtype=np.float64)
+    rows = top_rows(PAIR_METRICS[rank_by](count_ab, count_a, count_b, n_trans), top_k or None)
+    if top_k and top_k < len(count_ab):
+        logging.info(f"Top {top_k} pares por {rank_by} de {len(count_ab)} candidatos")
+    ant, con, count_ab, count_a, count_b = ant[rows], con[rows], count_ab[rows], count_a[rows], count_b[rows]
+    return RuleTable.from_pairs(item_names, ant, con,
+                                {name: fn(count_ab, count_a, count_b, n_trans) for name, fn in PAIR_METRICS.items()})
+
+def run_pairs_fallback(basket_binary, top_n_items=50, outdir='outputs', min_support=None, workers=1,
+                       cache=None, cache_key=None, top_k=None, rank_by='lift'):
     """
-    Calcula reglas por pares usando co-ocurrencia X.T.dot(X).
-    Limita a top_n_items por frecuencia para controlar memoria y tiempo.
+    Calcula reglas por pares usando co-ocurrencia dispersa X.T.dot(X).
+    Primero poda los items (min_support y top_n_items por frecuencia) y solo
+    después hace el producto sobre la submatriz; las métricas se calculan de
+    forma vectorizada sobre los no-ceros del triángulo superior. Con
+    workers > 1 las filas de la co-ocurrencia se reparten en bloques.
+    Con cache/cache_key (clave de la cesta) la tabla de pares se reutiliza.
+    Devuelve una RuleTable de pares ordenada por rank_by, solo los top_k si
+    se indica (CSV + rules_pairs_top.npz).
     """
+    pairs_key = stage_key('pairs', cache_key, top_n_items, min_support, top_k, rank_by)
+    pairs = cached(cache, pairs_key, lambda: _pair_rules(basket_binary, top_n_items, min_support, workers, top_k, rank_by))
+    return _write_pair_rules(pairs, outdir)
+
+def _pair_rules(basket_binary, top_n_items, min_support, workers, top_k=None, rank_by='lift'):
     logging.info("Ejecutando fallback por pares (co-ocurrencia)")
-    X = basket_binary.values  # (n_trans, n_items)
-    n_trans = X.shape[0]
-    item_names = basket_binary.columns.tolist()
-
-    co_counts = X.T.dot(X)  # (n_items, n_items)
-    item_counts = np.diag(co_counts)
-
-    # seleccionar top items por frecuencia
-    top_idx = np.argsort(item_counts)[-top_n_items:][::-1]
-    pairs = []
-    for i_idx in range(len(top_idx)):
-        i = top_idx[i_idx]
-        for j_idx in range(i_idx+1, len(top_idx)):
-            j = top_idx[j_idx]
-            count_ab = int(co_counts[i,j])
-            if count_ab == 0:
-                continue
-            support = count_ab / n_trans
-            conf_a_b = count_ab / item_counts[i] if item_counts[i] > 0 else 0
-            conf_b_a = count_ab / item_counts[j] if item_counts[j] > 0 else 0
-            lift = support / ((item_counts[i]/n_trans)*(item_counts[j]/n_trans)) if (item_counts[i]>0 and item_counts[j]>0) else 0
-            pairs.append({
-                'antecedent': item_names[i],
-                'consequent': item_names[j],
-                'count_ab': count_ab,
-                'support': support,
-                'confidence_a_b': conf_a_b,
-                'confidence_b_a': conf_b_a,
-                'lift': lift
-            })
-
-    pairs_df = pd.DataFrame(pairs).sort_values(by='lift', ascending=False).reset_index(drop=True)
-    out_path = os.path.join(outdir, 'rules_pairs_top.csv')
-    pairs_df.to_csv(out_path, index=False)
+    if isinstance(basket_binary, BitsetBasket):
+        # co-ocurrencia por AND + popcount sobre los bitsets de los items podados
+        item_names, n_trans = basket_binary.items, basket_binary.n_trans
+        item_counts = basket_binary.item_counts()
+        top_idx = select_frequent_items(item_counts, n_trans, top_n_items=top_n_items, min_support=min_support)
+        rows, cols, count_ab = pair_counts_bitset(basket_binary.bits, top_idx, workers=workers)
+    else:
+        X, item_names, n_trans = _basket_parts(basket_binary)  # (n_trans, n_items)
+        X = sparse.csr_matrix(X, dtype=np.int32)
+        item_counts = np.asarray(X.sum(axis=0)).ravel()
+
+        # seleccionar top items por frecuencia (poda antes del producto)
+        top_idx = select_frequent_items(item_counts, n_trans, top_n_items=top_n_items, min_support=min_support)
+        # solo pares i<j (orden por frecuencia)
+        rows, cols, count_ab = pair_counts_sparse(X[:, top_idx], workers=workers)
+    return _pair_rule_table(top_idx, rows, cols, count_ab, item_counts, n_trans, item_names, top_k, rank_by)
+
+def _pair_rule_table(top_idx, rows, cols, count_ab, item_counts, n_trans, item_names, top_k=None, rank_by='lift'):
+    logging.info(f"Items tras poda: {len(top_idx)}; pares con co-ocurrencia: {len(count_ab)}")
+    ant, con = top_idx[rows], top_idx[cols]
+    return pair_rules_from_counts(ant, con, count_ab, item_counts[ant], item_counts[con], n_trans, np.asarray(item_names),
+                                  top_k=top_k, rank_by=rank_by)
+
+def _write_pair_rules(pairs, outdir):
+    out_path = write_rule_table(pairs, os.path.join(outdir, 'rules_pairs_top.csv'))
     logging.info(f"Reglas pares guardadas en: {out_path}")
-    return pairs_df
+    return pairs
+
+# ---------------- co-ocurrencias incrementales ----------------
+class CooccurrenceStore:
+    """
+    Conteos persistentes para reglas por pares: número de transacciones,
+    conteo por item y conteo por par (triángulo superior disperso por código
+    de item). Cada lote nuevo solo calcula los pares de sus facturas
+    (O(facturas nuevas)) y los deja como tripletas pendientes; se suman al
+    triángulo guardado de una vez (sum_duplicates, O(histórico) por fusión,
+    no por lote) al pedir reglas o guardar. Las reglas (support/confidence/lift) se recalculan a demanda
+    desde los conteos. Las facturas ya incorporadas (hash uint64 de
+    InvoiceNo) se ignoran.
+    """
+    def __init__(self):
+        self.items = np.zeros(0, dtype=object)
+        self.item_counts = np.zeros(0, dtype=np.int64)
+        self.pair_counts = sparse.csr_matrix((0, 0), dtype=np.int64)
+        self.n_trans = 0
+        self.seen = np.zeros(0, dtype=np.uint64)
+        self._codes = {}
+        self._pending = []
+
+    def _item_codes(self, names):
+        # amplía el vocabulario con los items nuevos y devuelve sus códigos
+        new = [n for n in dict.fromkeys(names) if n not in self._codes]
+        if new:
+            for n in new:
+                self._codes[n] = len(self._codes)
+            self.items = np.concatenate([self.items, np.asarray(new, dtype=object)])
+            self.item_counts = np.concatenate([self.item_counts, np.zeros(len(new), dtype=np.int64)])
+            n = len(self.items)
+            self.pair_counts = sparse.csr_matrix((self.pair_counts.data, self.pair_counts.indices,
+                                                  np.pad(self.pair_counts.indptr, (0, n + 1 - len(self.pair_counts.indptr)), mode='edge')),
+                                                 shape=(n, n))
+        return np.fromiter((self._codes[n] for n in names), dtype=np.int64, count=len(names))
+
+    def update(self, basket):
+        """Suma una cesta (SparseBasket, BitsetBasket o DataFrame) de facturas nuevas."""
+        X, item_names, n_trans = _basket_parts(basket)
+        invoices = basket.index if isinstance(basket, pd.DataFrame) else basket.invoices
+        keys = pd.util.hash_pandas_object(_integral_ids(pd.Series(np.asarray(invoices))), index=False).to_numpy()
+        pos = np.searchsorted(self.seen, keys)
+        is_new = np.ones(len(keys), dtype=bool)
+        if len(self.seen):
+            is_new = self.seen[np.minimum(pos, len(self.seen) - 1)] != keys
+        if not is_new.all():
+            logging.warning(f"{(~is_new).sum()} facturas ya estaban en el store de co-ocurrencias; se ignoran")
+        order = np.argsort(keys[is_new])
+        self.seen = np.insert(self.seen, pos[is_new][order], keys[is_new][order])
+
+        X = sparse.csr_matrix(X, dtype=np.int64)[np.flatnonzero(is_new)]
+        codes = self._item_codes(list(item_names))
+        n = len(self.items)
+        # remapear columnas de la cesta al vocabulario del store
+        X = sparse.csr_matrix((X.data, codes[X.indices], X.indptr), shape=(X.shape[0], n))
+        self.item_counts += np.asarray(X.sum(axis=0)).ravel()
+        block = sparse.triu(X.T @ X, k=1, format='coo')
+        self._pending.append((block.row, block.col, block.data))
+        self.n_trans += X.shape[0]
+        logging.info(f"Store de co-ocurrencias: +{X.shape[0]} facturas (total {self.n_trans}, {n} items, "
+                     f"{block.nnz} pares en el lote)")
+        return self
+
+    def _fold(self):
+        """Suma los pares pendientes de los lotes al triángulo guardado."""
+        if not self._pending:
+            return
+        n = len(self.items)
+        rows, cols, data = (np.concatenate([p[k] for p in self._pending]) for k in range(3))
+        # los lotes se suman entre sí (sum_duplicates) y el resultado se añade al guardado en una pasada
+        new = sparse.coo_matrix((data.astype(np.int64), (rows, cols)), shape=(n, n))
+        new.sum_duplicates()
+        self.pair_counts = (self.pair_counts + new.tocsr()).tocsr()
+        self._pending = []
+
+    def pair_rules(self, top_n_items=50, outdir='outputs', min_support=None, top_k=None, rank_by='lift'):
+        """Reglas por pares desde los conteos, con la misma poda y salida que run_pairs_fallback."""
+        logging.info("Calculando reglas por pares desde el store de co-ocurrencias")
+        self._fold()
+        top_idx = select_frequent_items(self.item_counts, self.n_trans, top_n_items=top_n_items, min_support=min_support)
+        sym = self.pair_counts + self.pair_counts.T
+        co_counts = sparse.triu(sym[top_idx][:, top_idx], k=1).tocoo()
+        order = np.lexsort((co_counts.col, co_counts.row))
+        rows, cols, count_ab = co_counts.row[order], co_counts.col[order], co_counts.data[order]
+        pairs = _pair_rule_table(top_idx, rows, cols, count_ab, self.item_counts, self.n_trans, self.items, top_k, rank_by)
+        return _write_pair_rules(pairs, outdir)
+
+    def save(self, path):
+        self._fold()
+        np.savez(path, items=self.items.astype(str), item_counts=self.item_counts, n_trans=self.n_trans,
+                 data=self.pair_counts.data, indices=self.pair_counts.indices, indptr=self.pair_counts.indptr,
+                 seen=self.seen)
+        logging.info(f"Store de co-ocurrencias guardado en: {path}")
+
+    @classmethod
+    def load(cls, path):
+        store = cls()
+        if not os.path.exists(path):
+            logging.info(f"No existe store de co-ocurrencias en {path}; se crea uno nuevo")
+            return store
+        with np.load(path) as data:
+            store.items = data['items'].astype(object)
+            store.item_counts = data['item_counts']
+            store.n_trans = int(data['n_trans'])
+            n = len(store.items)
+            store.pair_counts = sparse.csr_matrix((data['data'], data['indices'], data['indptr']), shape=(n, n))
+            store.seen = data['seen']
+        store._codes = {name: i for i, name in enumerate(store.items)}
+        logging.info(f"Store de co-ocurrencias cargado desde: {path} ({store.n_trans} facturas)")
+        return store
 
 # ---------------- visualizaciones ----------------
-def plot_top_items_support(basket_binary, outpath, top_n=10):
-    support = (basket_binary.sum()/basket_binary.shape[0]).sort_values(ascending=False)
-    top = support.head(top_n)
-    plt.figure(figsize=(10,5))
-    plt.bar(range(len(top)), top.values)
-    plt.xticks(range(len(top)), top.index, rotation=45, ha='right')
-    plt.ylabel('Support (fraction of transactions)')
-    plt.title('Top items por support')
-    plt.tight_layout()
-    plt.savefig(outpath)
-    plt.close()
-    logging.info(f"Gráfico top items guardado en: {outpath}")
+def plot_top_items_support(basket_binary, outpath, top_n=10, figures=None):
+    """
+    Barras de los top_n items por soporte; con figures (FigureRenderer) el
+    dibujo se encola. Devuelve un Future con la ruta del PNG.
+    """
+    if isinstance(basket_binary, (SparseBasket, BitsetBasket)):
+        support = pd.Series(basket_binary.item_counts()/basket_binary.shape[0], index=basket_binary.items)
+    else:
+        support = basket_binary.sum()/basket_binary.shape[0]
+    top = support.nlargest(top_n)
+    figures = figures or FigureRenderer()
+    return figures.submit(render_top_items, top.index.tolist(), top.to_numpy(), outpath)
 
 # ---------------- RFM y clustering ----------------
-def compute_rfm_and_cluster(df, outdir, k_min=2, k_max=8):
-    logging.info("Calculando tabla RFM")
-    latest_date = df['InvoiceDate'].max() + timedelta(days=1)
-    rfm = df.groupby('CustomerID').agg({
-        'InvoiceDate': lambda x: (latest_date - x.max()).days,
-        'InvoiceNo': 'nunique',
-        'TotalPrice': 'sum'
-    }).reset_index()
-    rfm.columns = ['CustomerID','Recency','Frequency','Monetary']
+def _rfm_table(last_date, frequency, monetary):
+    """Recency vectorizada desde la última compra de cada cliente (sin lambdas por grupo)."""
+    latest_date = last_date.max() + timedelta(days=1)
+    rfm = pd.DataFrame({
+        'Recency': (latest_date - last_date).dt.days,
+        'Frequency': frequency,
+        'Monetary': monetary,
+    }).rename_axis('CustomerID').sort_index().reset_index()
     rfm = rfm.dropna(subset=['CustomerID'])
-    rfm = rfm[rfm['Monetary']>0].reset_index(drop=True)
+    return rfm[rfm['Monetary']>0].reset_index(drop=True)
+
+def compute_rfm(df):
+    logging.info("Calculando tabla RFM")
+    agg = df.groupby('CustomerID').agg(last_date=('InvoiceDate','max'),
+                                       frequency=('InvoiceNo','nunique'),
+                                       monetary=('TotalPrice','sum'))
+    return _rfm_table(agg['last_date'], agg['frequency'], agg['monetary'])
+
+def _integral_ids(s):
+    # 1082.0, 1082 (int32) y 1082 (int64) deben ser el mismo cliente/factura entre lotes
+    if pd.api.types.is_integer_dtype(s):
+        return s.astype(np.int64)
+    if pd.api.types.is_float_dtype(s) and np.all(np.mod(s.to_numpy(), 1) == 0):
+        return s.astype(np.int64)
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.astype(s.cat.categories.dtype)
+    return s
+
+class RFMState:
+    """
+    Estado RFM por cliente, persistible entre ejecuciones: última compra,
+    número de facturas y gasto acumulado, más un conjunto ordenado de hashes
+    uint64 de los pares (cliente, factura) ya contados para la frecuencia.
+    Cada lote nuevo (chunk o día de ventas) se agrega en O(filas del lote) y
+    queda pendiente; los pendientes se fusionan con el histórico en una sola
+    pasada O(histórico) al pedir result() o save(), no en cada lote. Los
+    lotes se asumen ventas nuevas (no se deduplican líneas).
+    """
+    def __init__(self):
+        self.customers = pd.DataFrame({
+            'last_date': pd.Series(dtype='datetime64[ns]'),
+            'frequency': pd.Series(dtype='int64'),
+            'monetary': pd.Series(dtype='float64'),
+        }).rename_axis('CustomerID')
+        self.seen = np.zeros(0, dtype=np.uint64)
+        self._pending = []
+
+    def update(self, batch):
+        customers = _integral_ids(batch['CustomerID'])
+        keys = pd.util.hash_pandas_object(
+            pd.DataFrame({'CustomerID': customers, 'InvoiceNo': _integral_ids(batch['InvoiceNo'])}),
+            index=False).to_numpy()
+        keys, first = np.unique(keys, return_index=True)
+        part = batch.groupby(customers).agg(last_date=('InvoiceDate','max'), monetary=('TotalPrice','sum'))
+        self._pending.append((part, keys, customers.iloc[first].reset_index(drop=True)))
+        return self
+
+    def _merge(self):
+        """Fusiona los lotes pendientes con el histórico (seen y tabla de clientes)."""
+        if not self._pending:
+            return
+        parts, keys, owners = zip(*self._pending)
+        self._pending = []
+        # una factura partida entre lotes cuenta una sola vez
+        keys, first = np.unique(np.concatenate(keys), return_index=True)
+        owners = pd.concat(owners, ignore_index=True)
+        pos = np.searchsorted(self.seen, keys)
+        is_new = np.ones(len(keys), dtype=bool)
+        if len(self.seen):
+            is_new = self.seen[np.minimum(pos, len(self.seen) - 1)] != keys
+        self.seen = np.insert(self.seen, pos[is_new], keys[is_new])
+
+        part = parts[0] if len(parts) == 1 else (pd.concat(parts).groupby(level=0)
+                                                 .agg(last_date=('last_date','max'), monetary=('monetary','sum')))
+        part['frequency'] = owners.iloc[first[is_new]].value_counts().reindex(part.index, fill_value=0)
+
+        idx = self.customers.index.get_indexer(part.index)
+        known = idx >= 0
+        if known.any():
+            rows, old = idx[known], part[known]
+            cols = [self.customers.columns.get_loc(c) for c in ('last_date', 'frequency', 'monetary')]
+            current = self.customers.iloc[rows]
+            self.customers.iloc[rows, cols[0]] = np.maximum(current['last_date'].to_numpy(), old['last_date'].to_numpy())
+            self.customers.iloc[rows, cols[1]] = current['frequency'].to_numpy() + old['frequency'].to_numpy()
+            self.customers.iloc[rows, cols[2]] = current['monetary'].to_numpy() + old['monetary'].to_numpy()
+        if (~known).any():
+            added = part.loc[~known, self.customers.columns].rename_axis('CustomerID')
+            self.customers = added if self.customers.empty else pd.concat([self.customers, added])
+
+    def result(self):
+        self._merge()
+        logging.info(f"Calculando tabla RFM desde el estado ({len(self.customers)} clientes)")
+        c = self.customers
+        return _rfm_table(c['last_date'], c['frequency'], c['monetary'])
 
+    def save(self, path):
+        self._merge()
+        ids = self.customers.index.to_numpy()
+        if ids.dtype == object:
+            ids = ids.astype(str)
+        np.savez(path, customer_id=ids,
+                 last_date=self.customers['last_date'].to_numpy(dtype='datetime64[ns]'),
+                 frequency=self.customers['frequency'].to_numpy(dtype=np.int64),
+                 monetary=self.customers['monetary'].to_numpy(dtype=np.float64),
+                 seen=self.seen)
+        logging.info(f"Estado RFM guardado en: {path} ({len(ids)} clientes, {len(self.seen)} facturas)")
+
+    @classmethod
+    def load(cls, path):
+        state = cls()
+        if not os.path.exists(path):
+            logging.info(f"No existe estado RFM en {path}; se crea uno nuevo")
+            return state
+        with np.load(path) as data:
+            state.customers = pd.DataFrame({
+                'last_date': data['last_date'],
+                'frequency': data['frequency'],
+                'monetary': data['monetary'],
+            }, index=pd.Index(data['customer_id'], name='CustomerID'))
+            state.seen = data['seen']
+        logging.info(f"Estado RFM cargado desde: {path} ({len(state.customers)} clientes)")
+        return state
+
+def compute_rfm_and_cluster(df, outdir, k_min=2, k_max=8, **kwargs):
+    return cluster_rfm(compute_rfm(df), outdir, k_min=k_min, k_max=k_max, **kwargs)
+
+def _evaluate_k(k, X, silhouette_sample):
+    """Ajusta KMeans para un k y devuelve el modelo, métricas y tiempos."""
+    t0 = time.perf_counter()
+    km = KMeans(n_clusters=k, random_state=42, n_init=10)
+    km.fit(X)
+    t1 = time.perf_counter()
+    try:
+        # silhouette es O(n²): con muchos clientes se calcula sobre una muestra de semilla fija
+        sample = silhouette_sample if silhouette_sample and X.shape[0] > silhouette_sample else None
+        sil = silhouette_score(X, km.labels_, sample_size=sample, random_state=42)
+    except Exception:
+        sil = np.nan
+    return km, {'k': k, 'inertia': km.inertia_, 'silhouette': sil,
+                'fit_seconds': t1 - t0, 'silhouette_seconds': time.perf_counter() - t1}
+
+def cluster_rfm(rfm, outdir, k_min=2, k_max=8, workers=1, silhouette_sample=10000, k_patience=None, figures=None):
+    """
+    Evalúa K (elbow + silhouette), asigna clusters y guarda perfiles y scatter.
+    - workers: candidatos k evaluados en paralelo (joblib), por tandas de `workers`
+    - silhouette_sample: tamaño de la muestra (semilla fija) para silhouette; None = todos
+    - k_patience: si se indica, deja de evaluar cuando el mejor k lleva
+      k_patience valores sin mejorar (parada temprana)
+    - figures: FigureRenderer donde encolar el scatter (por defecto se dibuja en el momento)
+    El modelo del k ganador se reutiliza en lugar de reajustarlo.
+    """
     scaler = StandardScaler()
     rfm_scaled = scaler.fit_transform(rfm[['Recency','Frequency','Monetary']])
 
-    inertia = []
-    sil_scores = []
-    K_range = range(k_min, k_max+1)
-    for k in K_range:
-        km = KMeans(n_clusters=k, random_state=42, n_init=10)
-        km.fit(rfm_scaled)
-        inertia.append(km.inertia_)
-        try:
-            sil_scores.append(silhouette_score(rfm_scaled, km.labels_))
-        except Exception:
-            sil_scores.append(np.nan)
-
-    eval_df = pd.DataFrame({'k': list(K_range), 'inertia': inertia, 'silhouette': sil_scores})
+    K_range = list(range(k_min, k_max+1))
+    wave = max(1, workers)
+    models, rows = {}, []
+    for start in range(0, len(K_range), wave):
+        ks = K_range[start:start+wave]
+        if wave > 1:
+            results = Parallel(n_jobs=wave)(delayed(_evaluate_k)(k, rfm_scaled, silhouette_sample) for k in ks)
+        else:
+            results = [_evaluate_k(k, rfm_scaled, silhouette_sample) for k in ks]
+        for km, row in results:
+            models[row['k']] = km
+            rows.append(row)
+            logging.info(f"k={row['k']}: inertia={row['inertia']:.2f} silhouette={row['silhouette']:.4f} "
+                         f"({row['fit_seconds']:.2f}s + {row['silhouette_seconds']:.2f}s)")
+        sil_so_far = [r['silhouette'] for r in rows]
+        if k_patience and not all(np.isnan(sil_so_far)):
+            best = int(np.nanargmax(sil_so_far))
+            if len(rows) - 1 - best >= k_patience:
+                logging.info(f"Parada temprana: silhouette sin mejorar en {k_patience} valores de k")
+                break
+
+    eval_df = pd.DataFrame(rows, columns=['k','inertia','silhouette','fit_seconds','silhouette_seconds'])
     eval_out = os.path.join(outdir, 'Evaluaci_n_K__Elbow___Silhouette_.csv')
     eval_df.to_csv(eval_out, index=False)
     logging.info(f"Evaluación de K guardada en: {eval_out}")
 
+    sil_scores = eval_df['silhouette'].to_numpy(dtype=float)
     if not all(np.isnan(sil_scores)):
-        k_final = int(K_range[np.nanargmax(sil_scores)])
+        k_final = int(eval_df['k'].iloc[np.nanargmax(sil_scores)])
     else:
         k_final = 4
     logging.info(f"K seleccionado: {k_final}")
 
-    km_final = KMeans(n_clusters=k_final, random_state=42, n_init=10)
-    rfm['Cluster'] = km_final.fit_predict(rfm_scaled)
+    km_final = models.get(k_final)
+    if km_final is None:
+        km_final = KMeans(n_clusters=k_final, random_state=42, n_init=10).fit(rfm_scaled)
+    rfm['Cluster'] = km_final.labels_
+    profile = _save_cluster_outputs(rfm, outdir, figures=figures)
+    return rfm, profile, eval_df
 
+def _save_cluster_outputs(rfm, outdir, figures=None):
+    """Guarda rfm_clusters.csv, Perfil_de_clusters.csv y el scatter RFM (encolado en figures si se pasa)."""
     rfm_out = os.path.join(outdir, 'rfm_clusters.csv')
     rfm.to_csv(rfm_out, index=False)
     logging.info(f"RFM con clusters guardada en: {rfm_out}")
@@ -212,48 +868,232 @@ def compute_rfm_and_cluster(df, outdir, k_min=2, k_max=8):
     profile.to_csv(profile_out, index=False)
     logging.info(f"Perfil de clusters guardado en: {profile_out}")
 
-    # Scatter Recency vs Monetary
-    fig_scatter = os.path.join(outdir, 'rfm_scatter.png')
-    plt.figure(figsize=(8,6))
-    plt.scatter(rfm['Recency'], rfm['Monetary'], s=20)
-    plt.xlabel('Recency (days)')
-    plt.ylabel('Monetary (total spend)')
-    plt.title('Recency vs Monetary (clientes)')
-    plt.tight_layout()
-    plt.savefig(fig_scatter)
-    plt.close()
-    logging.info(f"Scatter RFM guardado en: {fig_scatter}")
+    # Scatter Recency vs Monetary (hexbin con muchos clientes)
+    figures = figures or FigureRenderer()
+    figures.submit(render_rfm_scatter, rfm['Recency'].to_numpy(), rfm['Monetary'].to_numpy(),
+                   os.path.join(outdir, 'rfm_scatter.png'))
+    return profile
 
-    return rfm, profile, eval_df
+# ---------------- clustering mini-batch (millones de clientes) ----------------
+RFM_FEATURES = ['Recency','Frequency','Monetary']
+
+def _batches(n, batch_size):
+    return (slice(i, min(i + batch_size, n)) for i in range(0, n, batch_size))
+
+def save_cluster_model(path, mean, scale, centers):
+    np.savez(path, mean=mean, scale=scale, centers=centers)
+    logging.info(f"Modelo de clusters guardado en: {path} (k={len(centers)})")
+
+def load_cluster_model(path):
+    with np.load(path) as data:
+        return {'mean': data['mean'], 'scale': data['scale'], 'centers': data['centers']}
+
+def assign_clusters(values, model, batch_size=100_000):
+    """Asigna cada fila al centroide más cercano con el escalado persistido, por lotes."""
+    labels = np.empty(len(values), dtype=np.int32)
+    for b in _batches(len(values), batch_size):
+        X = (values[b] - model['mean']) / model['scale']
+        d = ((X[:, None, :] - model['centers'][None, :, :]) ** 2).sum(axis=2)
+        labels[b] = d.argmin(axis=1)
+    return labels
+
+def fit_minibatch_clusters(values, n_clusters, batch_size=10_000, epochs=3, previous=None):
+    """
+    Ajusta MiniBatchKMeans con partial_fit sobre lotes barajados (memoria
+    acotada por batch_size). Con `previous` se conserva su escalado, se parte
+    de sus centroides y los IDs nuevos se alinean a los anteriores
+    (asignación húngara), de modo que los clusters son estables entre días.
+    """
+    if previous is not None:
+        mean, scale = previous['mean'], previous['scale']
+    else:
+        scaler = StandardScaler()
+        for b in _batches(len(values), batch_size):
+            scaler.partial_fit(values[b])
+        mean, scale = scaler.mean_, scaler.scale_
+
+    warm = previous is not None and len(previous['centers']) == n_clusters
+    km = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, batch_size=batch_size,
+                         init=previous['centers'] if warm else 'k-means++', n_init=1 if warm else 3)
+    rng = np.random.default_rng(42)
+    for _ in range(epochs):
+        order = rng.permutation(len(values))
+        for b in _batches(len(values), batch_size):
+            km.partial_fit((values[order[b]] - mean) / scale)
+    centers = km.cluster_centers_
+
+    if warm:
+        cost = ((centers[:, None, :] - previous['centers'][None, :, :]) ** 2).sum(axis=2)
+        new_idx, old_idx = linear_sum_assignment(cost)
+        aligned = np.empty_like(centers)
+        aligned[old_idx] = centers[new_idx]
+        centers = aligned
+    else:
+        # IDs deterministas: cluster 0 = mayor Monetary medio (escalado)
+        centers = centers[np.argsort(-centers[:, RFM_FEATURES.index('Monetary')], kind='stable')]
+    return {'mean': mean, 'scale': scale, 'centers': centers}
+
+def cluster_rfm_minibatch(rfm, outdir, n_clusters=4, model_path=None, refit=False, batch_size=10_000, figures=None):
+    """
+    Segmentación RFM para millones de clientes: si existe el modelo persistido
+    (escalado + centroides) se asignan los clientes sin reajustar; si no existe,
+    si tiene otro número de clusters que n_clusters o refit=True se ajusta con
+    MiniBatchKMeans por lotes y se guarda.
+    """
+    model_path = model_path or os.path.join(outdir, 'rfm_kmeans_model.npz')
+    values = rfm[RFM_FEATURES].to_numpy(dtype=np.float64)
+    previous = load_cluster_model(model_path) if os.path.exists(model_path) else None
+    if previous is not None and len(previous['centers']) != n_clusters:
+        logging.warning(f"El modelo de {model_path} tiene k={len(previous['centers'])} y se pidió "
+                        f"--n_clusters {n_clusters}: se reajusta (los IDs de cluster no se conservan)")
+        refit = True
+    if previous is None or refit:
+        logging.info(f"Ajustando MiniBatchKMeans (k={n_clusters}, batch={batch_size}) sobre {len(values)} clientes")
+        model = fit_minibatch_clusters(values, n_clusters, batch_size=batch_size, previous=previous)
+        save_cluster_model(model_path, **model)
+    else:
+        logging.info(f"Asignando clientes a centroides existentes de {model_path} (sin reajuste)")
+        model = previous
+    rfm['Cluster'] = assign_clusters(values, model)
+    profile = _save_cluster_outputs(rfm, outdir, figures=figures)
+    return rfm, profile, model
 
 # ---------------- guardado preprocesado ----------------
-def save_preprocessed(df, outdir):
-    out = os.path.join(outdir, 'ventas_preprocessed.csv')
-    df.to_csv(out, index=False)
-    logging.info(f"Preprocesado guardado en: {out}")
-    return out
+def save_preprocessed(df, outdir, fmt='parquet'):
+    """Guarda el preprocesado en el almacén columnar (store.py) o en CSV."""
+    return write_preprocessed(df, outdir, fmt=fmt)
 
 # ---------------- main ----------------
+def _stage_cache(args):
+    """StageCache de --cache_dir, o None si no se pide o si hay estado acumulativo."""
+    if not args.cache_dir:
+        return None
+    if args.rfm_state or args.cooc_store:
+        # cada ejecución suma un lote al estado persistido: reutilizar etapas lo duplicaría
+        logging.warning("--rfm_state/--cooc_store acumulan lotes; la caché de etapas se desactiva")
+        return None
+    return StageCache(args.cache_dir, max_bytes=args.cache_max_mb << 20)
+
+def _ingest(args, outdir, cache, rfm_state, report):
+    """
+    Preprocesado, cesta y tabla RFM. Con caché, las claves encadenan la huella
+    del CSV con los parámetros de cada etapa y solo se recalcula lo que falta.
+    Cada parte se mide como etapa de report (RunReport).
+    Devuelve (basket, rfm, clave de la cesta).
+    """
+    basket = rfm = pre_key = basket_key = None
+    # con --clean_descriptions la cesta usa las descripciones normalizadas
+    item_col = 'Description_clean' if args.clean_descriptions else 'Description'
+    if cache is not None:
+        pre_key = stage_key('preprocess', file_fingerprint(args.input), args.chunksize, args.clean_descriptions, args.date_format)
+        basket_key = stage_key('basket', pre_key, args.basket, item_col)
+        rfm_key = stage_key('rfm', pre_key)
+        basket, rfm = cache.get(basket_key), cache.get(rfm_key)
+    missing = {'basket': basket is None, 'rfm': rfm is None}
+    bytes_in = os.path.getsize(args.input)
+
+    if args.chunksize:
+        if any(missing.values()) or not has_preprocessed(outdir):
+            # ingesta por chunks: cada chunk limpio va directo a los agregadores
+            basket_acc = BasketAccumulator(item_col=item_col)
+            with report.stage('ingest_chunks', bytes_in=bytes_in, chunksize=args.chunksize) as rec:
+                rec['rows_out'] = 0
+                with PreprocessedWriter(outdir, fmt=args.preprocessed_format) as writer:
+                    for chunk in iter_preprocessed_chunks(args.input, chunksize=args.chunksize,
+                                                          clean_descriptions=args.clean_descriptions, date_format=args.date_format):
+                        writer.write(chunk)
+                        basket_acc.update(chunk)
+                        rfm_state.update(chunk)
+                        rec['rows_out'] += len(chunk)
+            with report.stage('basket', rows_in=rec['rows_out'], representation=args.basket) as rec_b:
+                basket = basket_acc.result(representation=args.basket)
+                rec_b['rows_out'] = n_transactions(basket)
+            with report.stage('rfm', rows_in=rec['rows_out']) as rec_r:
+                rfm = rfm_state.result()
+                rec_r['rows_out'] = len(rfm)
+    elif any(missing.values()) or not has_preprocessed(outdir):
+        # con cesta y RFM en caché y el preprocesado ya escrito no hace falta cargarlo
+        with report.stage('preprocess', bytes_in=bytes_in) as rec:
+            df = cached(cache, pre_key, lambda: load_and_preprocess(args.input, clean_descriptions=args.clean_descriptions,
+                                                                      date_format=args.date_format))
+            save_preprocessed(df, outdir, fmt=args.preprocessed_format)
+            rec['rows_out'] = len(df)
+        if basket is None:
+            with report.stage('basket', rows_in=len(df), representation=args.basket) as rec:
+                basket = create_transaction_matrix(df, representation=args.basket, item_col=item_col)
+                rec['rows_out'] = n_transactions(basket)
+        if rfm is None:
+            with report.stage('rfm', rows_in=len(df)) as rec:
+                rfm_state.update(df)
+                rfm = rfm_state.result()
+                rec['rows_out'] = len(rfm)
+    if cache is not None:
+        if missing['basket']:
+            cache.put(basket_key, basket)
+        if missing['rfm']:
+            cache.put(rfm_key, rfm)
+    return basket, rfm, basket_key
+
 def main(args):
     outdir = ensure_dir(args.outdir)
+    cache = _stage_cache(args)
+    # informe por etapa (tiempo, CPU, RSS pico, filas) → run_report.json; --profile añade cProfile por etapa
+    report = RunReport(profile_dir=os.path.join(outdir, 'profile') if args.profile else None)
+    # figuras en segundo plano (Agg, sin pyplot): se dibujan mientras siguen reglas y clustering
+    figures = FigureRenderer(workers=args.plot_workers)
+    try:
+        _run(args, outdir, cache, report, figures)
+    finally:
+        figures.close()
+        # también si una etapa falla: el informe dice cuál y con qué memoria
+        report.save(os.path.join(outdir, 'run_report.json'), input=args.input, args=vars(args))
 
-    df = load_and_preprocess(args.input)
-    save_preprocessed(df, outdir)
-
-    basket = create_transaction_matrix(df)
-    plot_top_items_support(basket, os.path.join(outdir,'top10_support.png'), top_n=10)
+def _run(args, outdir, cache, report, figures):
+    # estado RFM: persistido con --rfm_state (el lote de --input se suma al histórico)
+    rfm_state = RFMState.load(args.rfm_state) if args.rfm_state else RFMState()
+    basket, rfm, basket_key = _ingest(args, outdir, cache, rfm_state, report)
+    if args.rfm_state:
+        rfm_state.save(args.rfm_state)
+    plot_top_items_support(basket, os.path.join(outdir,'top10_support.png'), top_n=10, figures=figures)
 
-    # Reglas: Apriori si se solicita y está disponible; sino fallback
-    if args.use_apriori:
-        if USE_MLXTEND:
-            run_apriori_rules(basket, min_support=args.min_support, min_confidence=args.min_confidence, outdir=outdir)
+    # Reglas: minero de itemsets si se solicita (--miner / --use_apriori); sino fallback pares
+    miner = args.miner or ('apriori' if args.use_apriori else 'pairs')
+    if args.cooc_store:
+        # conteos persistentes: solo se suman las facturas nuevas de este --input
+        with report.stage('cooc_store', rows_in=n_transactions(basket)):
+            cooc = CooccurrenceStore.load(args.cooc_store).update(basket)
+            cooc.save(args.cooc_store)
+    with report.stage('rules', rows_in=n_transactions(basket), miner=miner) as rec:
+        if miner == 'pairs' and args.cooc_store:
+            rules = cooc.pair_rules(top_n_items=args.top_n_items, outdir=outdir, min_support=args.pairs_min_support,
+                                    top_k=args.rules_top_k, rank_by=args.rank_by)
+        elif miner == 'pairs':
+            rules = run_pairs_fallback(basket, top_n_items=args.top_n_items, outdir=outdir, min_support=args.pairs_min_support, workers=args.workers,
+                               cache=cache, cache_key=basket_key, top_k=args.rules_top_k, rank_by=args.rank_by)
         else:
-            logging.warning("Se solicitó Apriori pero mlxtend no está instalado. Usando fallback pares.")
-            run_pairs_fallback(basket, top_n_items=args.top_n_items, outdir=outdir)
-    else:
-        run_pairs_fallback(basket, top_n_items=args.top_n_items, outdir=outdir)
+            rules = run_apriori_rules(basket, min_support=args.min_support, min_confidence=args.min_confidence, outdir=outdir, miner=miner, workers=args.workers,
+                              cache=cache, cache_key=basket_key, top_k=args.rules_top_k, rank_by=args.rank_by)
+        rec['rows_out'] = 0 if rules is None else len(rules)
+    if args.rule_index and rules is not None:
+        # índice binario para consultas top-k online (rule_index.RuleIndex.load)
+        with report.stage('rule_index', rows_in=len(rules)) as rec:
+            index = RuleIndex.from_rules(rules, max_per_antecedent=args.rule_index_top)
+            index.save(args.rule_index)
+            rec['rows_out'] = len(index)
 
-    compute_rfm_and_cluster(df, outdir, k_min=args.k_min, k_max=args.k_max)
+    with report.stage('clustering', rows_in=len(rfm), engine=args.cluster_engine) as rec:
+        if args.cluster_engine == 'minibatch':
+            clustered = cluster_rfm_minibatch(rfm, outdir, n_clusters=args.n_clusters, model_path=args.cluster_model,
+                                              refit=args.refit_clusters, figures=figures)
+        else:
+            clustered = cluster_rfm(rfm, outdir, k_min=args.k_min, k_max=args.k_max, workers=args.workers,
+                                    silhouette_sample=args.silhouette_sample or None, k_patience=args.k_patience,
+                                    figures=figures)
+        rec['rows_out'] = len(clustered[0])
+    with report.stage('plots', workers=args.plot_workers) as rec:
+        paths = figures.wait()
+        rec['rows_out'] = len(paths)
+    logging.info(f"Figuras guardadas: {', '.join(paths)}")
 
     logging.info("Ejecución completada. Revisa la carpeta de salida para resultados y gráficas.")
     logging.info(f"Archivos en {outdir}: {os.listdir(outdir)}")
@@ -262,12 +1102,36 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Minería de transacciones: Market Basket + RFM + Clustering')
     parser.add_argument('--input', required=True, help='Path al CSV de transacciones (ventas_ejemplo.csv)')
     parser.add_argument('--outdir', default='outputs', help='Carpeta donde guardar resultados')
+    parser.add_argument('--chunksize', type=int, default=None, help='Leer el CSV por chunks de N filas (memoria acotada por el chunk)')
+    parser.add_argument('--date_format', '--date-format', default=None, help='Formato strftime de InvoiceDate (p. ej. %%d/%%m/%%Y %%H:%%M); por defecto se detecta en una muestra')
+    parser.add_argument('--clean_descriptions', action='store_true', help='Añadir Description_clean normalizada (una vez por descripción única) al preprocesado')
+    parser.add_argument('--preprocessed_format', choices=['parquet','csv'], default='parquet', help='Formato de ventas_preprocessed (Parquet columnar o CSV)')
     parser.add_argument('--min_support', type=float, default=0.02, help='Min support para Apriori')
     parser.add_argument('--min_confidence', type=float, default=0.3, help='Min confidence para reglas Apriori')
     parser.add_argument('--use_apriori', action='store_true', help='Forzar uso de Apriori (si mlxtend está instalado)')
+    parser.add_argument('--miner', choices=['apriori','fpgrowth','eclat','pairs'], default=None, help='Motor de reglas (por defecto: apriori con --use_apriori, sino pairs)')
+    parser.add_argument('--workers', type=int, default=1, help='Procesos para minería de itemsets/reglas y pares y para evaluar K en paralelo (1 = serie)')
+    parser.add_argument('--basket', choices=['sparse','bitset','dense'], default='sparse', help='Representación de la matriz transaccional (CSR dispersa, bitsets uint64 o DataFrame denso)')
     parser.add_argument('--top_n_items', type=int, default=50, help='Número máximo de items a considerar en fallback pares')
+    parser.add_argument('--pairs_min_support', type=float, default=None, help='Soporte mínimo por item para podar antes de calcular pares')
+    parser.add_argument('--rules_top_k', type=int, default=0, help='Conservar solo las K mejores reglas por --rank_by (selección O(n) sin ordenar todas; 0 = todas)')
+    parser.add_argument('--rank_by', choices=RANK_METRICS, default='lift', help='Métrica para ordenar las reglas y elegir las top K')
+    parser.add_argument('--rule_index', default=None, help='Guardar las reglas como índice binario .npz para consultas top-k (cesta → items)')
+    parser.add_argument('--rule_index_top', type=int, default=None, help='Consecuentes conservados por antecedente en el índice (por lift y por confianza)')
+    parser.add_argument('--rfm_state', default=None, help='Fichero .npz con el estado RFM por cliente; --input se incorpora como lote nuevo')
+    parser.add_argument('--cooc_store', default=None, help='Fichero .npz con conteos de co-ocurrencia persistentes; las reglas por pares se calculan desde él')
+    parser.add_argument('--cache_dir', default=None, help='Carpeta de caché de etapas (preprocesado, cesta, itemsets, reglas, RFM) por hash de entrada + parámetros')
+    parser.add_argument('--cache_max_mb', type=int, default=2048, help='Tamaño máximo de la caché de etapas en MB (desaloja lo menos usado)')
     parser.add_argument('--k_min', type=int, default=2, help='K mínimo para evaluación de clusters')
     parser.add_argument('--k_max', type=int, default=8, help='K máximo para evaluación de clusters')
+    parser.add_argument('--silhouette_sample', type=int, default=10000, help='Clientes muestreados para silhouette (0 = todos)')
+    parser.add_argument('--cluster_engine', '--cluster-engine', choices=['kmeans','minibatch'], default='kmeans', help='kmeans: barrido de K completo; minibatch: MiniBatchKMeans por lotes con modelo persistido')
+    parser.add_argument('--n_clusters', type=int, default=4, help='Número de clusters en modo minibatch')
+    parser.add_argument('--cluster_model', default=None, help='Modelo persistido (escalado + centroides) en modo minibatch (por defecto outdir/rfm_kmeans_model.npz)')
+    parser.add_argument('--refit_clusters', action='store_true', help='En modo minibatch, reajustar centroides (partiendo de los anteriores, IDs estables)')
+    parser.add_argument('--plot_workers', type=int, default=1, help='Procesos que dibujan las figuras en paralelo con el resto del flujo (1 = en serie; compensa con muchas figuras o figuras pesadas)')
+    parser.add_argument('--profile', action='store_true', help='Perfilar cada etapa con cProfile (outdir/profile/<etapa>.prof y resumen .txt)')
+    parser.add_argument('--k_patience', type=int, default=None, help='Parar la búsqueda de K tras N valores sin mejorar silhouette')
     args = parser.parse_args()
 
     main(args)
\ No newline at end of file
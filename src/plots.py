@@ -0,0 +1,122 @@
+"""
+Figuras sin estado global: cada gráfico es una Figure de matplotlib con su
+propio lienzo Agg (sin pyplot ni ventanas), así que se pueden dibujar varios
+a la vez y en procesos separados.
+
+Las funciones render_* reciben solo datos ya calculados (arrays, Series
+pequeñas) y una ruta de salida; FigureRenderer las ejecuta en un pool de
+procesos (workers > 1) o en el momento (workers = 1). Los scatter con más de
+HEXBIN_POINTS puntos se dibujan como densidad hexbin en lugar de un punto por
+cliente.
+"""
+import os
+import logging
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+HEXBIN_POINTS = 50_000
+
+def new_figure(figsize, **kwargs):
+    """Figure con lienzo Agg propio (no pasa por pyplot ni queda registrada en ningún gestor)."""
+    fig = Figure(figsize=figsize, **kwargs)
+    FigureCanvasAgg(fig)
+    return fig
+
+def save_figure(fig, out_path, **kwargs):
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    fig.savefig(out_path, **kwargs)
+    return out_path
+
+def render_top_items(labels, values, out_path):
+    fig = new_figure((10, 5))
+    ax = fig.add_subplot()
+    ax.bar(range(len(values)), values)
+    ax.set_xticks(range(len(values)), labels, rotation=45, ha='right')
+    ax.set_ylabel('Support (fraction of transactions)')
+    ax.set_title('Top items por support')
+    fig.tight_layout()
+    save_figure(fig, out_path)
+    logging.info(f"Gráfico top items guardado en: {out_path}")
+    return out_path
+
+def render_rfm_scatter(recency, monetary, out_path, hexbin_points=HEXBIN_POINTS):
+    """Recency vs Monetary: un punto por cliente o, con muchos clientes, densidad hexbin (escala log)."""
+    fig = new_figure((8, 6))
+    ax = fig.add_subplot()
+    if len(recency) > hexbin_points:
+        hb = ax.hexbin(recency, monetary, gridsize=80, bins='log', mincnt=1, cmap='viridis')
+        fig.colorbar(hb, ax=ax, label='clientes (log10)')
+    else:
+        ax.scatter(recency, monetary, s=20)
+    ax.set_xlabel('Recency (days)')
+    ax.set_ylabel('Monetary (total spend)')
+    ax.set_title('Recency vs Monetary (clientes)')
+    fig.tight_layout()
+    save_figure(fig, out_path)
+    logging.info(f"Scatter RFM guardado en: {out_path}")
+    return out_path
+
+def render_radar(profile_scaled, out_path):
+    """Radar de un DataFrame cluster × métrica ya normalizado a [0, 1]."""
+    categories = list(profile_scaled.columns)
+    angles = np.linspace(0, 2*np.pi, len(categories), endpoint=False).tolist()
+    angles += angles[:1]
+
+    fig = new_figure((8, 6))
+    ax = fig.add_subplot(projection='polar')
+    for idx in profile_scaled.index:
+        values = profile_scaled.loc[idx].tolist()
+        values += values[:1]
+        ax.plot(angles, values, label=f'Cluster {idx}')
+    ax.set_thetagrids(np.degrees(angles[:-1]), categories)
+    ax.set_title('Perfil RFM por cluster (normalizado)')
+    ax.legend(loc='upper right', bbox_to_anchor=(1.2, 1.1))
+    save_figure(fig, out_path, bbox_inches='tight', dpi=200)
+    return out_path
+
+class FigureRenderer:
+    """
+    Cola de figuras: submit(fn, *args) devuelve un Future. Con workers > 1
+    las figuras se dibujan en un pool de procesos (spawn: sin heredar hilos
+    ni estado de matplotlib del padre); con workers = 1 se dibujan en el
+    momento. wait() espera todas las pendientes y propaga el primer error.
+    """
+    def __init__(self, workers=1):
+        self.workers = workers
+        self._pool = None
+        self._futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        if self.workers > 1:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            future = self._pool.submit(fn, *args, **kwargs)
+        else:
+            # en serie los errores saltan en el momento, como una llamada normal
+            future = Future()
+            future.set_result(fn(*args, **kwargs))
+        self._futures.append(future)
+        return future
+
+    def wait(self):
+        futures, self._futures = self._futures, []
+        return [f.result() for f in futures]
+
+    def close(self):
+        try:
+            return self.wait()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
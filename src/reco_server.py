@@ -0,0 +1,190 @@
+"""
+Servicio HTTP local de recomendaciones (asyncio, solo biblioteca estándar).
+
+    GET /recommend?item=Producto 1&item=Producto 7&k=5&metric=lift
+        → {"items": [{"item": ..., "score": ...}, ...]}
+    GET /cluster?customer=1082
+        → {"customer": 1082, "cluster": 2, "recency": ..., "frequency": ..., "monetary": ...}
+    GET /health
+        → versiones cargadas de reglas y clusters
+
+Las reglas vienen del índice binario (--rule_index de mineria_ejercicios.py,
+RuleIndex) o de un CSV de reglas (rules_apriori.csv / rules_pairs_top.csv);
+los clusters de rfm_clusters.csv. Una tarea en segundo plano vigila el mtime
+de ambos ficheros y, si cambian, los recarga en un hilo y sustituye la
+referencia de golpe: las peticiones en curso terminan con la versión anterior
+y ninguna se rechaza durante la recarga.
+"""
+import os
+import json
+import asyncio
+import logging
+import argparse
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from rule_index import RuleIndex, METRICS
+from rule_table import load_rule_table
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+def load_rules(path):
+    """RuleIndex desde un .npz del índice o desde un CSV de reglas (o su tabla canónica .npz al lado)."""
+    if path.endswith('.npz'):
+        return RuleIndex.load(path)
+    return RuleIndex.from_rules(load_rule_table(path))
+
+class ClusterLookup:
+    """Cliente → cluster y RFM de rfm_clusters.csv por búsqueda binaria sobre IDs ordenados."""
+    def __init__(self, rfm):
+        ids = rfm['CustomerID'].to_numpy()
+        order = np.argsort(ids, kind='stable')
+        self.ids = ids[order]
+        self.columns = {name: rfm[col].to_numpy()[order]
+                        for name, col in (('cluster', 'Cluster'), ('recency', 'Recency'),
+                                          ('frequency', 'Frequency'), ('monetary', 'Monetary'))}
+        self._numeric = np.issubdtype(self.ids.dtype, np.number)
+
+    @classmethod
+    def load(cls, path):
+        return cls(pd.read_csv(path))
+
+    def get(self, customer):
+        if self._numeric:
+            try:
+                customer = float(customer)
+            except ValueError:
+                return None
+        pos = np.searchsorted(self.ids, customer)
+        if pos >= len(self.ids) or self.ids[pos] != customer:
+            return None
+        row = {'customer': self.ids[pos].item() if self._numeric else self.ids[pos]}
+        row.update({name: values[pos].item() for name, values in self.columns.items()})
+        return row
+
+class WatchedFile:
+    """Último valor cargado de un fichero y su mtime; reload() solo relee si cambió."""
+    def __init__(self, path, loader):
+        self.path, self.loader = path, loader
+        self.value, self.mtime, self.version = None, None, 0
+
+    def changed(self):
+        try:
+            return os.stat(self.path).st_mtime_ns != self.mtime
+        except FileNotFoundError:
+            return False
+
+    async def reload(self):
+        if self.path is None or not self.changed():
+            return False
+        mtime = os.stat(self.path).st_mtime_ns
+        try:
+            # carga en un hilo: el bucle sigue atendiendo con la versión anterior
+            value = await asyncio.get_running_loop().run_in_executor(None, self.loader, self.path)
+        except Exception as e:
+            logging.warning(f"No se pudo recargar {self.path}: {e}; se mantiene la versión anterior")
+            return False
+        self.value, self.mtime = value, mtime
+        self.version += 1
+        logging.info(f"Cargado {self.path} (versión {self.version})")
+        return True
+
+class RecommendationServer:
+    def __init__(self, rules_path=None, clusters_path=None, reload_interval=2.0):
+        self.rules = WatchedFile(rules_path, load_rules)
+        self.clusters = WatchedFile(clusters_path, ClusterLookup.load)
+        self.reload_interval = reload_interval
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.rules.reload()
+            await self.clusters.reload()
+
+    def route(self, target):
+        """(status, cuerpo JSON) para una URL de petición."""
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        if url.path == '/recommend':
+            if self.rules.value is None:
+                return 503, {'error': 'reglas no cargadas'}
+            metric = query.get('metric', ['lift'])[0]
+            if metric not in METRICS:
+                return 400, {'error': f"metric debe ser {' o '.join(METRICS)}"}
+            try:
+                k = int(query.get('k', ['5'])[0])
+            except ValueError:
+                return 400, {'error': 'k debe ser entero'}
+            items = self.rules.value.recommend(query.get('item', []), k=k, metric=metric)
+            return 200, {'items': [{'item': item, 'score': score} for item, score in items]}
+        if url.path == '/cluster':
+            if self.clusters.value is None:
+                return 503, {'error': 'clusters no cargados'}
+            if 'customer' not in query:
+                return 400, {'error': 'falta customer'}
+            row = self.clusters.value.get(query['customer'][0])
+            return (200, row) if row is not None else (404, {'error': 'cliente no encontrado'})
+        if url.path == '/health':
+            return 200, {'rules_version': self.rules.version, 'clusters_version': self.clusters.version}
+        return 404, {'error': 'ruta no encontrada'}
+
+    async def handle(self, reader, writer):
+        # HTTP/1.1 mínimo con keep-alive: una petición GET tras otra por conexión
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3 or parts[0] != 'GET':
+                    status, body = 405, {'error': 'solo GET'}
+                else:
+                    status, body = self.route(parts[1])
+                payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                keep_alive = headers.get('connection', '').lower() != 'close' and parts[-1:] == ['HTTP/1.1']
+                writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                             f"Content-Type: application/json; charset=utf-8\r\n"
+                             f"Content-Length: {len(payload)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        await self.rules.reload()
+        await self.clusters.reload()
+        server = await asyncio.start_server(self.handle, host, port)
+        logging.info(f"Servicio de recomendaciones en http://{host}:{port}")
+        watcher = asyncio.create_task(self._watch())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Servicio HTTP local de recomendaciones (reglas) y clusters RFM')
+    parser.add_argument('--rules', default='outputs/rules_index.npz', help='Índice de reglas .npz o CSV de reglas (rules_apriori.csv / rules_pairs_top.csv)')
+    parser.add_argument('--clusters', default='outputs/rfm_clusters.csv', help='CSV de clientes con cluster (rfm_clusters.csv)')
+    parser.add_argument('--host', default='127.0.0.1', help='Interfaz de escucha (solo localhost por defecto)')
+    parser.add_argument('--port', type=int, default=8765, help='Puerto HTTP')
+    parser.add_argument('--reload_interval', type=float, default=2.0, help='Segundos entre comprobaciones de cambios en los ficheros')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(RecommendationServer(args.rules, args.clusters, args.reload_interval).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
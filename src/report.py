@@ -0,0 +1,207 @@
+"""
+Motor de informes: el contenido se describe una vez como una lista de
+bloques (título, párrafo, tabla, imagen) y se escribe en DOCX, HTML o
+Markdown.
+
+Las tablas del DOCX no pasan por cell.text celda a celda (python-docx
+recorre la tabla entera en cada acceso): las filas se serializan como un
+único fragmento WordprocessingML, se parsean de una vez con lxml y se
+añaden a la tabla. Así caben tablas completas de reglas o clientes (miles de
+filas) en segundos. Los valores se formatean por columna y los conjuntos de
+items (frozenset) una vez por valor único.
+"""
+import io
+import os
+import html
+import base64
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+
+def _itemset_text(value):
+    if isinstance(value, (frozenset, set, tuple, list)):
+        return ', '.join(sorted(str(v) for v in value))
+    return str(value)
+
+def format_column(s):
+    """Columna como texto: NaN → '', conjuntos → 'a, b', float con hasta 6 decimales significativos."""
+    mask = s.isna().to_numpy()
+    if pd.api.types.is_float_dtype(s):
+        text = np.char.mod('%.6g', s.fillna(0).to_numpy(dtype=np.float64)).astype(object)
+    elif pd.api.types.is_numeric_dtype(s) or pd.api.types.is_datetime64_any_dtype(s):
+        text = s.astype(str).to_numpy(dtype=object)
+    else:
+        codes, uniques = pd.factorize(s)
+        text = np.asarray([_itemset_text(u) for u in uniques] + [''], dtype=object)[codes]
+    text[mask] = ''
+    return text
+
+def format_frame(df):
+    """Matriz (filas × columnas) de textos de df, formateada por columna."""
+    if df.empty:
+        return np.empty((0, len(df.columns)), dtype=object)
+    return np.column_stack([format_column(df[c]) for c in df.columns])
+
+class Report:
+    """Lista ordenada de bloques; los write_* la recorren para cada formato."""
+    def __init__(self, title):
+        self.title = title
+        self.blocks = []
+
+    def heading(self, text, level=1):
+        self.blocks.append(('heading', text, level))
+
+    def paragraph(self, text):
+        self.blocks.append(('paragraph', text))
+
+    def table(self, df, title=None):
+        self.blocks.append(('table', df.reset_index(drop=True), title))
+
+    def image(self, source, caption=None):
+        """source: ruta a un PNG o sus bytes (figura en memoria)."""
+        self.blocks.append(('image', source, caption))
+
+    def write(self, path):
+        """Escribe según la extensión: .docx, .html/.htm o .md."""
+        ext = os.path.splitext(path)[1].lower()
+        writers = {'.docx': write_docx, '.html': write_html, '.htm': write_html, '.md': write_markdown}
+        if ext not in writers:
+            raise ValueError(f"Formato de informe no soportado: {ext} (usar .docx, .html o .md)")
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        writers[ext](self, path)
+        return path
+
+def _image_missing(source):
+    return isinstance(source, str) and not os.path.exists(source)
+
+# ---------------- DOCX ----------------
+def _docx_rows_xml(cells, widths):
+    # filas como un único fragmento XML (una sola llamada al parser)
+    tc = [f'<w:tc><w:tcPr><w:tcW w:w="{w}" w:type="dxa"/></w:tcPr><w:p><w:r><w:t xml:space="preserve">'
+          for w in widths]
+    parts = [f'<w:tbl xmlns:w="{W_NS}">']
+    for row in cells:
+        parts.append('<w:tr>')
+        parts.extend(f'{tc[i]}{escape(v)}</w:t></w:r></w:p></w:tc>' for i, v in enumerate(row))
+        parts.append('</w:tr>')
+    parts.append('</w:tbl>')
+    return ''.join(parts)
+
+def add_docx_table(doc, df, style='Light List Accent 1'):
+    """Tabla con cabecera creada por python-docx y filas añadidas en bloque."""
+    from docx.oxml import parse_xml
+    table = doc.add_table(rows=1, cols=len(df.columns))
+    table.style = style
+    for cell, name in zip(table.rows[0].cells, df.columns):
+        cell.text = str(name)
+    widths = [cell.width.twips if cell.width is not None else 0 for cell in table.rows[0].cells]
+    rows = parse_xml(_docx_rows_xml(format_frame(df), widths))
+    tbl = table._tbl
+    for tr in list(rows):
+        tbl.append(tr)
+    return table
+
+def write_docx(report, path):
+    from docx import Document
+    from docx.shared import Inches
+    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+    doc = Document()
+    doc.add_heading(report.title, level=0)
+    for block in report.blocks:
+        kind = block[0]
+        if kind == 'heading':
+            doc.add_heading(block[1], level=block[2])
+        elif kind == 'paragraph':
+            doc.add_paragraph(block[1])
+        elif kind == 'table':
+            _, df, title = block
+            if title:
+                doc.add_paragraph(title, style='Intense Quote')
+            add_docx_table(doc, df)
+            doc.add_paragraph('')
+        elif kind == 'image':
+            _, source, caption = block
+            if _image_missing(source):
+                doc.add_paragraph(f"(Imagen no encontrada: {source})")
+                continue
+            doc.add_paragraph(caption or '')
+            try:
+                doc.add_picture(source if isinstance(source, str) else io.BytesIO(source), width=Inches(5.5))
+                doc.paragraphs[-1].alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+            except Exception as e:
+                doc.add_paragraph(f"(No se pudo insertar la imagen {caption or ''}: {e})")
+            doc.add_paragraph('')
+    doc.save(path)
+
+# ---------------- HTML ----------------
+def _html_image(source, path):
+    if isinstance(source, str):
+        # ruta relativa al HTML: el informe queda ligero y las figuras se ven junto a él
+        return html.escape(os.path.relpath(source, os.path.dirname(os.path.abspath(path))))
+    return 'data:image/png;base64,' + base64.b64encode(source).decode('ascii')
+
+def write_html(report, path):
+    out = ['<!DOCTYPE html>', '<html lang="es"><head><meta charset="utf-8">',
+           f'<title>{html.escape(report.title)}</title>',
+           '<style>body{font-family:sans-serif;max-width:1100px;margin:auto}'
+           'table{border-collapse:collapse;font-size:13px}td,th{border:1px solid #ccc;padding:2px 6px}'
+           'th{background:#4f81bd;color:#fff}img{max-width:100%}</style></head><body>',
+           f'<h1>{html.escape(report.title)}</h1>']
+    for block in report.blocks:
+        kind = block[0]
+        if kind == 'heading':
+            level = min(block[2] + 1, 6)
+            out.append(f'<h{level}>{html.escape(block[1])}</h{level}>')
+        elif kind == 'paragraph':
+            out.append(f'<p>{html.escape(block[1])}</p>')
+        elif kind == 'table':
+            _, df, title = block
+            if title:
+                out.append(f'<p><em>{html.escape(title)}</em></p>')
+            cells = format_frame(df)
+            out.append('<table><thead><tr>' + ''.join(f'<th>{html.escape(str(c))}</th>' for c in df.columns) + '</tr></thead><tbody>')
+            out.extend('<tr>' + ''.join(f'<td>{html.escape(v)}</td>' for v in row) + '</tr>' for row in cells)
+            out.append('</tbody></table>')
+        elif kind == 'image':
+            _, source, caption = block
+            if _image_missing(source):
+                out.append(f'<p>(Imagen no encontrada: {html.escape(source)})</p>')
+                continue
+            out.append(f'<figure><img src="{_html_image(source, path)}" alt="{html.escape(caption or "")}">'
+                       f'<figcaption>{html.escape(caption or "")}</figcaption></figure>')
+    out.append('</body></html>')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(out))
+
+# ---------------- Markdown ----------------
+def _md_cell(value):
+    return value.replace('|', '\\|').replace('\n', ' ')
+
+def write_markdown(report, path):
+    out = [f'# {report.title}', '']
+    for block in report.blocks:
+        kind = block[0]
+        if kind == 'heading':
+            out += ['#' * min(block[2] + 1, 6) + ' ' + block[1], '']
+        elif kind == 'paragraph':
+            out += [block[1], '']
+        elif kind == 'table':
+            _, df, title = block
+            if title:
+                out += [f'*{title}*', '']
+            out.append('| ' + ' | '.join(_md_cell(str(c)) for c in df.columns) + ' |')
+            out.append('|' + '---|' * len(df.columns))
+            out.extend('| ' + ' | '.join(_md_cell(v) for v in row) + ' |' for row in format_frame(df))
+            out.append('')
+        elif kind == 'image':
+            _, source, caption = block
+            if not isinstance(source, str) or _image_missing(source):
+                out += [f'(Imagen no disponible: {caption or ""})', '']
+                continue
+            rel = os.path.relpath(source, os.path.dirname(os.path.abspath(path)))
+            out += [f'![{caption or ""}]({rel})', '']
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(out))
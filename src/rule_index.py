@@ -0,0 +1,140 @@
+"""
+Índice de reglas para consultas online ("comprados juntos frecuentemente").
+
+Las reglas (RuleTable en memoria, rules_apriori / rules_pairs_top o un
+DataFrame) se agrupan por antecedente y se ordenan por lift dentro de cada
+grupo, con una permutación aparte por confianza. recommend(cesta) busca en
+un dict los subconjuntos de la cesta que son antecedentes y recorre solo las
+primeras entradas de cada grupo: no hay que filtrar ni ordenar un DataFrame
+por consulta. El índice se guarda en un .npz compacto (códigos enteros de
+item + arrays de métricas), como los demás estados persistidos.
+"""
+import heapq
+import logging
+from itertools import combinations
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+from rule_table import as_rule_table
+
+METRICS = ('lift', 'confidence')
+
+def _rule_rows(rules):
+    """(antecedente, consecuente, lift, confidence, support) por regla dirigida, para ambos formatos."""
+    # en los pares cada par es una regla en cada sentido (RuleTable.directed)
+    table = as_rule_table(rules).directed()
+    return pd.DataFrame({
+        'antecedent': table.itemsets('antecedent'), 'consequent': table.itemsets('consequent'),
+        'lift': table['lift'], 'confidence': table['confidence'], 'support': table['support'],
+    })
+
+class RuleIndex:
+    """
+    Reglas agrupadas por antecedente (tupla ordenada de códigos de item):
+    - ant_indptr/ant_items: antecedentes en formato CSR
+    - rule_indptr: reglas de cada antecedente, ordenadas por lift descendente
+    - consequent, lift, confidence, support: un valor por (regla, item consecuente)
+    - conf_order: permutación de cada grupo por confianza descendente
+    """
+    def __init__(self, items, ant_indptr, ant_items, rule_indptr, consequent, lift, confidence, support, conf_order):
+        self.items = np.asarray(items, dtype=object)
+        self.ant_indptr, self.ant_items = ant_indptr, ant_items
+        self.rule_indptr, self.conf_order = rule_indptr, conf_order
+        self.consequent, self.lift, self.confidence, self.support = consequent, lift, confidence, support
+        self._codes = {name: code for code, name in enumerate(self.items)}
+        self._groups = {tuple(ant_items[ant_indptr[a]:ant_indptr[a + 1]].tolist()): (int(rule_indptr[a]), int(rule_indptr[a + 1]))
+                        for a in range(len(ant_indptr) - 1)}
+        self.max_antecedent = int(np.diff(ant_indptr).max()) if len(ant_indptr) > 1 else 0
+        # listas de Python: el acceso por elemento en la consulta es más rápido que en ndarray
+        self._cons = consequent.tolist()
+        self._values = {'lift': lift.tolist(), 'confidence': confidence.tolist()}
+        self._order = {'lift': None, 'confidence': conf_order.tolist()}
+
+    def __len__(self):
+        return len(self.consequent)
+
+    @classmethod
+    def from_rules(cls, rules, max_per_antecedent=None):
+        """
+        Construye el índice desde una RuleTable o un DataFrame de reglas
+        (formato Apriori o pares). Las reglas con varios consecuentes aportan una entrada por item;
+        si un item aparece varias veces para el mismo antecedente se queda el
+        mayor valor de cada métrica. max_per_antecedent conserva solo los N
+        mejores por lift o por confianza de cada antecedente (recommend sigue
+        siendo exacto mientras k + tamaño de la cesta <= N).
+        """
+        rows = _rule_rows(rules).explode('consequent', ignore_index=True)
+        names = set(rows['consequent'])
+        for antecedent in rows['antecedent']:
+            names.update(antecedent)
+        items = np.asarray(sorted(names), dtype=object)
+        codes = {name: code for code, name in enumerate(items)}
+        rows['con'] = rows['consequent'].map(codes).astype(np.int32)
+        ant_codes = [tuple(codes[i] for i in a) for a in rows['antecedent']]
+        ant_ids = {a: i for i, a in enumerate(dict.fromkeys(ant_codes))}
+        rows['ant_id'] = [ant_ids[a] for a in ant_codes]
+        # un item repetido para el mismo antecedente conserva el mejor valor de cada métrica
+        rows = (rows.groupby(['ant_id', 'con'], sort=False)[['lift', 'confidence', 'support']].max().reset_index()
+                    .sort_values(['ant_id', 'lift', 'confidence', 'con'], ascending=[True, False, False, True]))
+        if max_per_antecedent:
+            by_lift = rows.groupby('ant_id').cumcount() < max_per_antecedent
+            by_conf = (rows.sort_values(['ant_id', 'confidence'], ascending=[True, False], kind='stable')
+                           .groupby('ant_id').cumcount() < max_per_antecedent).reindex(rows.index)
+            rows = rows[by_lift | by_conf]
+        rows = rows.reset_index(drop=True)
+
+        rule_indptr = np.searchsorted(rows['ant_id'].to_numpy(), np.arange(len(ant_ids) + 1)).astype(np.int64)
+        conf_order = (rows.sort_values(['ant_id', 'confidence', 'lift'], ascending=[True, False, False], kind='stable')
+                          .index.to_numpy(dtype=np.int64))
+        ant_indptr = np.concatenate([[0], np.cumsum([len(a) for a in ant_ids])]).astype(np.int64)
+        ant_items = np.asarray([c for a in ant_ids for c in a], dtype=np.int32)
+        index = cls(items, ant_indptr, ant_items, rule_indptr, rows['con'].to_numpy(dtype=np.int32),
+                    rows['lift'].to_numpy(dtype=np.float64), rows['confidence'].to_numpy(dtype=np.float64),
+                    rows['support'].to_numpy(dtype=np.float64), conf_order)
+        logging.info(f"Índice de reglas: {len(ant_ids)} antecedentes, {len(index)} entradas, {len(items)} items")
+        return index
+
+    def recommend(self, basket, k=5, metric='lift'):
+        """
+        Top-k items recomendados para la cesta (nombres de item) por lift o
+        confidence: el mejor valor de cada consecuente entre las reglas cuyo
+        antecedente está contenido en la cesta. Devuelve [(item, valor), ...].
+        """
+        if metric not in METRICS:
+            raise ValueError(f"Métrica no soportada: {metric} (usar {', '.join(METRICS)})")
+        codes = sorted({self._codes[i] for i in basket if i in self._codes})
+        in_basket = set(codes)
+        cons, values, order = self._cons, self._values[metric], self._order[metric]
+        best = {}
+        for size in range(1, min(self.max_antecedent, len(codes)) + 1):
+            for ant in combinations(codes, size):
+                group = self._groups.get(ant)
+                if group is None:
+                    continue
+                start, end = group
+                taken = 0
+                # cada grupo ya está ordenado: bastan sus primeros k consecuentes fuera de la cesta
+                for r in (range(start, end) if order is None else order[start:end]):
+                    c = cons[r]
+                    if c in in_basket:
+                        continue
+                    if values[r] > best.get(c, -np.inf):
+                        best[c] = values[r]
+                    taken += 1
+                    if taken == k:
+                        break
+        return [(self.items[c], v) for c, v in heapq.nlargest(k, best.items(), key=itemgetter(1))]
+
+    def save(self, path):
+        np.savez(path, items=self.items.astype(str), ant_indptr=self.ant_indptr, ant_items=self.ant_items,
+                 rule_indptr=self.rule_indptr, consequent=self.consequent, lift=self.lift,
+                 confidence=self.confidence, support=self.support, conf_order=self.conf_order)
+        logging.info(f"Índice de reglas guardado en: {path}")
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['items'].astype(object), data['ant_indptr'], data['ant_items'], data['rule_indptr'],
+                       data['consequent'], data['lift'], data['confidence'], data['support'], data['conf_order'])
@@ -0,0 +1,334 @@
+"""
+Tabla canónica de reglas de asociación, común a Apriori / FP-Growth / Eclat
+y al fallback por pares. Es lo que devuelven los mineros y lo que leen los
+scripts (interpretaciones, top 5, red de reglas, informe, índice de reglas):
+
+- antecedentes y consecuentes como códigos enteros de item en formato CSR
+  (ant_indptr/ant_items, con_indptr/con_items, int32)
+- métricas en columnas numéricas de ancho fijo (float64; int64 para conteos)
+  en el orden de columnas del CSV
+- items: diccionario código → nombre. Los textos "a, b" solo se construyen al
+  pedirlos (itemset_text), concatenando por columnas, y se conservan al
+  filtrar u ordenar la tabla.
+
+kind='itemsets' son reglas de Apriori y de los mineros nativos (columnas
+antecedents/consequents/confidence); kind='pairs' son las del fallback
+(antecedent/consequent). En los pares las métricas con sentido llevan las
+dos direcciones: la métrica X de la tabla (A -> C) es X_a_b en el CSV y
+X_b_a la de la regla inversa (confidence_a_b/confidence_b_a, conviction...).
+to_frame() devuelve el DataFrame con las columnas de siempre para los CSV;
+save()/load() guardan la tabla en un .npz sin pérdida (en el
+CSV un nombre de item con ", " no se distingue de un conjunto).
+"""
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+KINDS = ('itemsets', 'pairs')
+# métricas disponibles en los dos tipos de reglas (para ordenar / elegir top-k)
+RANK_METRICS = ('lift', 'confidence', 'support', 'leverage', 'conviction', 'jaccard', 'cosine', 'kulczynski')
+# columnas de item en cada formato de CSV
+_ITEM_COLUMNS = {'itemsets': ('antecedents', 'consequents'), 'pairs': ('antecedent', 'consequent')}
+
+def _csr(lengths, items):
+    indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    return indptr, np.asarray(items, dtype=np.int32)
+
+def _csr_take(indptr, items, rows):
+    """Filas rows (índices) de una matriz CSR de códigos, sin bucles de Python."""
+    lengths = np.diff(indptr)[rows]
+    new_indptr, _ = _csr(lengths, [])
+    starts = np.repeat(indptr[:-1][rows] - new_indptr[:-1], lengths)
+    return new_indptr, items[starts + np.arange(new_indptr[-1])]
+
+def _csr_rows(indptr, items):
+    """Matriz densa (filas × tamaño máximo) de códigos con -1 de relleno."""
+    lengths = np.diff(indptr)
+    mat = np.full((len(lengths), int(lengths.max()) if len(lengths) else 0), -1, dtype=np.int64)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    mat[rows, np.arange(len(items)) - np.repeat(indptr[:-1], lengths)] = items
+    return mat
+
+def _split_itemset(value, split):
+    # en memoria mlxtend da frozensets; en CSV los conjuntos llegan como "a, b"
+    if isinstance(value, (frozenset, set, tuple, list)):
+        return [str(v) for v in value]
+    return str(value).split(', ') if split else [str(value)]
+
+def _itemset_codes(column, split):
+    """(lista de nombres por valor distinto, código de valor por fila): un split por valor distinto."""
+    codes, uniques = pd.factorize(column)
+    parts = [_split_itemset(u, split) for u in uniques]
+    return parts, codes
+
+class RuleTable:
+    def __init__(self, items, ant_indptr, ant_items, con_indptr, con_items, metrics, kind='itemsets'):
+        if kind not in KINDS:
+            raise ValueError(f"Tipo de reglas no soportado: {kind} (usar {', '.join(KINDS)})")
+        self.items = np.asarray(items, dtype=object)
+        self.ant_indptr, self.ant_items = ant_indptr, ant_items
+        self.con_indptr, self.con_items = con_indptr, con_items
+        self.metrics = metrics
+        self.kind = kind
+        self._text = {}
+
+    def __len__(self):
+        return len(self.ant_indptr) - 1
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def __getitem__(self, metric):
+        return self.metrics[metric]
+
+    # ---------------- construcción ----------------
+    @classmethod
+    def from_codes(cls, items, antecedents, consequents, metrics, kind='itemsets'):
+        """
+        Tabla desde secuencias de códigos (tuplas de índices en items) por
+        regla, como las generan los mineros. metrics: dict nombre → array.
+        """
+        ant = _csr(np.fromiter(map(len, antecedents), dtype=np.int64, count=len(antecedents)),
+                   [c for a in antecedents for c in a])
+        con = _csr(np.fromiter(map(len, consequents), dtype=np.int64, count=len(consequents)),
+                   [c for a in consequents for c in a])
+        return cls(items, *ant, *con, _metric_columns(metrics), kind=kind)
+
+    @classmethod
+    def from_pairs(cls, items, ant, con, metrics):
+        """Reglas por pares: un item de antecedente y uno de consecuente por regla (códigos en arrays)."""
+        indptr = np.arange(len(ant) + 1, dtype=np.int64)
+        return cls(items, indptr, np.asarray(ant, dtype=np.int32), indptr.copy(), np.asarray(con, dtype=np.int32),
+                   _metric_columns(metrics), kind='pairs')
+
+    @classmethod
+    def from_frame(cls, rules):
+        """
+        Tabla desde un DataFrame de reglas en cualquiera de los dos formatos
+        (frozensets de mlxtend o textos "a, b" del CSV). El vocabulario queda
+        ordenado por nombre; cada conjunto distinto se separa una sola vez.
+        """
+        kind = 'itemsets' if 'antecedents' in rules.columns else 'pairs'
+        ant_col, con_col = _ITEM_COLUMNS[kind]
+        rules = rules.dropna(subset=[ant_col, con_col])
+        ant_parts, ant_codes = _itemset_codes(rules[ant_col], split=kind == 'itemsets')
+        con_parts, con_codes = _itemset_codes(rules[con_col], split=kind == 'itemsets')
+        items = np.unique(np.asarray([n for p in ant_parts + con_parts for n in p], dtype=object))
+
+        def side(parts, codes):
+            # CSR por valor distinto y después una fila por regla
+            uniq = _csr(np.fromiter(map(len, parts), dtype=np.int64, count=len(parts)),
+                        np.searchsorted(items, [n for p in parts for n in p]) if parts else [])
+            return _csr_take(*uniq, codes)
+
+        metrics = {}
+        for col in rules.columns:
+            if col in (ant_col, con_col):
+                continue
+            values = pd.to_numeric(rules[col], errors='coerce')
+            if values.isna().all() and not rules[col].isna().all():
+                continue  # columna de texto ajena a las métricas
+            name = col[:-len('_a_b')] if kind == 'pairs' and col.endswith('_a_b') else col
+            metrics[name] = values.to_numpy()
+        return cls(items, *side(ant_parts, ant_codes), *side(con_parts, con_codes), _metric_columns(metrics), kind=kind)
+
+    # ---------------- selección ----------------
+    def take(self, rows):
+        """Subtabla con las reglas rows (índices o máscara booleana), en ese orden."""
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        table = RuleTable(self.items, *_csr_take(self.ant_indptr, self.ant_items, rows),
+                          *_csr_take(self.con_indptr, self.con_items, rows),
+                          {name: values[rows] for name, values in self.metrics.items()}, kind=self.kind)
+        table._text = {side: text[rows] for side, text in self._text.items()}
+        return table
+
+    def head(self, n=5):
+        return self.take(np.arange(min(n, len(self))))
+
+    def filter(self, **min_values):
+        """Reglas con cada métrica >= su umbral, p. ej. filter(lift=1.2, support=0.01)."""
+        mask = np.ones(len(self), dtype=bool)
+        for metric, threshold in min_values.items():
+            if threshold is not None:
+                mask &= self.metrics[metric] >= threshold
+        return self.take(mask)
+
+    def top_rows(self, k, metric='lift'):
+        """Índices de las k reglas con mayor metric, ordenados (k=None: todas). Ver top_rows()."""
+        if metric not in self.metrics:
+            raise ValueError(f"Métrica no disponible: {metric} (usar {', '.join(self.metrics)})")
+        return top_rows(self.metrics[metric], k)
+
+    def top(self, k, metric='lift'):
+        return self.take(self.top_rows(k, metric))
+
+    def sort(self, metric='lift'):
+        return self.take(self.top_rows(None, metric))
+
+    # ---------------- nombres de item (perezosos) ----------------
+    def _side(self, side):
+        if side == 'antecedent':
+            return self.ant_indptr, self.ant_items
+        return self.con_indptr, self.con_items
+
+    def _sorted_codes(self, side):
+        # (nombres ordenados, matriz filas × tamaño con la posición de cada item en ese orden; relleno = len)
+        names = self.items.astype(str).astype(object)
+        order = np.argsort(names, kind='stable')
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        mat = _csr_rows(*self._side(side))
+        key = np.where(mat >= 0, rank[np.maximum(mat, 0)], len(order))
+        key.sort(axis=1)
+        return names[order], key
+
+    def itemset_text(self, side='antecedent'):
+        """
+        Texto "a, b" (nombres ordenados) por regla. Se concatena por columnas
+        del conjunto (una pasada por posición, no por regla) y se guarda.
+        """
+        if side not in self._text:
+            names, key = self._sorted_codes(side)
+            n = len(names)
+            text = np.full(len(self), '', dtype=object)
+            for j in range(key.shape[1]):
+                col = key[:, j]
+                present = col < n
+                if j == 0:
+                    text[present] = names[col[present]]
+                else:
+                    text[present] = text[present] + ', ' + names[col[present]]
+            self._text[side] = text
+        return self._text[side]
+
+    def itemsets(self, side='antecedent'):
+        """Tupla ordenada de nombres por regla (una tupla por conjunto distinto, compartida)."""
+        if len(self) == 0:
+            return np.zeros(0, dtype=object)
+        names, key = self._sorted_codes(side)
+        uniq, inverse = np.unique(key, axis=0, return_inverse=True)
+        values = np.empty(len(uniq), dtype=object)
+        values[:] = [tuple(names[row[row < len(names)]]) for row in uniq]
+        return values[inverse.ravel()]
+
+    def directed(self):
+        """
+        Una fila por regla dirigida: en las de pares cada par es además la
+        regla inversa (consecuente → antecedente, con X = X_b_a).
+        """
+        if self.kind != 'pairs':
+            return self
+        n = len(self)
+        metrics = {name: np.concatenate([values, values]) for name, values in self.metrics.items()}
+        for name in self._two_way():
+            metrics[name][n:] = self.metrics[name + '_b_a']
+        indptr = np.arange(2 * len(self) + 1, dtype=np.int64)
+        return RuleTable(self.items, indptr, np.concatenate([self.ant_items, self.con_items]),
+                         indptr.copy(), np.concatenate([self.con_items, self.ant_items]), metrics)
+
+    # ---------------- formatos de salida ----------------
+    def _two_way(self):
+        # métricas de pares con valor en cada sentido (X y X_b_a)
+        if self.kind != 'pairs':
+            return []
+        return [name for name in self.metrics if name + '_b_a' in self.metrics]
+
+    def _column_name(self, name):
+        return name + '_a_b' if name in self._two_way() else name
+
+    def columns(self, names=('support', 'confidence', 'lift')):
+        """Nombres de columna del CSV de las métricas names (más las de item), para elegir columnas de to_frame()."""
+        ant_col, con_col = _ITEM_COLUMNS[self.kind]
+        return [ant_col, con_col] + [self._column_name(n) for n in names if n in self.metrics]
+
+    def to_frame(self):
+        """DataFrame con las columnas del CSV de siempre (rules_apriori.csv o rules_pairs_top.csv)."""
+        ant_col, con_col = _ITEM_COLUMNS[self.kind]
+        data = {ant_col: self.itemset_text('antecedent'), con_col: self.itemset_text('consequent')}
+        for name, values in self.metrics.items():
+            data[self._column_name(name)] = values
+        return pd.DataFrame(data)
+
+    def save(self, path):
+        names = list(self.metrics)
+        np.savez(path, kind=self.kind, items=self.items.astype(str), ant_indptr=self.ant_indptr, ant_items=self.ant_items,
+                 con_indptr=self.con_indptr, con_items=self.con_items, metric_names=np.asarray(names, dtype=str),
+                 **{f'metric_{i}': self.metrics[n] for i, n in enumerate(names)})
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            metrics = {str(n): data[f'metric_{i}'] for i, n in enumerate(data['metric_names'])}
+            return cls(data['items'].astype(object), data['ant_indptr'], data['ant_items'],
+                       data['con_indptr'], data['con_items'], metrics, kind=str(data['kind']))
+
+def top_rows(values, k=None):
+    """
+    Índices de los k mayores valores en orden descendente (empates por
+    posición, como nlargest keep='first'; NaN al final). Con k < len usa
+    np.partition (O(n)) y solo ordena los k elegidos; k=None ordena todos.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    key = np.where(np.isnan(values), np.inf, -values)
+    n = len(key)
+    if k is None or k >= n:
+        return np.argsort(key, kind='stable')
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    kth = np.partition(key, k - 1)[k - 1]
+    better = np.flatnonzero(key < kth)
+    rows = np.concatenate([better, np.flatnonzero(key == kth)[:k - len(better)]])
+    return rows[np.lexsort((rows, key[rows]))]
+
+def _metric_columns(metrics):
+    # ancho fijo: enteros como int64, el resto float64 (NaN si no es numérico)
+    out = {}
+    for name, values in metrics.items():
+        values = np.asarray(values)
+        out[name] = values.astype(np.int64) if values.dtype.kind in 'iub' else values.astype(np.float64)
+    return out
+
+def table_path(csv_path):
+    """Ruta del .npz canónico que acompaña a un CSV de reglas."""
+    return os.path.splitext(csv_path)[0] + '.npz'
+
+def write_rule_table(table, csv_path):
+    """Guarda el CSV de siempre y, a su lado, la tabla canónica .npz."""
+    table.to_frame().to_csv(csv_path, index=False)
+    table.save(table_path(csv_path))
+    return csv_path
+
+def load_rule_table(path):
+    """
+    RuleTable desde un .npz canónico o un CSV de reglas (cualquier formato).
+    Si junto al CSV hay un .npz igual o más reciente se lee ese, sin parsear
+    texto. None si el fichero no existe o no tiene reglas.
+    """
+    npz = path if path.endswith('.npz') else table_path(path)
+    if os.path.exists(npz) and (npz == path or not os.path.exists(path)
+                                or os.path.getmtime(npz) >= os.path.getmtime(path)):
+        table = RuleTable.load(npz)
+    elif os.path.exists(path) and os.path.getsize(path) > 0:
+        try:
+            table = RuleTable.from_frame(pd.read_csv(path))
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+            logging.warning(f"No se pudieron leer las reglas de {path}: {e}")
+            return None
+    else:
+        return None
+    return None if table.empty else table
+
+def as_rule_table(rules):
+    """RuleTable tal cual, o convertida desde un DataFrame de reglas; None si no hay reglas."""
+    if rules is None:
+        return None
+    if not isinstance(rules, RuleTable):
+        rules = RuleTable.from_frame(rules)
+    return rules
@@ -0,0 +1,107 @@
+"""
+Caché en disco de etapas del pipeline (preprocesado, cesta, itemsets, reglas,
+tabla RFM).
+
+Cada etapa se guarda con una clave sha256 de (etapa, clave de la etapa
+anterior, parámetros propios); la primera clave sale de la huella del CSV de
+entrada. Así, al relanzar cambiando solo --min_confidence o --k_max se
+reutiliza todo lo anterior y se recalcula desde la primera etapa cuya clave
+cambia. Las entradas son pickles en cache_dir; al superar max_bytes se
+borran las menos usadas recientemente (LRU por mtime, que se toca en cada
+acierto).
+"""
+import os
+import pickle
+import hashlib
+import logging
+
+# subir si cambia el formato de alguna etapa: invalida las entradas antiguas
+CACHE_VERSION = 2
+_SAMPLE_BYTES = 1 << 20
+
+def file_fingerprint(path):
+    """
+    Huella barata del fichero de entrada: tamaño, mtime y sha256 del primer y
+    último MiB (evita leer completo un CSV de varios GB en cada ejecución).
+    """
+    st = os.stat(path)
+    h = hashlib.sha256(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    with open(path, 'rb') as f:
+        h.update(f.read(_SAMPLE_BYTES))
+        if st.st_size > _SAMPLE_BYTES:
+            f.seek(max(st.st_size - _SAMPLE_BYTES, _SAMPLE_BYTES))
+            h.update(f.read(_SAMPLE_BYTES))
+    return h.hexdigest()
+
+def stage_key(stage, *parts):
+    """Clave de una etapa: sha256 del nombre, la versión y los parámetros (repr estable)."""
+    h = hashlib.sha256(repr((CACHE_VERSION, stage) + parts).encode())
+    return f"{stage}-{h.hexdigest()[:32]}"
+
+class StageCache:
+    """
+    Resultados de etapas en cache_dir/<clave>.pkl con desalojo LRU por tamaño.
+    Uso: value = cache.memo(stage_key('rules', parent, min_conf), lambda: ...)
+    """
+    def __init__(self, cache_dir, max_bytes=2 << 30):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """Valor guardado para key, o None si no está (o no se puede leer)."""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except Exception as e:
+            logging.warning(f"Entrada de caché ilegible {path}: {e}; se recalcula")
+            os.remove(path)
+            return None
+        os.utime(path)  # marca de uso para el LRU
+        logging.info(f"Caché: reutilizando etapa {key}")
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)  # escritura atómica: nunca queda una entrada a medias
+        self._evict(keep=path)
+        return value
+
+    def memo(self, key, fn):
+        """Devuelve la etapa cacheada o la calcula con fn() y la guarda."""
+        value = self.get(key)
+        if value is None:
+            value = fn()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def _evict(self, keep=None):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pkl'):
+                path = os.path.join(self.cache_dir, name)
+                st = os.stat(path)
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            total -= size
+            logging.info(f"Caché: desalojada {os.path.basename(path)} ({size} bytes)")
+
+def cached(cache, key, fn):
+    """cache.memo(key, fn) si hay caché; si no (cache=None), simplemente fn()."""
+    return fn() if cache is None else cache.memo(key, fn)
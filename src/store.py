@@ -0,0 +1,204 @@
+"""
+Almacén columnar del preprocesado (outputs/ventas_preprocessed.parquet).
+
+Guarda el DataFrame limpio con tipos compactos (IDs int32, Description /
+Country / StockCode categóricas, UnitPrice float32 si no pierde céntimos,
+InvoiceDate datetime) para que los scripts
+lean en milisegundos solo las columnas que necesitan, con memory-map y sin
+volver a parsear fechas. Si pyarrow no está instalado se usa el CSV clásico.
+
+En Parquet el esquema es fijo por columna (IDs y texto como diccionario,
+números como float64) para que los chunks con otros tipos inferidos se
+puedan añadir; read_preprocessed devuelve los tipos compactos de arriba.
+"""
+import os
+import logging
+
+import numpy as np
+import pandas as pd
+
+# Intento importar pyarrow (Parquet). Si falla, usamos CSV.
+USE_PYARROW = True
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    USE_PYARROW = False
+
+PREPROCESSED_NAME = 'ventas_preprocessed'
+CATEGORICAL_COLUMNS = ['StockCode', 'Description', 'Description_clean', 'Country']
+INT32_COLUMNS = ['InvoiceNo', 'CustomerID', 'Quantity']
+# TotalPrice queda en float64: es lo que se suma en Monetary
+FLOAT32_COLUMNS = ['UnitPrice']
+
+def preprocessed_path(outdir, fmt='parquet'):
+    return os.path.join(outdir, f"{PREPROCESSED_NAME}.{fmt}")
+
+def _fits_int32(s):
+    if not (pd.api.types.is_integer_dtype(s) or pd.api.types.is_float_dtype(s)):
+        return False
+    values = s.to_numpy()
+    if len(values) == 0:
+        return True
+    if pd.api.types.is_float_dtype(s) and not np.all(np.mod(values, 1) == 0):
+        return False
+    info = np.iinfo(np.int32)
+    return values.min() >= info.min and values.max() <= info.max
+
+def _fits_float32(s):
+    # float32 sin pérdida: redondeado a céntimos devuelve exactamente el valor original
+    if not pd.api.types.is_float_dtype(s) or s.dtype == np.float32:
+        return False
+    values = s.to_numpy()
+    return bool(np.array_equal(np.round(values.astype(np.float32).astype(np.float64), 2), values))
+
+def compact_dtypes(df):
+    """
+    Convierte df en su sitio a tipos compactos: INT32_COLUMNS a int32 si caben,
+    FLOAT32_COLUMNS a float32 si se recuperan los céntimos exactos y CATEGORICAL_COLUMNS
+    a categóricas con categorías ordenadas (los códigos sirven directamente
+    como códigos de item en la cesta). Devuelve df.
+    """
+    for col in INT32_COLUMNS:
+        if col in df.columns and _fits_int32(df[col]):
+            df[col] = df[col].astype(np.int32)
+    for col in FLOAT32_COLUMNS:
+        if col in df.columns and _fits_float32(df[col]):
+            df[col] = df[col].astype(np.float32)
+    for col in CATEGORICAL_COLUMNS:
+        if col not in df.columns:
+            continue
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.remove_unused_categories()
+        else:
+            values = df[col]
+            df[col] = values.where(values.isna(), values.astype(str)).astype('category')
+    return df
+
+def to_columnar(df):
+    """Tipos compactos para el almacén columnar (no modifica df)."""
+    df = compact_dtypes(df.copy())
+    if 'InvoiceDate' in df.columns:
+        df['InvoiceDate'] = pd.to_datetime(df['InvoiceDate'])
+    return df
+
+# Columnas que se guardan como texto en Parquet: un chunk puede traer facturas
+# alfanuméricas (C536379) y otro solo numéricas
+ID_COLUMNS = ['InvoiceNo', 'CustomerID']
+
+def _arrow_type(col, dtype):
+    """
+    Tipo Parquet de una columna, fijado por su nombre y no por lo que infiera el
+    primer chunk: texto e IDs como diccionario int32/string, números como float64
+    (al leer, compact_dtypes los vuelve a compactar) y fechas como timestamp.
+    """
+    if col in ID_COLUMNS or col in CATEGORICAL_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    if col == 'InvoiceDate' or pd.api.types.is_datetime64_any_dtype(dtype):
+        return pa.timestamp('ns')
+    if pd.api.types.is_bool_dtype(dtype):
+        return pa.bool_()
+    if pd.api.types.is_numeric_dtype(dtype):
+        return pa.float64()
+    return pa.dictionary(pa.int32(), pa.string())
+
+def _as_text_categories(s):
+    # categorías de texto aunque el chunk sea numérico o esté vacío (todo NaN)
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.astype('category')
+    categories = s.cat.categories
+    return s.cat.rename_categories(pd.Index(categories.astype(str), dtype=object))
+
+def _arrow_table(df, schema):
+    df = to_columnar(df)[schema.names]
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            df[field.name] = _as_text_categories(df[field.name])
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+def _from_columnar(df):
+    # IDs guardados como texto: vuelven a enteros si todos lo son (lo habitual)
+    for col in ID_COLUMNS:
+        if col not in df.columns or not isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        numbers = pd.to_numeric(df[col].cat.categories, errors='coerce')
+        codes = df[col].cat.codes.to_numpy()
+        if not np.isnan(numbers).any() and (codes >= 0).all():
+            df[col] = np.asarray(numbers)[codes]
+    return compact_dtypes(df)
+
+class PreprocessedWriter:
+    """
+    Escribe el preprocesado en Parquet (o CSV sin pyarrow), en una sola vez o
+    chunk a chunk. Uso: with PreprocessedWriter(outdir) as w: w.write(df)
+    """
+    def __init__(self, outdir, fmt='parquet'):
+        if fmt == 'parquet' and not USE_PYARROW:
+            logging.warning("pyarrow no disponible. Guardando preprocesado en CSV.")
+            fmt = 'csv'
+        self.fmt = fmt
+        self.path = preprocessed_path(outdir, fmt)
+        self._writer = None
+        self._schema = None
+        self._rows = 0
+
+    def write(self, df):
+        if self.fmt == 'csv':
+            df.to_csv(self.path, index=False, mode='a' if self._rows else 'w', header=not self._rows)
+        else:
+            if self._writer is None:
+                # el esquema sale de los nombres de columna, no de los tipos del primer chunk:
+                # un chunk con Country todo NaN o InvoiceNo alfanumérico no lo rompe
+                self._schema = pa.schema([(col, _arrow_type(col, df[col].dtype)) for col in df.columns])
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(_arrow_table(df, self._schema))
+        self._rows += len(df)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        logging.info(f"Preprocesado guardado en: {self.path} ({self._rows} filas)")
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_preprocessed(df, outdir, fmt='parquet'):
+    with PreprocessedWriter(outdir, fmt=fmt) as writer:
+        writer.write(df)
+    return writer.path
+
+def has_preprocessed(outdir='outputs'):
+    return any(os.path.exists(preprocessed_path(outdir, fmt)) for fmt in ('parquet', 'csv'))
+
+def preprocessed_columns(outdir='outputs'):
+    """Columnas disponibles en el preprocesado, sin leer los datos."""
+    parquet = preprocessed_path(outdir, 'parquet')
+    if USE_PYARROW and os.path.exists(parquet):
+        return pq.read_schema(parquet).names
+    return pd.read_csv(preprocessed_path(outdir, 'csv'), nrows=0).columns.tolist()
+
+def read_preprocessed(outdir='outputs', columns=None):
+    """
+    Lee el preprocesado: Parquet con memory-map y solo las columnas pedidas si
+    existe (y hay pyarrow); si no, el CSV clásico con InvoiceDate como fecha.
+    """
+    parquet = preprocessed_path(outdir, 'parquet')
+    if USE_PYARROW and os.path.exists(parquet):
+        return _from_columnar(pq.read_table(parquet, columns=columns, memory_map=True).to_pandas())
+    csv = preprocessed_path(outdir, 'csv')
+    if not os.path.exists(csv):
+        raise FileNotFoundError(f"No se encontró el preprocesado en {outdir} (parquet ni csv)")
+    parse_dates = ['InvoiceDate'] if columns is None or 'InvoiceDate' in columns else None
+    return pd.read_csv(csv, usecols=columns, parse_dates=parse_dates)
+
+def preprocessed_rows(outdir='outputs'):
+    """Número de filas del preprocesado (en Parquet sin leer los datos)."""
+    parquet = preprocessed_path(outdir, 'parquet')
+    if USE_PYARROW and os.path.exists(parquet):
+        return pq.ParquetFile(parquet).metadata.num_rows
+    return len(read_preprocessed(outdir, columns=['InvoiceNo']))
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_CSV = os.path.join(ROOT, 'data', 'ventas_ejemplo.csv')
+
+# los módulos del proyecto se importan como en scripts/ (src/ y scripts/ en el path)
+for folder in ('src', 'scripts'):
+    sys.path.insert(0, os.path.join(ROOT, folder))
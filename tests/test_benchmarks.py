@@ -0,0 +1,19 @@
+import os
+import sys
+import json
+import subprocess
+
+from conftest import ROOT
+
+def test_bench_size_with_workers_exits_promptly(tmp_path):
+    # regresión: los workers de joblib del clustering dejaban el proceso del tamaño esperando 300 s
+    out = tmp_path / 'bench.json'
+    proc = subprocess.run([sys.executable, os.path.join(ROOT, 'scripts', 'run_benchmarks.py'),
+                           '--sizes', '3000', '--workers', '2', '--stages', 'rfm_cluster', '--k_max', '4',
+                           '--data_dir', str(tmp_path / 'data'), '--work_dir', str(tmp_path / 'work'),
+                           '--out', str(out)],
+                          capture_output=True, text=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    results = json.loads(out.read_text())['results']
+    assert [r['stage'] for r in results if 'error' not in r][-1] == 'rfm_cluster'
+    assert all(r['workers'] == 2 for r in results)
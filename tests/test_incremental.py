@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import SAMPLE_CSV
+from mineria_ejercicios import (load_and_preprocess, compute_rfm, RFMState, CooccurrenceStore,
+                                create_transaction_matrix, run_pairs_fallback, cluster_rfm_minibatch)
+
+@pytest.fixture(scope='module')
+def sales():
+    return load_and_preprocess(SAMPLE_CSV)
+
+def sorted_rfm(rfm):
+    return rfm.sort_values('CustomerID').reset_index(drop=True)
+
+@pytest.mark.parametrize('n_batches', [1, 3, 40])
+def test_rfm_state_matches_full_recomputation(sales, n_batches):
+    # cortes por fila: algunas facturas quedan repartidas entre lotes y cuentan una vez
+    state = RFMState()
+    for rows in np.array_split(np.arange(len(sales)), n_batches):
+        state.update(sales.iloc[rows])
+    pd.testing.assert_frame_equal(sorted_rfm(state.result()), sorted_rfm(compute_rfm(sales)), check_dtype=False)
+
+def test_rfm_state_persists_between_runs(sales, tmp_path):
+    path = str(tmp_path / 'rfm_state.npz')
+    half = len(sales) // 2
+    RFMState.load(path).update(sales.iloc[:half]).save(path)
+    state = RFMState.load(path).update(sales.iloc[half:])
+    pd.testing.assert_frame_equal(sorted_rfm(state.result()), sorted_rfm(compute_rfm(sales)), check_dtype=False)
+    # result() puede pedirse más de una vez sin volver a sumar los lotes
+    pd.testing.assert_frame_equal(state.result(), state.result())
+
+def pair_frame(rules):
+    return rules.to_frame().sort_values(['antecedent', 'consequent']).reset_index(drop=True)
+
+@pytest.mark.parametrize('representation', ['sparse', 'bitset'])
+def test_cooccurrence_store_matches_full_recomputation(sales, tmp_path, representation):
+    invoices = sales['InvoiceNo'].unique()
+    batches = [sales[sales['InvoiceNo'].isin(part)] for part in np.array_split(invoices, 3)]
+    path = str(tmp_path / 'cooc.npz')
+    for batch in batches:
+        store = CooccurrenceStore.load(path).update(create_transaction_matrix(batch, representation=representation))
+        store.save(path)
+    # una factura ya contada no se vuelve a sumar
+    store = CooccurrenceStore.load(path).update(create_transaction_matrix(batches[0], representation=representation))
+    assert store.n_trans == len(invoices)
+
+    full = run_pairs_fallback(create_transaction_matrix(sales), top_n_items=20, outdir=str(tmp_path))
+    incremental = store.pair_rules(top_n_items=20, outdir=str(tmp_path))
+    pd.testing.assert_frame_equal(pair_frame(incremental), pair_frame(full))
+
+    # varios lotes en memoria sin guardar entre ellos: los pares pendientes se suman al pedir reglas
+    store = CooccurrenceStore()
+    for batch in batches:
+        store.update(create_transaction_matrix(batch, representation=representation))
+    pd.testing.assert_frame_equal(pair_frame(store.pair_rules(top_n_items=20, outdir=str(tmp_path))), pair_frame(full))
+
+def test_minibatch_model_with_other_k_is_refit(sales, tmp_path):
+    outdir = str(tmp_path)
+    _, _, model = cluster_rfm_minibatch(compute_rfm(sales), outdir, n_clusters=3)
+    assert len(model['centers']) == 3
+    # mismo k: se reutiliza el modelo guardado; otro k: se reajusta y se guarda
+    _, _, reused = cluster_rfm_minibatch(compute_rfm(sales), outdir, n_clusters=3)
+    np.testing.assert_array_equal(reused['centers'], model['centers'])
+    rfm, _, refit = cluster_rfm_minibatch(compute_rfm(sales), outdir, n_clusters=5)
+    assert len(refit['centers']) == 5
+    assert rfm['Cluster'].nunique() <= 5 and rfm['Cluster'].max() >= 3
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from itemsets import (mine_frequent_itemsets, mine_frequent_itemsets_bitset, association_rules_from_counts,
+                      pack_columns, unpack_columns, popcount, pair_counts_bitset, pair_counts_sparse)
+
+mlxtend = pytest.importorskip('mlxtend.frequent_patterns')
+
+def random_basket(n_trans=300, n_items=15, seed=0):
+    # popularidad decreciente por item y un par plantado (0, 1) para que haya reglas de varios tamaños
+    rng = np.random.default_rng(seed)
+    X = rng.random((n_trans, n_items)) < np.linspace(0.45, 0.05, n_items)
+    X[:, 1] |= X[:, 0] & (rng.random(n_trans) < 0.6)
+    return X
+
+def frame(X):
+    return pd.DataFrame(X, columns=[f'item {j:02d}' for j in range(X.shape[1])])
+
+def mlxtend_counts(X, min_support):
+    frequent = mlxtend.apriori(frame(X), min_support=min_support)
+    counts = np.rint(frequent['support'].to_numpy() * X.shape[0]).astype(int)
+    return {tuple(sorted(s)): c for s, c in zip(frequent['itemsets'], counts)}
+
+def rule_set(table):
+    return set(zip(map(tuple, table.itemsets('antecedent')), map(tuple, table.itemsets('consequent'))))
+
+@pytest.mark.parametrize('algorithm', ['fpgrowth', 'eclat'])
+@pytest.mark.parametrize('min_support', [0.02, 0.05, 0.2])
+def test_itemsets_match_mlxtend(algorithm, min_support):
+    X = random_basket()
+    native = mine_frequent_itemsets(sparse.csr_matrix(X), min_support, algorithm=algorithm)
+    assert native == mlxtend_counts(X, min_support)
+
+def test_max_len_limits_itemset_size():
+    X = random_basket()
+    native = mine_frequent_itemsets(sparse.csr_matrix(X), 0.02, algorithm='fpgrowth', max_len=2)
+    expected = {s: c for s, c in mlxtend_counts(X, 0.02).items() if len(s) <= 2}
+    assert native == expected
+
+@pytest.mark.parametrize('algorithm', ['fpgrowth', 'eclat'])
+def test_rules_match_mlxtend(algorithm):
+    X = random_basket()
+    names = frame(X).columns.to_numpy(dtype=object)
+    counts = mine_frequent_itemsets(sparse.csr_matrix(X), 0.03, algorithm=algorithm)
+    table = association_rules_from_counts(counts, X.shape[0], 0.3, names)
+
+    expected = mlxtend.association_rules(mlxtend.apriori(frame(X), min_support=0.03, use_colnames=True),
+                                         metric='confidence', min_threshold=0.3)
+    key = lambda a, c: (tuple(sorted(a)), tuple(sorted(c)))
+    expected.index = [key(a, c) for a, c in zip(expected['antecedents'], expected['consequents'])]
+    native = table.to_frame()
+    native.index = list(zip(map(tuple, table.itemsets('antecedent')), map(tuple, table.itemsets('consequent'))))
+    # mlxtend puede descartar por redondeo reglas en el umbral exacto (ver test siguiente)
+    assert set(expected.index) <= set(native.index)
+    assert np.allclose(native.loc[list(set(native.index) - set(expected.index)), 'confidence'], 0.3)
+    native = native.loc[expected.index]
+    for metric in ['antecedent support', 'consequent support', 'support', 'confidence', 'lift',
+                   'leverage', 'conviction', 'jaccard', 'kulczynski']:
+        np.testing.assert_allclose(native[metric].to_numpy(), expected[metric].to_numpy(), err_msg=metric)
+    np.testing.assert_allclose(native['cosine'], native['support'] / np.sqrt(native['antecedent support']
+                                                                              * native['consequent support']))
+
+def test_confidence_boundary_kept_from_integer_counts():
+    # A en 4 de 10 facturas y A+C en 3: confianza exactamente 0.75. Con soportes
+    # en coma flotante (mlxtend) 0.3 / 0.4 < 0.75 y la regla A -> C se pierde.
+    X = np.zeros((10, 2), dtype=bool)
+    X[:4, 0] = True
+    X[1:4, 1] = True
+    X[4:9, 1] = True
+    names = np.array(['A', 'C'], dtype=object)
+    table = association_rules_from_counts(mine_frequent_itemsets(sparse.csr_matrix(X), 0.1), 10, 0.75, names)
+    assert (('A',), ('C',)) in rule_set(table)
+    assert table['confidence'][table.itemset_text('antecedent') == 'A'][0] == 0.75
+
+    frequent = mlxtend.apriori(pd.DataFrame(X, columns=names), min_support=0.1, use_colnames=True)
+    expected = mlxtend.association_rules(frequent, metric='confidence', min_threshold=0.75)
+    assert not ((expected['antecedents'] == frozenset('A')) & (expected['consequents'] == frozenset('C'))).any()
+
+def test_no_rules_above_confidence():
+    X = random_basket()
+    counts = mine_frequent_itemsets(sparse.csr_matrix(X), 0.05)
+    table = association_rules_from_counts(counts, X.shape[0], 1.01, np.arange(X.shape[1]).astype(str))
+    assert table.empty
+
+@pytest.mark.parametrize('n_trans', [1, 63, 64, 65, 300])
+def test_pack_columns_round_trip(n_trans):
+    X = random_basket(n_trans=n_trans)
+    bits = pack_columns(sparse.csr_matrix(X))
+    assert bits.shape == (X.shape[1], (n_trans + 63) // 64)
+    np.testing.assert_array_equal(popcount(bits), X.sum(axis=0))
+    np.testing.assert_array_equal(unpack_columns(bits, n_trans).toarray(), X)
+
+@pytest.mark.parametrize('min_support', [0.02, 0.1])
+def test_bitset_eclat_matches_mlxtend(min_support):
+    X = random_basket()
+    bits = pack_columns(sparse.csr_matrix(X))
+    assert mine_frequent_itemsets_bitset(bits, X.shape[0], min_support) == mlxtend_counts(X, min_support)
+
+def test_pair_counts_bitset_matches_sparse_product():
+    X = random_basket()
+    idx = np.arange(X.shape[1])
+    full = X.T.astype(int) @ X.astype(int)
+    rows, cols = np.triu_indices(X.shape[1], k=1)
+    keep = full[rows, cols] > 0
+    expected = rows[keep], cols[keep], full[rows, cols][keep]
+    for got in (pair_counts_bitset(pack_columns(sparse.csr_matrix(X)), idx), pair_counts_sparse(sparse.csr_matrix(X))):
+        for a, b in zip(got, expected):
+            np.testing.assert_array_equal(a, b)
+
+def test_workers_match_serial():
+    X = random_basket(n_trans=500, n_items=25)
+    Xs = sparse.csr_matrix(X)
+    bits = pack_columns(Xs)
+    names = frame(X).columns.to_numpy(dtype=object)
+    for algorithm in ('fpgrowth', 'eclat'):
+        serial = mine_frequent_itemsets(Xs, 0.01, algorithm=algorithm)
+        assert mine_frequent_itemsets(Xs, 0.01, algorithm=algorithm, workers=2) == serial
+    assert mine_frequent_itemsets_bitset(bits, X.shape[0], 0.01, workers=2) == serial
+
+    expected = association_rules_from_counts(serial, X.shape[0], 0.2, names).to_frame()
+    got = association_rules_from_counts(serial, X.shape[0], 0.2, names, workers=2).to_frame()
+    pd.testing.assert_frame_equal(got, expected)
+
+    idx = np.arange(X.shape[1])
+    for parallel, serial_pairs in ((pair_counts_bitset(bits, idx, workers=2), pair_counts_bitset(bits, idx)),
+                                   (pair_counts_sparse(Xs, workers=2), pair_counts_sparse(Xs))):
+        for a, b in zip(parallel, serial_pairs):
+            np.testing.assert_array_equal(a, b)
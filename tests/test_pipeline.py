@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+
+from conftest import ROOT, SAMPLE_CSV
+from dag import DAG
+
+def test_process_stages_run_alone():
+    dag, active, overlaps = DAG(), [], []
+    lock = threading.Lock()
+
+    def tracked(name, processes):
+        def fn(**_):
+            with lock:
+                active.append(name)
+                if len(active) > 1 and any(n.startswith('proc') for n in active):
+                    overlaps.append(tuple(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(name)
+            return name
+        dag.stage(name=name, processes=processes)(fn)
+
+    for name in ('a', 'b', 'proc1', 'c', 'proc2'):
+        tracked(name, name.startswith('proc'))
+    results = dag.run(['a', 'b', 'proc1', 'c', 'proc2'], workers=4)
+    assert sorted(results) == ['a', 'b', 'c', 'proc1', 'proc2']
+    assert overlaps == []
+
+def test_pipeline_with_workers_and_parallel_stages(tmp_path):
+    # regresión: minería con --workers en paralelo con otras etapas y el pool de figuras se colgaba
+    for run in range(2):
+        outdir = tmp_path / f'run{run}'
+        proc = subprocess.run([sys.executable, os.path.join(ROOT, 'scripts', 'run_pipeline.py'),
+                               '--input', SAMPLE_CSV, '--outdir', str(outdir), '--miner', 'fpgrowth',
+                               '--min_support', '0.002', '--min_confidence', '0.1',
+                               '--workers', '2', '--parallel_stages', '4',
+                               '--plot_workers', '2', '--k_max', '4'],
+                              cwd=tmp_path, capture_output=True, text=True, timeout=300)
+        assert proc.returncode == 0, proc.stderr[-2000:]
+        assert (outdir / 'rules_apriori.csv').exists()
+        assert (outdir / 'informe_minero_extended.docx').exists()
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import SAMPLE_CSV
+from store import PreprocessedWriter, read_preprocessed
+from mineria_ejercicios import (load_and_preprocess, iter_preprocessed_chunks, create_transaction_matrix,
+                                BasketAccumulator, detect_date_format, parse_invoice_dates)
+
+@pytest.fixture
+def dirty_csv(tmp_path):
+    # ejemplo + filas que la limpieza descarta y descripciones con acentos y símbolos
+    df = pd.read_csv(SAMPLE_CSV, encoding='ISO-8859-1')
+    extra = df.head(6).copy()
+    extra['Quantity'] = [-1, 0, 2, 3, 1, 2]
+    extra.loc[extra.index[1], 'CustomerID'] = np.nan
+    extra['Description'] = ['Café  Único', 'Café  Único', 'CAFÉ  único', 'Té-Verde', 'té verde', 'Producto 14']
+    path = tmp_path / 'ventas.csv'
+    pd.concat([df, extra]).to_csv(path, index=False, encoding='ISO-8859-1')
+    return path
+
+def as_plain(df):
+    # los chunks tienen categorías propias: se comparan los valores
+    return df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)}).reset_index(drop=True)
+
+@pytest.mark.parametrize('chunksize', [7, 97, 5000])
+def test_chunks_match_in_memory(dirty_csv, chunksize):
+    full = load_and_preprocess(dirty_csv, clean_descriptions=True)
+    chunks = pd.concat(iter_preprocessed_chunks(dirty_csv, chunksize=chunksize, clean_descriptions=True))
+    pd.testing.assert_frame_equal(as_plain(chunks), as_plain(full), check_dtype=False)
+    assert set(full['Description_clean']) >= {'cafe unico', 'te verde'}
+
+def test_parquet_chunks_with_other_dtypes(dirty_csv, tmp_path):
+    first, second = list(iter_preprocessed_chunks(dirty_csv, chunksize=20))[:2]
+    # el segundo chunk infiere otros tipos: Country todo NaN, facturas alfanuméricas, Quantity decimal
+    second = second.assign(Country=np.nan, InvoiceNo='C' + second['InvoiceNo'].astype(str),
+                           Quantity=second['Quantity'] + 0.5)
+    with PreprocessedWriter(tmp_path) as writer:
+        writer.write(first)
+        writer.write(second)
+    back = read_preprocessed(tmp_path)
+    assert len(back) == len(first) + len(second)
+    assert back['Country'].iloc[len(first):].isna().all()
+    invoices = first['InvoiceNo'].astype(str).tolist() + second['InvoiceNo'].tolist()
+    assert back['InvoiceNo'].astype(str).tolist() == invoices
+    assert np.allclose(back['Quantity'], np.concatenate([first['Quantity'], second['Quantity']]))
+
+def test_parquet_keeps_compact_dtypes(dirty_csv, tmp_path):
+    with PreprocessedWriter(tmp_path) as writer:
+        for chunk in iter_preprocessed_chunks(dirty_csv, chunksize=97):
+            writer.write(chunk)
+    back = read_preprocessed(tmp_path)
+    assert back['InvoiceNo'].dtype == np.int32 and back['Quantity'].dtype == np.int32
+    assert isinstance(back['Country'].dtype, pd.CategoricalDtype)
+
+@pytest.mark.parametrize('representation', ['sparse', 'bitset'])
+@pytest.mark.parametrize('item_col', ['Description', 'Description_clean'])
+def test_chunked_basket_matches_in_memory(dirty_csv, representation, item_col):
+    full = create_transaction_matrix(load_and_preprocess(dirty_csv, clean_descriptions=True),
+                                     representation=representation, item_col=item_col)
+    acc = BasketAccumulator(item_col=item_col)
+    for chunk in iter_preprocessed_chunks(dirty_csv, chunksize=97, clean_descriptions=True):
+        acc.update(chunk)
+    chunked = acc.result(representation=representation)
+    np.testing.assert_array_equal(chunked.invoices, full.invoices)
+    np.testing.assert_array_equal(chunked.items, full.items)
+    if representation == 'bitset':
+        np.testing.assert_array_equal(chunked.bits, full.bits)
+    else:
+        assert (chunked.matrix != full.matrix).nnz == 0
+
+@pytest.mark.parametrize('values, expected', [
+    (['2021-01-28', '2021-02-01'], '%Y-%m-%d'),
+    (['2021-01-28 10:05:00', None], '%Y-%m-%d %H:%M:%S'),
+    # ambiguo: sin un día > 12 gana mes/día; con uno, día/mes
+    (['03/04/2021 10:00', '05/06/2021 11:30'], '%m/%d/%Y %H:%M'),
+    (['03/04/2021 10:00', '25/06/2021 11:30'], '%d/%m/%Y %H:%M'),
+    (['basura', None], None),
+    ([], None),
+])
+def test_detect_date_format(values, expected):
+    assert detect_date_format(pd.Series(values, dtype=object)) == expected
+
+def test_parse_invoice_dates_mixed_and_invalid():
+    values = pd.Series(['2021-01-28', '28/02/2021', None, 'no es fecha', '2021-01-28'], index=[5, 6, 7, 8, 9])
+    parsed = parse_invoice_dates(values)
+    expected = pd.to_datetime(pd.Series(['2021-01-28', '2021-02-28', None, None, '2021-01-28'], index=values.index))
+    pd.testing.assert_series_equal(parsed, expected, check_names=False)
+
+def test_parse_invoice_dates_explicit_format_and_datetimes():
+    assert parse_invoice_dates(pd.Series(['03/04/2021']), date_format='%d/%m/%Y')[0] == pd.Timestamp('2021-04-03')
+    dates = pd.Series(pd.to_datetime(['2021-04-03']))
+    assert parse_invoice_dates(dates) is dates
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from scipy import sparse
+
+from itemsets import mine_frequent_itemsets, association_rules_from_counts
+from rule_index import RuleIndex
+
+@pytest.fixture(scope='module')
+def rules():
+    rng = np.random.default_rng(1)
+    X = rng.random((400, 20)) < np.linspace(0.4, 0.05, 20)
+    X[:, 1] |= X[:, 0] & (rng.random(400) < 0.5)
+    names = np.asarray([f'item {j:02d}' for j in range(X.shape[1])], dtype=object)
+    return association_rules_from_counts(mine_frequent_itemsets(sparse.csr_matrix(X), 0.01), X.shape[0], 0.05, names)
+
+@pytest.fixture(scope='module')
+def sides(rules):
+    return list(zip(rules.itemsets('antecedent'), rules.itemsets('consequent')))
+
+def brute_force(sides, values, basket):
+    # mejor valor de cada item consecuente entre todas las reglas aplicables a la cesta
+    best = {}
+    for (ant, con), value in zip(sides, values):
+        if set(ant) <= set(basket):
+            for item in con:
+                if item not in basket:
+                    best[item] = max(best.get(item, -np.inf), value)
+    return best
+
+def check_top_k(got, best, k):
+    values = sorted(best.values(), reverse=True)[:k]
+    np.testing.assert_allclose([v for _, v in got], values)
+    assert all(best[item] == value for item, value in got)
+
+@pytest.mark.parametrize('metric', ['lift', 'confidence'])
+def test_recommend_matches_brute_force(rules, sides, metric):
+    index = RuleIndex.from_rules(rules)
+    rng = np.random.default_rng(2)
+    items = list(rules.items)
+    for size in (0, 1, 2, 3, 5):
+        for _ in range(10):
+            basket = list(rng.choice(items, size=size, replace=False)) + ['no existe']
+            for k in (1, 5, 50):
+                check_top_k(index.recommend(basket, k=k, metric=metric), brute_force(sides, rules[metric], basket), k)
+
+def test_truncated_index_is_exact_within_limit(rules, sides, tmp_path):
+    index = RuleIndex.from_rules(rules, max_per_antecedent=8)
+    path = str(tmp_path / 'rules_index.npz')
+    index.save(path)
+    index = RuleIndex.load(path)
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        basket = list(rng.choice(list(rules.items), size=3, replace=False))
+        for metric in ('lift', 'confidence'):
+            check_top_k(index.recommend(basket, k=5, metric=metric), brute_force(sides, rules[metric], basket), 5)
+
+def test_unknown_metric(rules):
+    with pytest.raises(ValueError):
+        RuleIndex.from_rules(rules).recommend(['item 00'], metric='support')
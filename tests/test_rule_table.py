@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from conftest import SAMPLE_CSV
+from itemsets import mine_frequent_itemsets, association_rules_from_counts
+from mineria_ejercicios import load_and_preprocess, create_transaction_matrix, run_pairs_fallback, run_apriori_rules
+from rule_table import RuleTable, RANK_METRICS, write_rule_table, load_rule_table, table_path, top_rows
+
+@pytest.fixture(scope='module')
+def itemset_rules():
+    rng = np.random.default_rng(0)
+    X = rng.random((300, 12)) < np.linspace(0.45, 0.05, 12)
+    names = np.asarray([f'item {j:02d}' for j in range(12)], dtype=object)
+    return association_rules_from_counts(mine_frequent_itemsets(sparse.csr_matrix(X), 0.02), 300, 0.2, names)
+
+@pytest.fixture(scope='module')
+def pair_rules(tmp_path_factory):
+    basket = create_transaction_matrix(load_and_preprocess(SAMPLE_CSV))
+    return run_pairs_fallback(basket, top_n_items=20, outdir=str(tmp_path_factory.mktemp('pairs')))
+
+def assert_same_rules(a, b, rtol=0):
+    # el CSV escribe los float en texto: solo el .npz conserva los bits exactos
+    assert a.kind == b.kind
+    assert list(a.metrics) == list(b.metrics)
+    for side in ('antecedent', 'consequent'):
+        np.testing.assert_array_equal(a.itemset_text(side), b.itemset_text(side))
+    for name in a.metrics:
+        np.testing.assert_allclose(a[name], b[name], rtol=rtol)
+
+@pytest.mark.parametrize('kind', ['itemsets', 'pairs'])
+def test_npz_round_trip(kind, itemset_rules, pair_rules, tmp_path):
+    table = itemset_rules if kind == 'itemsets' else pair_rules
+    path = table.save(str(tmp_path / 'rules.npz'))
+    loaded = RuleTable.load(path)
+    assert_same_rules(loaded, table)
+    np.testing.assert_array_equal(loaded.itemsets('antecedent'), table.itemsets('antecedent'))
+
+def test_pairs_csv_round_trip(pair_rules, tmp_path):
+    csv = str(tmp_path / 'rules_pairs_top.csv')
+    write_rule_table(pair_rules, csv)
+    frame = pd.read_csv(csv)
+    assert {'antecedent', 'consequent', 'confidence_a_b', 'confidence_b_a', 'conviction_a_b'} <= set(frame.columns)
+    assert_same_rules(RuleTable.from_frame(frame), pair_rules, rtol=1e-12)
+
+def test_itemsets_csv_round_trip(itemset_rules, tmp_path):
+    csv = str(tmp_path / 'rules_apriori.csv')
+    write_rule_table(itemset_rules, csv)
+    assert_same_rules(RuleTable.from_frame(pd.read_csv(csv)), itemset_rules, rtol=1e-12)
+
+def test_item_names_with_separator_survive_only_in_npz(tmp_path):
+    table = RuleTable.from_codes(np.asarray(['taza, roja', 'plato'], dtype=object), [(0,)], [(1,)],
+                                 {'support': [0.1], 'confidence': [0.5], 'lift': [2.0]})
+    csv = write_rule_table(table, str(tmp_path / 'rules_apriori.csv'))
+    assert tuple(load_rule_table(csv).itemsets('antecedent')) == (('taza, roja',),)
+    assert tuple(RuleTable.from_frame(pd.read_csv(csv)).itemsets('antecedent')) == (('roja', 'taza'),)
+
+def test_load_rule_table_prefers_fresh_npz(pair_rules, tmp_path):
+    csv = str(tmp_path / 'rules_pairs_top.csv')
+    write_rule_table(pair_rules, csv)
+    assert len(load_rule_table(csv)) == len(pair_rules)
+    # CSV más reciente que el .npz (editado a mano): se lee el CSV
+    pair_rules.head(3).to_frame().to_csv(csv, index=False)
+    os.utime(table_path(csv), (1, 1))
+    assert len(load_rule_table(csv)) == 3
+    os.remove(csv)
+    assert len(load_rule_table(csv)) == len(pair_rules)
+    assert load_rule_table(str(tmp_path / 'no_existe.csv')) is None
+
+@pytest.mark.parametrize('seed', range(5))
+def test_top_rows_matches_full_sort(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 20, size=500).astype(float)  # muchos empates
+    values[rng.random(500) < 0.1] = np.nan
+    full = np.argsort(np.where(np.isnan(values), np.inf, -values), kind='stable')
+    for k in (1, 7, 100, 449, 499, 500, 600, None):
+        np.testing.assert_array_equal(top_rows(values, k), full[:k])
+    assert len(top_rows(values, 0)) == 0
+    without_nan = pd.Series(np.nan_to_num(values))
+    np.testing.assert_array_equal(top_rows(without_nan, 50), without_nan.nlargest(50, keep='first').index)
+
+@pytest.mark.parametrize('rank_by', RANK_METRICS)
+def test_pair_rules_top_k_matches_full_sort(rank_by, tmp_path):
+    basket = create_transaction_matrix(load_and_preprocess(SAMPLE_CSV))
+    full = run_pairs_fallback(basket, top_n_items=20, outdir=str(tmp_path), rank_by=rank_by)
+    top = run_pairs_fallback(basket, top_n_items=20, outdir=str(tmp_path), top_k=10, rank_by=rank_by)
+    assert_same_rules(top, full.head(10))
+    assert_same_rules(full.top(10, rank_by), full.head(10))
+
+@pytest.mark.parametrize('rank_by', ['lift', 'confidence', 'cosine'])
+def test_itemset_rules_top_k_matches_full_sort(rank_by, tmp_path):
+    basket = create_transaction_matrix(load_and_preprocess(SAMPLE_CSV))
+    params = dict(min_support=0.002, min_confidence=0.1, outdir=str(tmp_path), miner='fpgrowth', rank_by=rank_by)
+    full = run_apriori_rules(basket, **params)
+    assert_same_rules(run_apriori_rules(basket, top_k=15, **params), full.head(15))
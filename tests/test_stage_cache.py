@@ -0,0 +1,49 @@
+import os
+
+from stage_cache import StageCache, stage_key, cached
+
+PAYLOAD = b'x' * 1000
+
+def entries(cache):
+    return sorted(name[:-len('.pkl')] for name in os.listdir(cache.cache_dir) if name.endswith('.pkl'))
+
+def touch(cache, key, when):
+    # mtime explícito: el LRU no depende de la resolución del reloj del sistema de ficheros
+    os.utime(cache._path(key), (when, when))
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = StageCache(str(tmp_path), max_bytes=3500)
+    for when, key in enumerate(['a', 'b', 'c'], start=1):
+        cache.put(key, PAYLOAD)
+        touch(cache, key, when)
+    assert cache.get('a') == PAYLOAD  # 'a' pasa a ser la más reciente
+    touch(cache, 'a', 10)
+    cache.put('d', PAYLOAD)
+    assert entries(cache) == ['a', 'c', 'd']
+
+def test_new_entry_is_kept_even_if_over_budget(tmp_path):
+    cache = StageCache(str(tmp_path), max_bytes=500)
+    cache.put('small', b'')
+    touch(cache, 'small', 1)
+    cache.put('big', PAYLOAD)
+    assert entries(cache) == ['big']
+    assert cache.get('big') == PAYLOAD
+
+def test_memo_and_unreadable_entries(tmp_path):
+    cache = StageCache(str(tmp_path))
+    calls = []
+    compute = lambda: calls.append(1) or {'rows': 3}
+    assert cache.memo('k', compute) == {'rows': 3}
+    assert cache.memo('k', compute) == {'rows': 3}
+    assert len(calls) == 1
+    with open(cache._path('k'), 'wb') as f:
+        f.write(b'no es un pickle')
+    assert cache.get('k') is None
+    assert entries(cache) == []
+    assert cached(None, 'k', compute) == {'rows': 3} and len(calls) == 2
+
+def test_stage_key_depends_on_parameters():
+    parent = stage_key('basket', 'huella', 'sparse')
+    assert stage_key('rules', parent, 0.3) == stage_key('rules', parent, 0.3)
+    assert stage_key('rules', parent, 0.3) != stage_key('rules', parent, 0.25)
+    assert stage_key('rules', parent, 0.3).startswith('rules-')